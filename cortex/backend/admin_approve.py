@@ -18,9 +18,10 @@ from app.services.auth_ops import (
     get_pending_requests,
     get_department_ids,
     list_departments,
+    queue_invite_email,
     run_auth_cleanup,
-    send_invite_email,
 )
+from app.services.mail_outbox import deliver_due, outbox_stats, smtp_configured, smtp_session
 
 
 def print_cleanup_summary(summary):
@@ -127,7 +128,7 @@ def run_approval_mode():
     summary = run_auth_cleanup()
     print_cleanup_summary(summary)
 
-    if not settings.SMTP_HOST or not settings.SMTP_USERNAME or not settings.SMTP_PASSWORD or not settings.SMTP_FROM_EMAIL:
+    if not smtp_configured():
         print("\n[NOTICE] SMTP is not fully configured. Invite links will be output to console and saved in 'invites_fallback.log'.")
 
     valid_dept_ids = get_department_ids()
@@ -227,7 +228,7 @@ def run_approval_mode():
         for row in unselected_rows:
             print(f"  REJECT  {row['full_name']} <{row['email']}>")
 
-        confirm = input("\nSend invites and apply these decisions? [y/N]: ").strip().lower()
+        confirm = input("\nQueue invites and apply these decisions? [y/N]: ").strip().lower()
         if confirm != "y":
             continue
 
@@ -236,7 +237,7 @@ def run_approval_mode():
         for row in selected_rows:
             try:
                 invite_row = create_invite_record(row, dept_map[row["id"]])
-                send_invite_email(
+                queue_invite_email(
                     email=row["email"],
                     full_name=row["full_name"],
                     invite_token=invite_row["raw_token"],
@@ -253,18 +254,41 @@ def run_approval_mode():
             apply_review_state(rejected_ids, "rejected")
 
         print("\n--- APPROVAL RESULT ---")
-        print(f"Invites sent: {len(approved_ids)}")
+        print(f"Invites queued: {len(approved_ids)} (delivered by the backend worker, or option [3])")
         print(f"Auto-rejected on this page: {len(rejected_ids)}")
-        print(f"Send failures left pending: {len(failed_rows)}")
+        print(f"Queue failures left pending: {len(failed_rows)}")
         for row, error in failed_rows:
             print(f"  FAILED {row['email']}: {error}")
 
 
+def run_deliver_mode():
+    """Drains the mail outbox from this process, for when no backend worker is running."""
+    if not smtp_configured():
+        print("\nSMTP is not configured; nothing can be delivered.")
+        return
+    claimed = 0
+    try:
+        while True:
+            batch = deliver_due()
+            if not batch:
+                break
+            claimed += batch
+    finally:
+        smtp_session.close()
+    stats = outbox_stats.snapshot()
+    print("\n--- DELIVERY SUMMARY ---")
+    print(f"Messages claimed: {claimed}")
+    print(f"Sent: {stats['sent']}")
+    print(f"Scheduled for retry: {stats['retried']}")
+    print(f"Failed: {stats['failed']}")
+
+
 def main():
     while True:
         print("\n=== CORTEX AUTH ADMIN ===")
         print("[1] Approval")
         print("[2] Cleanup")
+        print("[3] Deliver queued mail")
         print("[q] Quit")
         choice = input("Choose an option: ").strip().lower()
 
@@ -272,6 +296,8 @@ def main():
             run_approval_mode()
         elif choice == "2":
             run_cleanup_mode()
+        elif choice == "3":
+            run_deliver_mode()
         elif choice == "q":
             break
         else:
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends
+
+from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions
+from app.core.security import require_senior
+
+# Per-worker counters for tuning (caches, pools, queues). They describe
+# users, keys and traffic, so unlike /health they are senior-only.
+router = APIRouter(dependencies=[Depends(require_senior)])
+logger = get_logger(__name__)
+
+
+@router.get("/password-hashing")
+def password_hashing_stats():
+    """
+    Rolling hash/verify latencies (p50/p95/max), queue waits and rejections
+    for the password hashing pool. Use it to tune ARGON2_*/BCRYPT_ROUNDS
+    against the login latency target.
+    """
+    from app.core.passwords import hash_timings
+
+    return hash_timings.snapshot()
+
+
+@router.get("/token-cache")
+def token_cache_stats():
+    """Hit/miss counters for the verified-token cache behind get_current_user."""
+    from app.core.security import token_cache
+
+    return token_cache.stats()
+
+
+@router.get("/rate-limits")
+def rate_limit_stats():
+    """Tracked keys and allow/reject counters for this worker's rate limiter."""
+    from app.core.rate_limit import rate_limiter
+
+    return rate_limiter.stats()
+
+
+@router.get("/job-queue")
+def job_queue_stats():
+    """Queue rows by state (queued/leased/done/dead) and the oldest queued job's wait, for this worker's backend."""
+    from app.core.queue import QueueService
+
+    return QueueService.stats()
+
+
+@router.get("/reference-cache")
+def reference_cache_stats():
+    """Per-cache hit/miss/load counters for departments and user profiles."""
+    from app.services.reference_data import reference_cache_stats as stats
+
+    return stats()
+
+
+@router.get("/mail-outbox")
+def mail_outbox_stats():
+    """Delivery counters for this worker's mail sender."""
+    from app.services.mail_outbox import outbox_stats
+
+    return outbox_stats.snapshot()
+
+
+@router.get("/slack-gateway")
+def slack_gateway_stats():
+    """Channel/message cache counters and active Retry-After blocks for the Slack gateway."""
+    from app.services.slack_gateway import gateway_stats
+
+    return gateway_stats()
+
+
+@router.get("/slack-sync")
+def slack_sync_stats():
+    """Users and messages held by the local Slack sync store."""
+    from app.services.slack_sync import sync_stats
+
+    return sync_stats()
+
+
+@router.get("/compression")
+def compression_stats():
+    """Bytes before/after compression per encoding, and why responses were left uncompressed."""
+    from app.core.compression import compression_stats as stats
+
+    return stats.snapshot()
+
+
+@router.get("/db-queries")
+def db_query_stats():
+    """PostgREST calls per route: mean/max per request, time, budget overruns and the most frequent table.operation keys."""
+    from app.core.db_metrics import route_query_stats
+
+    return route_query_stats.snapshot()
+
+
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_fastapi_router"})
+instrument_fastapi_router(router, logger)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from pydantic import BaseModel, EmailStr
 from fastapi.security import OAuth2PasswordRequestForm
-from app.core.security import create_access_token, get_password_hash, verify_password, SessionUser, get_current_user
+from app.core.security import create_access_token, SessionUser, get_current_user, oauth2_scheme, revoke_token, revoke_user_sessions
+from app.core.rate_limit import rate_limit
+from app.core.passwords import PasswordHashingBusy, hash_password, hash_timings, verify_password_async
+from app.services.reference_data import cached_user, invalidate_user
+from app.core.config import settings
 from app.core.database import service_role_supabase as supabase
 from app.services.auth_ops import (
     get_invite_by_token,
@@ -10,37 +14,18 @@ from app.services.auth_ops import (
     has_active_invite,
     normalize_email,
     normalize_name,
-    run_auth_cleanup,
 )
 from typing import Optional
 from datetime import timedelta, datetime, timezone
-import time
+import asyncio
 from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions, log_step
 
 router = APIRouter()
 logger = get_logger(__name__)
 
 # --- Rate Limiter ---
-auth_rate_limits = {}
-
-def rate_limit_auth(request: Request):
-    client_ip = request.headers.get("X-Forwarded-For")
-    if not client_ip:
-        client_ip = request.client.host if request.client else "unknown"
-    else:
-        client_ip = client_ip.split(",")[0].strip()
-        
-    now = time.time()
-    if client_ip not in auth_rate_limits:
-        auth_rate_limits[client_ip] = []
-    
-    auth_rate_limits[client_ip] = [t for t in auth_rate_limits[client_ip] if now - t < 60]
-    
-    if len(auth_rate_limits[client_ip]) >= 5:
-        log_step(logger, "auth.rate_limit_exceeded", client_ip=client_ip)
-        raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
-        
-    auth_rate_limits[client_ip].append(now)
+# GCRA buckets per client IP, shared across workers (see app/core/rate_limit.py)
+rate_limit_auth = rate_limit("auth")
 
 # --- Schemas ---
 class AccessRequestSubmit(BaseModel):
@@ -73,13 +58,19 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+def _pending_request_expired(request_row) -> bool:
+    """Past AUTH_PENDING_RETENTION_DAYS: the scheduled cleanup will delete it, so re-queue instead."""
+    created_at = request_row.get("created_at")
+    if not created_at:
+        return False
+    created = datetime.fromisoformat(str(created_at).replace("Z", "+00:00"))
+    return datetime.now(timezone.utc) - created > timedelta(days=settings.AUTH_PENDING_RETENTION_DAYS)
+
 # --- Endpoints ---
 
 @router.post("/request-access")
 def request_access(data: AccessRequestSubmit, request: Request, _ = Depends(rate_limit_auth)):
     log_step(logger, "auth.request_access.begin", email=normalize_email(data.email))
-    run_auth_cleanup()
-    log_step(logger, "auth.request_access.cleanup_complete")
 
     email = normalize_email(data.email)
     full_name = normalize_name(data.full_name)
@@ -95,7 +86,7 @@ def request_access(data: AccessRequestSubmit, request: Request, _ = Depends(rate
         existing_request = get_request_by_email(email)
         if existing_request:
             req_status = existing_request.get("status")
-            if req_status == "pending":
+            if req_status == "pending" and not _pending_request_expired(existing_request):
                 log_step(logger, "auth.request_access.existing_pending", email=email)
                 return {"message": "Request received"}
             elif req_status == "approved":
@@ -132,7 +123,6 @@ def request_access(data: AccessRequestSubmit, request: Request, _ = Depends(rate
 @router.get("/invite/verify", response_model=InviteVerifyResponse)
 def verify_invite(token: str, request: Request, _ = Depends(rate_limit_auth)):
     log_step(logger, "auth.verify_invite.begin")
-    run_auth_cleanup()
     invite = get_invite_by_token(token)
     if not invite:
         log_step(logger, "auth.verify_invite.invalid_token")
@@ -163,7 +153,6 @@ def verify_invite(token: str, request: Request, _ = Depends(rate_limit_auth)):
 @router.post("/invite/complete")
 def complete_invite(data: InviteCompleteSubmit, request: Request, _ = Depends(rate_limit_auth)):
     log_step(logger, "auth.complete_invite.begin")
-    run_auth_cleanup()
     invite = get_invite_by_token(data.token)
     if not invite:
         log_step(logger, "auth.complete_invite.invalid_token")
@@ -190,7 +179,10 @@ def complete_invite(data: InviteCompleteSubmit, request: Request, _ = Depends(ra
         log_step(logger, "auth.complete_invite.user_exists", email=invite["email"])
         raise HTTPException(status_code=400, detail="User already registered")
 
-    hashed_pw = get_password_hash(data.password)
+    try:
+        hashed_pw = hash_password(data.password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     new_user = {
         "email": normalize_email(invite["email"]),
         "hashed_password": hashed_pw,
@@ -203,6 +195,8 @@ def complete_invite(data: InviteCompleteSubmit, request: Request, _ = Depends(ra
     try:
         log_step(logger, "auth.complete_invite.user_insert", email=new_user["email"], dept_id=new_user["dept_id"])
         supabase.table("users").insert(new_user).execute()
+        # A cached "no such user" from request-access would otherwise linger
+        invalidate_user(new_user["email"])
         if invite.get("id"):
             log_step(logger, "auth.complete_invite.delete_invite", invite_id=invite["id"])
             supabase.table("invite_tokens").delete().eq("id", invite["id"]).execute()
@@ -214,19 +208,44 @@ def complete_invite(data: InviteCompleteSubmit, request: Request, _ = Depends(ra
     log_step(logger, "auth.complete_invite.success", email=new_user["email"])
     return {"message": "Account created"}
 
+def _select_user_row(email: str):
+    res = supabase.table("users").select("*").eq("email", email).execute()
+    return res.data[0] if res.data else None
+
+def _store_upgraded_hash(email: str, new_hash: str) -> None:
+    try:
+        supabase.table("users").update({"hashed_password": new_hash}).eq("email", email).execute()
+        invalidate_user(email)
+        hash_timings.record_rehash()
+        log_step(logger, "auth.login.rehashed", email=email)
+    except Exception as e:
+        # Login already succeeded; the upgrade is retried on the next login.
+        log_step(logger, "auth.login.rehash_failed", email=email, error=str(e))
+
 @router.post("/login", response_model=Token)
-def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), _ = Depends(rate_limit_auth)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), _ = Depends(rate_limit_auth)):
     # OAuth2PasswordRequestForm expects 'username' and 'password'
     # We map 'username' to 'email'
+    # Async route: the DB calls go to a thread and password verification to
+    # the dedicated hashing pool, so no request thread waits on either.
     try:
         email = normalize_email(form_data.username)
         log_step(logger, "auth.login.lookup", email=email)
-        res = supabase.table("users").select("*").eq("email", email).execute()
-        user = res.data[0] if res.data else None
+        user = await asyncio.to_thread(_select_user_row, email)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+
+    valid = False
+    if user:
+        try:
+            valid, new_hash = await verify_password_async(form_data.password, user["hashed_password"])
+        except PasswordHashingBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        if valid and new_hash:
+            # Stored hash uses an old scheme/cost: upgrade it transparently
+            await asyncio.to_thread(_store_upgraded_hash, user["email"], new_hash)
+
+    if not valid:
         log_step(logger, "auth.login.invalid_credentials", email=email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -257,13 +276,18 @@ def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), _
     log_step(logger, "auth.login.success", email=email, emp_id=user.get("emp_id"), role=user.get("role"))
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), session_user: SessionUser = Depends(get_current_user)):
+    revoke_token(token)
+    log_step(logger, "auth.logout.success", email=session_user.email)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=UserResponse)
 def read_users_me(session_user: SessionUser = Depends(get_current_user)):
     email = session_user.email
     log_step(logger, "auth.me.lookup", email=email)
     try:
-        res = supabase.table("users").select("*").eq("email", email).execute()
-        user = res.data[0] if res.data else None
+        user = cached_user(email)
     except Exception:
         raise HTTPException(status_code=500, detail="Database connection failed")
     
@@ -294,10 +318,16 @@ def update_profile(update_data: UserUpdate, session_user: SessionUser = Depends(
             supabase.table("users").update(update_dict).eq("email", email).execute()
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Update failed: {str(e)}")
+        finally:
+            invalidate_user(email)
+        if "dept_id" in update_dict and update_dict["dept_id"] != session_user.dept_id:
+            # The dept_id claim in the caller's token is now stale
+            revoke_user_sessions(email)
             
     try:
-        res = supabase.table("users").select("*").eq("email", email).execute()
-        user = res.data[0]
+        user = cached_user(email)
+        if user is None:
+            raise LookupError(email)
     except Exception:
         raise HTTPException(status_code=500, detail="Database connection failed")
         
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Header
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+import asyncio
+import hashlib
+import math
 import uuid
 import os
+import shutil
+import time
 from app.core.security import SessionUser, get_current_user
 from app.core.config import settings
+from app.core.metrics import observe_upload
+from app.services.ingestion import (
+    DecompressedSizeExceeded,
+    PartScanner,
+    StreamingUploadWriter,
+    UploadSniffer,
+    assemble_parts,
+    record_shape,
+    sniff_file,
+)
 from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions, log_step
 
 router = APIRouter()
@@ -18,17 +33,40 @@ class MetaRequest(BaseModel):
     filename: str
     file_type: str
     file_size: int
+    # Set to opt into resumable multipart upload
+    part_size: Optional[int] = None
 
 class MetaResponse(BaseModel):
     id: str
     upload_url: str
     message: str
+    part_size: Optional[int] = None
+    part_count: Optional[int] = None
+    parts_url: Optional[str] = None
+    complete_url: Optional[str] = None
+
+class PartReceipt(BaseModel):
+    part_number: int
+    size: int
+    sha256: str
+
+class PartsStatusResponse(BaseModel):
+    id: str
+    part_size: int
+    part_count: int
+    received: List[PartReceipt]
+    missing: List[int]
 
 class IngestResponse(BaseModel):
     id: str
     filename: str
     status: str
     message: str
+    sha256: Optional[str] = None
+    format: Optional[str] = None
+    compression: Optional[str] = None
+    row_count: Optional[int] = None
+    columns: List[str] = []
 
 
 MAX_UPLOAD_SIZE_BYTES = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
@@ -37,6 +75,44 @@ MAX_UPLOAD_SIZE_BYTES = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
 def _upload_limit_message() -> str:
     return f"File exceeds the {settings.MAX_UPLOAD_SIZE_MB} MB upload limit."
 
+
+def _require_owned_session(file_id: str, session_user: SessionUser) -> dict:
+    if file_id not in upload_sessions:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    session = upload_sessions[file_id]
+    if session.get("owner_emp_id") != session_user.emp_id:
+        raise HTTPException(status_code=403, detail="Upload session does not belong to you")
+    return session
+
+
+def _require_multipart_session(file_id: str, session_user: SessionUser) -> dict:
+    session = _require_owned_session(file_id, session_user)
+    if not session.get("part_size"):
+        raise HTTPException(status_code=400, detail="Upload session was not created for multipart upload.")
+    if session.get("status") == "completed":
+        raise HTTPException(status_code=409, detail="Upload session is already completed.")
+    return session
+
+
+def _parts_dir(file_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, f"{file_id}.parts")
+
+
+def _part_path(file_id: str, part_number: int) -> str:
+    return os.path.join(_parts_dir(file_id), f"{part_number:05d}.part")
+
+
+def _expected_part_size(session: dict, part_number: int) -> int:
+    part_size = session["part_size"]
+    if part_number < session["part_count"]:
+        return part_size
+    return session["file_size"] - part_size * (session["part_count"] - 1)
+
+
+def _upload_path(file_id: str, filename: str) -> str:
+    original_filename = os.path.basename(filename)
+    return os.path.join(settings.UPLOAD_DIR, f"{file_id}_{original_filename}")
+
 @router.post("/meta", response_model=MetaResponse, status_code=status.HTTP_201_CREATED)
 async def create_upload_session(
     meta: MetaRequest,
@@ -60,6 +136,17 @@ async def create_upload_session(
         log_step(logger, "ingest.meta.rejected_size", file_size=meta.file_size)
         raise HTTPException(status_code=413, detail=_upload_limit_message())
 
+    part_count = None
+    if meta.part_size is not None:
+        if meta.part_size < settings.UPLOAD_MIN_PART_SIZE_BYTES and meta.part_size < meta.file_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Part size must be at least {settings.UPLOAD_MIN_PART_SIZE_BYTES} bytes.",
+            )
+        part_count = math.ceil(meta.file_size / meta.part_size)
+        if part_count > settings.UPLOAD_MAX_PARTS:
+            raise HTTPException(status_code=400, detail=f"Upload would need more than {settings.UPLOAD_MAX_PARTS} parts.")
+
     file_id = str(uuid.uuid4())
     upload_sessions[file_id] = {
         "filename": meta.filename,
@@ -69,7 +156,19 @@ async def create_upload_session(
         "status": "pending",
         "uploaded_at": None
     }
-    log_step(logger, "ingest.meta.session_created", file_id=file_id, owner_emp_id=session_user.emp_id)
+    log_step(logger, "ingest.meta.session_created", file_id=file_id, owner_emp_id=session_user.emp_id, part_count=part_count)
+
+    if part_count is not None:
+        upload_sessions[file_id].update({"part_size": meta.part_size, "part_count": part_count, "parts": {}})
+        return MetaResponse(
+            id=file_id,
+            upload_url=f"/ingest/blob/{file_id}",
+            message="Metadata registered. Upload numbered parts to 'parts_url', then POST 'complete_url'.",
+            part_size=meta.part_size,
+            part_count=part_count,
+            parts_url=f"/ingest/blob/{file_id}/parts",
+            complete_url=f"/ingest/blob/{file_id}/complete",
+        )
     
     return MetaResponse(
         id=file_id,
@@ -85,14 +184,10 @@ async def upload_file_blob(
 ):
     """
     Step 2: Stream the binary content for the registered file ID and save it to disk.
+    Hashing and format sniffing run inline with the writes, off the event loop.
     """
     log_step(logger, "ingest.blob.begin", file_id=file_id, owner_emp_id=session_user.emp_id)
-    if file_id not in upload_sessions:
-        raise HTTPException(status_code=404, detail="Upload session not found")
-    
-    session = upload_sessions[file_id]
-    if session.get("owner_emp_id") != session_user.emp_id:
-        raise HTTPException(status_code=403, detail="Upload session does not belong to you")
+    session = _require_owned_session(file_id, session_user)
 
     content_length = request.headers.get("content-length")
     if content_length:
@@ -107,24 +202,35 @@ async def upload_file_blob(
     os.makedirs(upload_dir, exist_ok=True)
 
     original_filename = os.path.basename(session["filename"])
-    safe_filename = f"{file_id}_{original_filename}"
-    file_path = os.path.join(upload_dir, safe_filename)
+    file_path = _upload_path(file_id, session["filename"])
 
+    sniffer = UploadSniffer(original_filename)
+    writer = StreamingUploadWriter(file_path, sniffer)
+    started = time.perf_counter()
     try:
         received_bytes = 0
+        await writer.open()
         log_step(logger, "ingest.blob.stream_opened", file_id=file_id, file_path=file_path)
 
-        with open(file_path, "wb") as f:
-            async for chunk in request.stream():
-                if not chunk:
-                    continue
+        try:
+            try:
+                async for chunk in request.stream():
+                    if not chunk:
+                        continue
 
-                received_bytes += len(chunk)
-                if received_bytes > MAX_UPLOAD_SIZE_BYTES:
-                    log_step(logger, "ingest.blob.rejected_stream_size", file_id=file_id, received_bytes=received_bytes)
-                    raise HTTPException(status_code=413, detail=_upload_limit_message())
+                    received_bytes += len(chunk)
+                    if received_bytes > MAX_UPLOAD_SIZE_BYTES:
+                        log_step(logger, "ingest.blob.rejected_stream_size", file_id=file_id, received_bytes=received_bytes)
+                        raise HTTPException(status_code=413, detail=_upload_limit_message())
 
-                f.write(chunk)
+                    await writer.write(chunk)
+            finally:
+                await writer.close()
+            # Zip members can only be read once the central directory is on disk
+            sniff = await asyncio.to_thread(sniffer.finish, file_path)
+        except DecompressedSizeExceeded as exc:
+            log_step(logger, "ingest.blob.rejected_decompressed_size", file_id=file_id)
+            raise HTTPException(status_code=413, detail=str(exc))
 
         if received_bytes != session["file_size"]:
             log_step(
@@ -139,17 +245,39 @@ async def upload_file_blob(
                 detail="Uploaded size did not match the registered file size."
             )
 
+        # Hash + sniff ran inline with the writes; reject unreadable files now
+        # instead of letting the report job discover it after queuing.
+        session.update(sniff)
+        if sniff["sniff_error"]:
+            log_step(logger, "ingest.blob.rejected_sniff", file_id=file_id, error=sniff["sniff_error"])
+            raise HTTPException(status_code=422, detail=sniff["sniff_error"])
+
         session["file_path"] = file_path
 
         # Update session status
         session["status"] = "completed"
-        log_step(logger, "ingest.blob.completed", file_id=file_id, received_bytes=received_bytes)
+        observe_upload("blob", received_bytes, started)
+        log_step(
+            logger,
+            "ingest.blob.completed",
+            file_id=file_id,
+            received_bytes=received_bytes,
+            format=sniff["format"],
+            compression=sniff["compression"],
+            row_count=sniff["row_count"],
+            column_count=len(sniff["columns"]),
+        )
         
         return IngestResponse(
             id=file_id,
             filename=session["filename"],
             status="processed",
-            message="File uploaded and processed successfully."
+            message="File uploaded and processed successfully.",
+            sha256=sniff["sha256"],
+            format=sniff["format"],
+            compression=sniff["compression"],
+            row_count=sniff["row_count"],
+            columns=sniff["columns"],
         )
 
     except HTTPException:
@@ -166,5 +294,183 @@ async def upload_file_blob(
         raise HTTPException(status_code=500, detail=f"Binary upload failed: {str(e)}")
 
 
+@router.put("/blob/{file_id}/parts/{part_number}", response_model=PartReceipt)
+async def upload_file_part(
+    file_id: str,
+    part_number: int,
+    request: Request,
+    x_part_sha256: Optional[str] = Header(None),
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """
+    Multipart Step 2: Upload one numbered part (1-based). Parts may arrive
+    concurrently and in any order; re-sending a part replaces it.
+    If X-Part-SHA256 is sent, the part is rejected unless it matches.
+    """
+    session = _require_multipart_session(file_id, session_user)
+    if part_number < 1 or part_number > session["part_count"]:
+        raise HTTPException(status_code=400, detail=f"Part number must be between 1 and {session['part_count']}.")
+
+    expected_size = _expected_part_size(session, part_number)
+    parts_dir = _parts_dir(file_id)
+    os.makedirs(parts_dir, exist_ok=True)
+    final_path = _part_path(file_id, part_number)
+    # Write to a unique temp name so a retried part never races the original
+    temp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.tmp"
+
+    # Part 1 carries the header, so it gets the full format sniff.
+    scanner = UploadSniffer(session["filename"]) if part_number == 1 else PartScanner()
+    writer = StreamingUploadWriter(temp_path, scanner)
+    received_bytes = 0
+    started = time.perf_counter()
+    try:
+        await writer.open()
+        try:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                received_bytes += len(chunk)
+                if received_bytes > expected_size:
+                    raise HTTPException(status_code=413, detail=f"Part {part_number} exceeds its expected size of {expected_size} bytes.")
+                await writer.write(chunk)
+        except DecompressedSizeExceeded as exc:
+            raise HTTPException(status_code=413, detail=str(exc))
+        finally:
+            await writer.close()
+
+        if received_bytes != expected_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Part {part_number} is {received_bytes} bytes; expected {expected_size}.",
+            )
+
+        if part_number == 1:
+            # Sniffs the buffered sample first: a part under SNIFF_SAMPLE_BYTES
+            # has not been scanned yet, so stats() would miss its newlines.
+            first_part_sniff = scanner.sniff_result()
+        stats = scanner.stats()
+        if x_part_sha256 and x_part_sha256.strip().lower() != stats["sha256"]:
+            log_step(logger, "ingest.part.checksum_mismatch", file_id=file_id, part_number=part_number)
+            raise HTTPException(status_code=400, detail=f"Checksum mismatch for part {part_number}.")
+
+        await asyncio.to_thread(os.replace, temp_path, final_path)
+    except BaseException:
+        # Includes CancelledError from a dropped client
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if part_number == 1:
+        session["first_part_sniff"] = first_part_sniff
+    session["parts"][part_number] = stats
+    session["status"] = "uploading"
+    observe_upload("part", received_bytes, started)
+    log_step(logger, "ingest.part.received", file_id=file_id, part_number=part_number, size=received_bytes)
+    return PartReceipt(part_number=part_number, size=stats["size"], sha256=stats["sha256"])
+
+
+@router.get("/blob/{file_id}/parts", response_model=PartsStatusResponse)
+async def list_file_parts(
+    file_id: str,
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """Multipart resume: which parts the server already holds."""
+    session = _require_multipart_session(file_id, session_user)
+    parts = session["parts"]
+    return PartsStatusResponse(
+        id=file_id,
+        part_size=session["part_size"],
+        part_count=session["part_count"],
+        received=[
+            PartReceipt(part_number=number, size=stats["size"], sha256=stats["sha256"])
+            for number, stats in sorted(parts.items())
+        ],
+        missing=[number for number in range(1, session["part_count"] + 1) if number not in parts],
+    )
+
+
+@router.post("/blob/{file_id}/complete", response_model=IngestResponse)
+async def complete_multipart_upload(
+    file_id: str,
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """
+    Multipart Step 3: Assemble the parts into the final upload.
+    Hash and row count are combined from per-part stats, so parts are
+    concatenated by the kernel and never read back in Python.
+    """
+    session = _require_multipart_session(file_id, session_user)
+    parts = session["parts"]
+    missing = [number for number in range(1, session["part_count"] + 1) if number not in parts]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Missing parts: {missing[:20]}")
+
+    ordered = [parts[number] for number in range(1, session["part_count"] + 1)]
+    sniff = dict(session.get("first_part_sniff") or {})
+    if sniff.get("sniff_error"):
+        session["status"] = "failed"
+        raise HTTPException(status_code=422, detail=sniff["sniff_error"])
+
+    file_path = _upload_path(file_id, session["filename"])
+    part_paths = [_part_path(file_id, number) for number in range(1, session["part_count"] + 1)]
+    try:
+        written = await asyncio.to_thread(assemble_parts, part_paths, file_path)
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        log_step(logger, "ingest.complete.failed_exception", file_id=file_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to assemble upload: {str(e)}")
+
+    if written != session["file_size"]:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail="Assembled size did not match the registered file size.")
+
+    if sniff.get("compression"):
+        # Compressed streams can't be decompressed part-by-part out of order,
+        # so shape and the decompressed-size guard come from one pass over
+        # the stored (still compressed) file.
+        try:
+            sniff = await asyncio.to_thread(sniff_file, file_path, session["filename"])
+        except DecompressedSizeExceeded as exc:
+            os.remove(file_path)
+            session["status"] = "failed"
+            raise HTTPException(status_code=413, detail=str(exc))
+        if sniff["sniff_error"]:
+            os.remove(file_path)
+            session["status"] = "failed"
+            raise HTTPException(status_code=422, detail=sniff["sniff_error"])
+    elif sniff.get("format") == "csv":
+        sniff["row_count"] = PartScanner.combine_row_count(ordered)
+    else:
+        sniff["row_count"] = None
+        if sniff.get("format") in ("parquet", "json"):
+            sniff.update(await asyncio.to_thread(record_shape, file_path, sniff))
+            if sniff.get("sniff_error"):
+                os.remove(file_path)
+                session["status"] = "failed"
+                raise HTTPException(status_code=422, detail=sniff["sniff_error"])
+
+    # S3-style composite digest: sha256 over the part digests, suffixed with the part count
+    composite = hashlib.sha256(b"".join(bytes.fromhex(part["sha256"]) for part in ordered)).hexdigest()
+    sniff["sha256"] = f"{composite}-{len(ordered)}"
+    session.update(sniff)
+    session["file_path"] = file_path
+    session["status"] = "completed"
+    await asyncio.to_thread(shutil.rmtree, _parts_dir(file_id), True)
+    log_step(logger, "ingest.complete.success", file_id=file_id, part_count=len(ordered), row_count=sniff["row_count"])
+
+    return IngestResponse(
+        id=file_id,
+        filename=session["filename"],
+        status="processed",
+        message="File uploaded and processed successfully.",
+        sha256=sniff["sha256"],
+        format=sniff.get("format"),
+        compression=sniff.get("compression"),
+        row_count=sniff["row_count"],
+        columns=sniff.get("columns") or [],
+    )
+
+
 instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_fastapi_router"})
 instrument_fastapi_router(router, logger)
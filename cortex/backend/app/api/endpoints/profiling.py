@@ -0,0 +1,52 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+
+from app.core.profiling import PROFILE_SUFFIX, profile_registry
+from app.core.security import SessionUser, require_senior
+from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions, log_step
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+
+class ProfileRequestsBody(BaseModel):
+    method: str = "GET"
+    route: str = Field(..., description="Route template as in /metrics, e.g. /service/issues/{issue_id}/graph")
+    count: int = Field(1, ge=1, le=100)
+
+
+@router.get("")
+def profiling_status(session_user: SessionUser = Depends(require_senior)):
+    """Armed routes and recently saved request/job profiles on this worker."""
+    return profile_registry.snapshot()
+
+
+@router.post("/requests")
+def profile_next_requests(body: ProfileRequestsBody, session_user: SessionUser = Depends(require_senior)):
+    """Profiles the next `count` requests matching method + route on this worker (responses carry X-Profile)."""
+    if not body.route.startswith("/"):
+        raise HTTPException(status_code=400, detail="Route must start with '/'.")
+    log_step(logger, "profiling.requests.arm", emp_id=session_user.emp_id, method=body.method, route=body.route, count=body.count)
+    return profile_registry.arm(body.method, body.route, body.count)
+
+
+@router.delete("/requests")
+def cancel_request_profiling(session_user: SessionUser = Depends(require_senior)):
+    profile_registry.disarm()
+    return {"armed": []}
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str, session_user: SessionUser = Depends(require_senior)):
+    """Collapsed-stack file; open it in https://www.speedscope.app or feed it to flamegraph.pl."""
+    path = profile_registry.find(name)
+    if not name.endswith(PROFILE_SUFFIX) or path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_fastapi_router"})
+instrument_fastapi_router(router, logger)
@@ -1,17 +1,98 @@
+import asyncio
 import os
+from typing import Dict, List
 
-from fastapi import APIRouter, HTTPException, status, Depends
-from app.schemas.report import ReportRequest, ReportResponse, JobStatus
-from app.services.jobs import JobManager
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from app.schemas.report import ReportRequest, ReportResponse, ReportBatchRequest, ReportBatchResponse, JobStatus
+from app.services.jobs import JobManager, JobGroup, TERMINAL_STATUSES
+from app.services.report_payloads import etag_matches
 from app.core.queue import QueueService
 from app.core.security import SessionUser, get_current_user
 from app.core.config import settings
+from app.core.metrics import IDEMPOTENCY_HITS
 from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions, log_step
 from app.api.endpoints.ingestion import upload_sessions
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+
+# Sniff fields recorded by the upload pipeline that the loader can reuse
+UPLOAD_HINT_KEYS = (
+    "format", "encoding", "delimiter", "columns", "row_count", "sha256",
+    "compression", "archive_member", "decompressed_size",
+)
+
+
+def _resolve_upload_paths(file_ids: List[str], owner_emp_id: str) -> tuple[List[str], List[str], Dict[str, dict]]:
+    """
+    Maps file_ids to on-disk upload paths.
+    Returns (file_paths, missing_file_ids, file_hints) where file_hints maps
+    each path to the sniff result captured at upload time.
+    """
+    file_paths = []
+    missing_file_ids = []
+    file_hints = {}
+    for file_id in file_ids:
+        session = upload_sessions.get(file_id)
+        file_path = session.get("file_path") if session else None
+        if not session or session.get("owner_emp_id") != owner_emp_id or session.get("status") != "completed" or not file_path or not os.path.exists(file_path):
+            missing_file_ids.append(file_id)
+            continue
+        file_paths.append(file_path)
+        file_hints[file_path] = {key: session.get(key) for key in UPLOAD_HINT_KEYS if session.get(key) is not None}
+    return file_paths, missing_file_ids, file_hints
+
+
+def _job_response(job, is_existing: bool = False) -> ReportResponse:
+    """Status-only view; completed payloads are served from job.result bytes."""
+    return ReportResponse(
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        stage=job.stage,
+        error=job.error,
+        is_existing=is_existing
+    )
+
+
+def _job_json(job, is_existing: bool = False) -> bytes:
+    if job.result is not None:
+        return job.result.envelope(is_existing)
+    return _job_response(job, is_existing=is_existing).model_dump_json().encode()
+
+
+def _completed_response(job, request: Request) -> Response:
+    """Pre-encoded payload response with ETag; 304 when the client already has it."""
+    report = job.result
+    headers = {"ETag": report.etag, "Vary": "Accept-Encoding", "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), report.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body, encoding = report.body_for(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _group_response(group: JobGroup) -> ReportBatchResponse:
+    summary = JobManager.summarize_group(group)
+    jobs = [JobManager.get_job(job_id) for job_id in group.job_ids]
+    return ReportBatchResponse(
+        group_id=group.group_id,
+        jobs=[_job_response(job) for job in jobs if job],
+        **summary,
+    )
+
+
+def _require_group(group_id: str, session_user: SessionUser) -> JobGroup:
+    group = JobManager.get_group(group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if group.owner_emp_id != session_user.emp_id:
+        raise HTTPException(status_code=403, detail="You do not have access to this batch")
+    return group
+
 @router.post("/jobs", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_report_job(
     request: ReportRequest,
@@ -32,14 +113,10 @@ async def create_report_job(
     if existing_job_id:
         job = JobManager.get_job(existing_job_id)
         log_step(logger, "reports.create.idempotent_hit", job_id=existing_job_id, status=job.status if job else None)
-        return ReportResponse(
-            job_id=job.job_id,
-            status=job.status,
-            progress=job.progress,
-            error=job.error,
-            payload=job.payload,
-            is_existing=True
-        )
+        IDEMPOTENCY_HITS.labels("jobs").inc()
+        if job.result is not None:
+            return Response(content=job.result.envelope(is_existing=True), media_type="application/json")
+        return _job_response(job, is_existing=True)
 
     if JobManager.count_active_jobs_for_owner(session_user.emp_id) >= settings.MAX_ACTIVE_JOBS_PER_USER:
         log_step(logger, "reports.create.rejected_active_limit", owner_emp_id=session_user.emp_id)
@@ -55,16 +132,7 @@ async def create_report_job(
             detail="Report queue is full right now. Please try again in a moment."
         )
 
-    file_paths = []
-    missing_file_ids = []
-    for file_id in request.file_ids:
-        session = upload_sessions.get(file_id)
-        file_path = session.get("file_path") if session else None
-        if not session or session.get("owner_emp_id") != session_user.emp_id or session.get("status") != "completed" or not file_path or not os.path.exists(file_path):
-            missing_file_ids.append(file_id)
-            continue
-        file_paths.append(file_path)
-
+    file_paths, missing_file_ids, file_hints = _resolve_upload_paths(request.file_ids, session_user.emp_id)
     if missing_file_ids:
         log_step(logger, "reports.create.rejected_missing_uploads", owner_emp_id=session_user.emp_id, missing_count=len(missing_file_ids))
         raise HTTPException(
@@ -73,7 +141,9 @@ async def create_report_job(
         )
 
     # 1. Create Job (Idempotent)
-    job_id, is_existing = JobManager.create_job(request.file_ids, file_paths, request.project_id, session_user.emp_id)
+    job_id, is_existing = JobManager.create_job(
+        request.file_ids, file_paths, request.project_id, session_user.emp_id, file_hints=file_hints
+    )
     
     # 2. Check if new or existing
     job = JobManager.get_job(job_id)
@@ -84,24 +154,24 @@ async def create_report_job(
          log_step(logger, "reports.create.enqueued", job_id=job_id)
 
     log_step(logger, "reports.create.success", job_id=job.job_id, status=job.status, is_existing=is_existing)
-    return ReportResponse(
-        job_id=job.job_id,
-        status=job.status,
-        progress=job.progress,
-        error=job.error,
-        payload=job.payload,
-        is_existing=is_existing
-    )
+    return _job_response(job, is_existing=is_existing)
 
 @router.get("/jobs/{job_id}", response_model=ReportResponse)
 async def get_report_job(
     job_id: str,
+    request: Request,
+    include_payload: bool = True,
     session_user: SessionUser = Depends(get_current_user),
 ):
     """
     Step 6: Polling
+    include_payload=false returns status/progress only, for cheap polling
+    until the job completes. Completed payloads carry an ETag; send it back
+    in If-None-Match to get a bodyless 304.
     """
     log_step(logger, "reports.get.begin", job_id=job_id, owner_emp_id=session_user.emp_id)
+    # Another process may have created or be running it
+    await QueueService.sync([job_id])
     job = JobManager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -109,13 +179,119 @@ async def get_report_job(
         raise HTTPException(status_code=403, detail="You do not have access to this job")
         
     log_step(logger, "reports.get.success", job_id=job_id, status=job.status, progress=job.progress)
-    return ReportResponse(
-        job_id=job.job_id,
-        status=job.status,
-        progress=job.progress,
-        error=job.error,
-        payload=job.payload
+    if include_payload and job.result is not None:
+        return _completed_response(job, request)
+    return _job_response(job)
+
+
+@router.post("/batches", response_model=ReportBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_report_batch(
+    request: ReportBatchRequest,
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """
+    Batch Job Handler
+    Accepts many file sets, creates one job per set (idempotent per set) and
+    groups them. Jobs are fair-shared with other users by the queue instead
+    of counting against the single active-job limit.
+    """
+    log_step(
+        logger,
+        "reports.batch.begin",
+        owner_emp_id=session_user.emp_id,
+        set_count=len(request.file_sets),
+        project_id=request.project_id,
     )
+    if len(request.file_sets) > settings.MAX_BATCH_FILE_SETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.MAX_BATCH_FILE_SETS} file sets."
+        )
+
+    # Validate every set before creating anything so a bad set doesn't leave a half-queued batch.
+    resolved = []
+    new_job_count = 0
+    for file_set in request.file_sets:
+        file_paths, missing_file_ids, file_hints = _resolve_upload_paths(file_set.file_ids, session_user.emp_id)
+        if missing_file_ids:
+            log_step(logger, "reports.batch.rejected_missing_uploads", owner_emp_id=session_user.emp_id, missing_count=len(missing_file_ids))
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="One or more uploaded files are no longer available. Please re-upload and try again."
+            )
+        if not JobManager.find_existing_job_id(file_set.file_ids, session_user.emp_id):
+            new_job_count += 1
+        resolved.append((file_set, file_paths, file_hints))
+
+    queued = JobManager.count_pending_jobs_for_owner(session_user.emp_id)
+    if queued + new_job_count > settings.MAX_QUEUED_JOBS_PER_USER:
+        log_step(logger, "reports.batch.rejected_user_queue_limit", owner_emp_id=session_user.emp_id, queued=queued, requested=new_job_count)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"You can have at most {settings.MAX_QUEUED_JOBS_PER_USER} queued report jobs."
+        )
+
+    job_ids = []
+    for file_set, file_paths, file_hints in resolved:
+        job_id, is_existing = JobManager.create_job(
+            file_set.file_ids,
+            file_paths,
+            file_set.project_id or request.project_id,
+            session_user.emp_id,
+            file_hints=file_hints,
+        )
+        job_ids.append(job_id)
+        if is_existing:
+            IDEMPOTENCY_HITS.labels("batches").inc()
+        else:
+            await QueueService.enqueue(job_id)
+
+    group = JobManager.create_group(job_ids, request.project_id, session_user.emp_id)
+    log_step(logger, "reports.batch.success", group_id=group.group_id, job_count=len(group.job_ids), new_jobs=new_job_count)
+    return _group_response(group)
+
+@router.get("/batches/{group_id}", response_model=ReportBatchResponse)
+async def get_report_batch(
+    group_id: str,
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """Aggregate progress for a batch. Payloads are left out; use the stream or per-job poll."""
+    group = _require_group(group_id, session_user)
+    await QueueService.sync(group.job_ids)
+    return _group_response(group)
+
+@router.get("/batches/{group_id}/stream")
+async def stream_report_batch(
+    group_id: str,
+    session_user: SessionUser = Depends(get_current_user),
+):
+    """
+    Streams one NDJSON line per job as soon as it reaches a terminal state,
+    then a final line with the aggregate batch status.
+    """
+    group = _require_group(group_id, session_user)
+
+    async def iter_results():
+        emitted = set()
+        while True:
+            await QueueService.sync(job_id for job_id in group.job_ids if job_id not in emitted)
+            for job_id in group.job_ids:
+                if job_id in emitted:
+                    continue
+                job = JobManager.get_job(job_id)
+                if not job:
+                    emitted.add(job_id)
+                    continue
+                if job.status in TERMINAL_STATUSES:
+                    emitted.add(job_id)
+                    yield _job_json(job) + b"\n"
+            if len(emitted) == len(group.job_ids):
+                break
+            await asyncio.sleep(settings.BATCH_STREAM_POLL_SECONDS)
+        yield _group_response(group).model_dump_json(include={"group_id", "status", "progress", "total", "completed", "failed"}).encode() + b"\n"
+
+    log_step(logger, "reports.batch.stream_opened", group_id=group_id)
+    return StreamingResponse(iter_results(), media_type="application/x-ndjson")
 
 
 instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_fastapi_router"})
@@ -6,6 +6,7 @@ import os
 import json
 from app.core.security import SessionUser, get_current_user
 from app.services.jobs import JobManager
+from app.core.queue import QueueService
 from app.core.observability import get_logger, instrument_fastapi_router, instrument_module_functions, log_step
 
 router = APIRouter()
@@ -80,6 +81,7 @@ async def get_resolution_rows(
     Reads from the JSON artifact generated during analysis.
     """
     log_step(logger, "resolution.rows.begin", job_id=job_id, owner_emp_id=session_user.emp_id)
+    await QueueService.sync([job_id])
     job = JobManager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Resolution data not found for this job")
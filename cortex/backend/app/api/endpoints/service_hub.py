@@ -3,7 +3,6 @@ from fastapi.responses import RedirectResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Literal, List, Dict, Any
 from datetime import date, datetime, timedelta
-import httpx
 import uuid
 from datetime import timezone
 from urllib.parse import urlencode, quote_plus
@@ -11,11 +10,12 @@ import jwt
 from jwt import InvalidTokenError
 
 from app.core.config import settings
-from app.core.database import get_supabase, service_role_supabase
+from app.core.database import Client, get_supabase, service_role_supabase
 from app.core.observability import get_logger, instrument_class_methods, instrument_fastapi_router, instrument_module_functions
 from app.core.security import SessionUser, get_current_user
+from app.services.reference_data import cached_user, invalidate_user
+from app.services import slack_gateway, slack_sync
 from app.services.tree_logic import TreeLogicService
-from supabase import Client
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -129,16 +129,14 @@ def _frontend_redirect_with_status(param: str, value: str) -> str:
 
 def _get_slack_connection(session_user: SessionUser) -> Dict[str, Any]:
     try:
-        res = service_role_supabase.table("users").select(
-            "email, slack_access_token, slack_connected_at, slack_user_id, slack_team_id, slack_team_name"
-        ).eq("email", session_user.email).execute()
+        user = cached_user(session_user.email)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Failed to load Slack connection: {str(exc)}")
 
-    if not res.data:
+    if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    return res.data[0]
+    return user
 
 
 def _clear_slack_connection(email: str) -> None:
@@ -149,6 +147,9 @@ def _clear_slack_connection(email: str) -> None:
         "slack_team_id": None,
         "slack_team_name": None,
     }).eq("email", email).execute()
+    invalidate_user(email)
+    slack_gateway.forget_user(email)
+    slack_sync.forget_user(email)
 
 
 # ─── Issue Schemas ────────────────────────────────────────────────────────────
@@ -937,13 +938,12 @@ async def slack_callback(code: str = None, state: str = None, error: str = None)
     except HTTPException:
         return RedirectResponse(_frontend_redirect_with_status("slack_error", "invalid_state"))
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post("https://slack.com/api/oauth.v2.access", data={
-            "client_id": settings.SLACK_CLIENT_ID,
-            "client_secret": settings.SLACK_CLIENT_SECRET,
-            "code": code,
-            "redirect_uri": settings.SLACK_REDIRECT_URI,
-        })
+    resp = await slack_gateway.get_client().post("/oauth.v2.access", data={
+        "client_id": settings.SLACK_CLIENT_ID,
+        "client_secret": settings.SLACK_CLIENT_SECRET,
+        "code": code,
+        "redirect_uri": settings.SLACK_REDIRECT_URI,
+    })
 
     data = resp.json()
     if not data.get("ok"):
@@ -963,6 +963,9 @@ async def slack_callback(code: str = None, state: str = None, error: str = None)
 
     try:
         service_role_supabase.table("users").update(update_payload).eq("email", state_payload["sub"]).execute()
+        invalidate_user(state_payload["sub"])
+        slack_gateway.forget_user(state_payload["sub"])
+        slack_sync.forget_user(state_payload["sub"])
     except Exception:
         return RedirectResponse(_frontend_redirect_with_status("slack_error", "persistence_failed"))
 
@@ -1002,48 +1005,21 @@ async def slack_messages(
         raise HTTPException(status_code=404, detail="Slack is not connected for this account.")
 
     safe_limit = max(1, min(limit, 25))
-    headers = {"Authorization": f"Bearer {token}"}
-
-    async with httpx.AsyncClient() as client:
-        ch_resp = await client.get("https://slack.com/api/users.conversations", headers=headers, params={
-            "types": "public_channel,private_channel",
-            "limit": 20,
-        })
-        ch_data = ch_resp.json()
-        if not ch_data.get("ok"):
-            error_code = ch_data.get("error", "slack_unavailable")
-            if error_code in {"invalid_auth", "token_revoked", "not_authed", "account_inactive"}:
-                _clear_slack_connection(session_user.email)
-                raise HTTPException(status_code=409, detail="Slack session expired. Please reconnect.")
-            raise HTTPException(status_code=502, detail=f"Slack error: {error_code}")
-
-        channels = ch_data.get("channels", [])
-        messages = []
-        for ch in channels[:5]:
-            msg_resp = await client.get("https://slack.com/api/conversations.history", headers=headers, params={
-                "channel": ch["id"],
-                "oldest": str(oldest) if oldest else "0",
-                "limit": 20,
-            })
-            msg_data = msg_resp.json()
-            if not msg_data.get("ok"):
-                error_code = msg_data.get("error", "conversation_history_failed")
-                if error_code in {"invalid_auth", "token_revoked", "not_authed", "account_inactive"}:
-                    _clear_slack_connection(session_user.email)
-                    raise HTTPException(status_code=409, detail="Slack session expired. Please reconnect.")
-                continue
+    try:
+        messages = await slack_sync.read_messages(session_user.email, token, oldest, safe_limit)
+    except slack_gateway.SlackAuthError:
+        _clear_slack_connection(session_user.email)
+        raise HTTPException(status_code=409, detail="Slack session expired. Please reconnect.")
+    except slack_gateway.SlackRateLimited as exc:
+        raise HTTPException(
+            status_code=429,
+            detail="Slack is rate limiting this account. Please retry shortly.",
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+        )
+    except slack_gateway.SlackAPIError as exc:
+        raise HTTPException(status_code=502, detail=f"Slack error: {exc.error}")
 
-            for message in msg_data.get("messages", []):
-                if message.get("type") == "message" and not message.get("subtype"):
-                    messages.append({
-                        "channel": ch.get("name", ch["id"]),
-                        "user": message.get("user", ""),
-                        "text": message.get("text", ""),
-                        "ts": float(message.get("ts", 0)),
-                    })
-
-    messages.sort(key=lambda item: item["ts"])
-    return messages[-safe_limit:]
+    return messages
 
 
 instrument_class_methods(NodePermissions, logger)
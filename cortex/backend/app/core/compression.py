@@ -0,0 +1,261 @@
+import gzip
+import threading
+import zlib
+from typing import Any, Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.observability import get_logger, log_step
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional; gzip is always available
+    brotli = None
+
+logger = get_logger(__name__)
+
+# Preference order when the client accepts several
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml")
+STREAMING_TYPES = ("application/x-ndjson", "text/event-stream")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: Sequence[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Best of `supported` allowed by an Accept-Encoding header (q=0 excludes); None = identity."""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = [name for name in supported if accepted.get(name, wildcard) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda name: accepted.get(name, wildcard))
+
+
+class CompressionPolicy:
+    def __init__(
+        self,
+        enabled: bool = True,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+    ):
+        self.enabled = enabled
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        self.gzip_level = settings.COMPRESSION_GZIP_LEVEL if gzip_level is None else gzip_level
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+
+
+# Per-route overrides, longest matching path prefix wins.
+ROUTE_POLICIES: Dict[str, CompressionPolicy] = {
+    # Monitors poll these constantly and the bodies are tiny
+    "/health": CompressionPolicy(enabled=False),
+    "/api/health": CompressionPolicy(enabled=False),
+    # Issue graphs (code_changes) and resolution rows are the large, highly
+    # repetitive bodies: compress from a lower threshold, a little harder.
+    "/service/issues": CompressionPolicy(minimum_size=512, brotli_quality=5),
+    "/resolution/rows": CompressionPolicy(minimum_size=512, brotli_quality=5),
+}
+DEFAULT_POLICY = CompressionPolicy()
+
+
+def policy_for(path: str) -> CompressionPolicy:
+    best = None
+    for prefix in ROUTE_POLICIES:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return ROUTE_POLICIES[best] if best is not None else DEFAULT_POLICY
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.responses: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+            self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+            self.responses[encoding] = self.responses.get(encoding, 0) + 1
+
+    def record_skip(self, reason: str) -> None:
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            encodings = {
+                encoding: {
+                    "responses": self.responses[encoding],
+                    "bytes_in": self.bytes_in[encoding],
+                    "bytes_out": self.bytes_out[encoding],
+                    "ratio": round(self.bytes_out[encoding] / self.bytes_in[encoding], 4) if self.bytes_in[encoding] else None,
+                }
+                for encoding in self.responses
+            }
+            return {"supported": list(SUPPORTED_ENCODINGS), "encodings": encodings, "skipped": dict(self.skipped)}
+
+
+compression_stats = CompressionStats()
+
+
+class _Compressor:
+    """Incremental gzip/brotli; `flush` emits everything compressed so far (for streamed lines)."""
+
+    def __init__(self, encoding: str, policy: CompressionPolicy):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=policy.brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(policy.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+def _compress_once(data: bytes, encoding: str, policy: CompressionPolicy) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=policy.brotli_quality)
+    return gzip.compress(data, compresslevel=policy.gzip_level)
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, policy: CompressionPolicy):
+        self.send = send
+        self.encoding = encoding
+        self.policy = policy
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.flush_chunks = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self._begin(start, body, more_body)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        self.bytes_in += len(body)
+        chunk = self.compressor.compress(body, flush=self.flush_chunks)
+        if not more_body:
+            chunk += self.compressor.finish()
+            self._finished(len(chunk))
+        else:
+            self.bytes_out += len(chunk)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _skip_reason(self, start: Message, headers: Headers, body: bytes, more_body: bool) -> Optional[str]:
+        if "content-encoding" in headers:
+            return "already_encoded"
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return "no_body"
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return "content_type"
+        length = int(headers["content-length"]) if "content-length" in headers else (None if more_body else len(body))
+        if length is not None and length < self.policy.minimum_size:
+            return "below_minimum"
+        return None
+
+    async def _begin(self, start: Message, body: bytes, more_body: bool) -> None:
+        headers = MutableHeaders(raw=start["headers"])
+        reason = self._skip_reason(start, headers, body, more_body)
+        if reason:
+            compression_stats.record_skip(reason)
+            self.passthrough = True
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body:
+            compressed = _compress_once(body, self.encoding, self.policy)
+            headers["Content-Length"] = str(len(compressed))
+            self.bytes_in = len(body)
+            self._finished(len(compressed))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body: compress incrementally. NDJSON/SSE chunks are flushed
+        # so each line reaches the client as soon as the app yields it.
+        del headers["Content-Length"]
+        self.compressor = _Compressor(self.encoding, self.policy)
+        self.flush_chunks = headers.get("content-type", "").startswith(STREAMING_TYPES)
+        await self.send(start)
+        self.bytes_in = len(body)
+        chunk = self.compressor.compress(body, flush=self.flush_chunks)
+        self.bytes_out = len(chunk)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    def _finished(self, last_chunk_len: int) -> None:
+        self.bytes_out += last_chunk_len
+        compression_stats.record(self.encoding, self.bytes_in, self.bytes_out)
+
+
+class CompressionMiddleware:
+    """
+    brotli/gzip by Accept-Encoding for compressible bodies over the route's
+    minimum size. Responses that already carry Content-Encoding (e.g.
+    pre-compressed report payloads) pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        policy = policy_for(scope["path"])
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding")) if policy.enabled else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(send, encoding, policy))
+
+
+log_step(logger, "compression.configured", supported=",".join(SUPPORTED_ENCODINGS), minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
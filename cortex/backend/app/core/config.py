@@ -32,6 +32,20 @@ class Settings(BaseSettings):
     SLACK_CLIENT_ID: str = ""
     SLACK_CLIENT_SECRET: str = ""
     SLACK_REDIRECT_URI: str = "http://localhost:8000/service/slack/callback"
+    SLACK_HTTP_TIMEOUT_SECONDS: float = 10.0
+    SLACK_HISTORY_CONCURRENCY: int = 5  # Parallel conversations.history calls per refresh
+    SLACK_CHANNELS_CACHE_TTL_SECONDS: int = 300
+    SLACK_MESSAGES_CACHE_TTL_SECONDS: int = 15
+    SLACK_CACHE_MAX_ENTRIES: int = 2048
+    SLACK_MAX_RETRY_WAIT_SECONDS: float = 2.0  # Longer Retry-After windows are passed to the client as 429
+    # Incremental message sync (host-local store read by /slack/messages)
+    SLACK_SYNC_SQLITE_PATH: str = "/tmp/cortex-slack-sync.sqlite3"
+    SLACK_SYNC_INTERVAL_SECONDS: int = 30
+    SLACK_SYNC_ACTIVE_WINDOW_SECONDS: int = 3600  # Only users who opened the widget this recently are synced
+    SLACK_SYNC_BATCH_SIZE: int = 50  # Users per background pass
+    SLACK_SYNC_PAGE_SIZE: int = 200
+    SLACK_SYNC_MAX_PAGES: int = 5
+    SLACK_SYNC_KEEP_PER_CHANNEL: int = 200
     FRONTEND_URL: str = "http://localhost:5173"
     ALLOWED_ORIGINS: str = ""
     INVITE_SIGNUP_URL: str = "http://localhost:5173/signup"
@@ -41,6 +55,9 @@ class Settings(BaseSettings):
     AUTH_PENDING_RETENTION_DAYS: int = 7
     AUTH_REJECTED_RETENTION_DAYS: int = 30
     AUTH_EXPIRED_RETENTION_DAYS: int = 7
+    AUTH_CLEANUP_INTERVAL_SECONDS: int = 900
+    AUTH_CLEANUP_BATCH_SIZE: int = 500  # Rows per step per transaction
+    AUTH_CLEANUP_MAX_BATCHES: int = 100  # Per run; the next run picks up the rest
     AUTH_APPROVAL_PAGE_SIZE: int = 50
     AUTH_ADMIN_EMP_ID: str = ""
 
@@ -51,6 +68,45 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_FROM_EMAIL: str = ""
     SMTP_FROM_NAME: str = "Cortex"
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 20
+    # Local stand-in: `python -m aiosmtpd -n -l 127.0.0.1:1025` with
+    # SMTP_HOST=127.0.0.1, SMTP_PORT=1025, SMTP_STARTTLS=false, no username.
+
+    # Mail outbox (invite emails are queued, then sent by the worker)
+    MAIL_OUTBOX_POLL_SECONDS: int = 5
+    MAIL_OUTBOX_BATCH_SIZE: int = 20
+    MAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    MAIL_OUTBOX_RETRY_BASE_SECONDS: int = 30  # Doubles per attempt, capped at 1h
+    MAIL_OUTBOX_STALE_CLAIM_SECONDS: int = 300  # Reclaim rows a crashed sender left in 'sending'
+    MAIL_OUTBOX_SMTP_IDLE_SECONDS: int = 60  # Close the shared SMTP connection after this long unused
+
+    # Password hashing (new hashes use PASSWORD_HASH_SCHEME; older hashes are
+    # upgraded on the next successful login)
+    PASSWORD_HASH_SCHEME: str = "argon2"  # "argon2" (argon2id) or "bcrypt"
+    ARGON2_TIME_COST: int = 2
+    ARGON2_MEMORY_COST_KIB: int = 19456
+    ARGON2_PARALLELISM: int = 1
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = min(4, CPU count)
+    PASSWORD_HASH_QUEUE_SIZE: int = 32  # Waiting operations beyond the workers before 503
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+    # Verified bearer tokens kept in memory until exp (0 disables the cache)
+    AUTH_TOKEN_CACHE_SIZE: int = 4096
+
+    # Rate limiting (GCRA). "sqlite" shares buckets across worker processes
+    # on one host; "memory" is per process.
+    RATE_LIMIT_BACKEND: str = "sqlite"
+    RATE_LIMIT_SQLITE_PATH: str = "/tmp/cortex-ratelimit.sqlite3"
+    RATE_LIMIT_SWEEP_INTERVAL_SECONDS: int = 60
+    AUTH_RATE_LIMIT: int = 5  # Requests per minute per client IP
+    AUTH_RATE_LIMIT_BURST: int = 0  # 0 = same as AUTH_RATE_LIMIT
+
+    # Reference-data cache (departments, user profiles). Entries past their
+    # TTL are served for one more TTL while a background refresh runs.
+    REFERENCE_CACHE_DEPARTMENTS_TTL_SECONDS: int = 300
+    REFERENCE_CACHE_USERS_TTL_SECONDS: int = 60
+    REFERENCE_CACHE_USERS_MAX_ENTRIES: int = 10000
     UPLOAD_DIR: str = "/tmp/cortex-uploads"
 
     # Visualization Constants (The Constitution)
@@ -58,9 +114,47 @@ class Settings(BaseSettings):
     MIN_ROWS_TIME: int = 30
     METRIC_DENSITY_THRESHOLD: float = 0.05
     TIME_DOMAIN_IQR_THRESHOLD: float = 10.0
-    MAX_UPLOAD_SIZE_MB: int = 10
+    MAX_UPLOAD_SIZE_MB: int = 10  # Stored bytes; compressed uploads count compressed size
+    MAX_DECOMPRESSED_SIZE_MB: int = 100
+    # Resumable multipart uploads (every part except the last is exactly part_size)
+    UPLOAD_MIN_PART_SIZE_BYTES: int = 256 * 1024
+    UPLOAD_MAX_PARTS: int = 1000
     MAX_ACTIVE_JOBS_PER_USER: int = 1
     MAX_PENDING_JOBS: int = 15
+    # Batch reports: fair-share queueing replaces the single-active-job limit and
+    # MAX_PENDING_JOBS, so a batch is bounded only by the owner's queued jobs
+    MAX_BATCH_FILE_SETS: int = 50
+    MAX_QUEUED_JOBS_PER_USER: int = 50  # Keep >= MAX_BATCH_FILE_SETS so a full batch fits
+    BATCH_STREAM_POLL_SECONDS: float = 0.5
+    # Response compression (app/core/compression.py); per-route overrides live there
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Bytes; smaller bodies aren't worth the CPU or the headers
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # Live responses: fast levels compress nearly as well on JSON
+    REPORT_PAYLOAD_GZIP_LEVEL: int = 6
+    REPORT_PAYLOAD_BROTLI_QUALITY: int = 9  # Compressed once per job, so spend a bit more than for live responses
+    # Sampling profiler (app/core/profiling.py). Jobs slower than this keep a
+    # collapsed-stack profile next to their artifacts; 0 disables.
+    PROFILE_JOBS_OVER_SECONDS: float = 0.0
+    PROFILE_SAMPLE_INTERVAL_MS: float = 10.0
+    PROFILE_DIR: str = "/tmp/cortex-profiles"  # Request profiles armed via /admin/profiling
+    # PostgREST calls per request before request_logging_middleware warns (N+1 detector); 0 disables
+    DB_QUERY_BUDGET_PER_REQUEST: int = 15
+    # Per-job memory budget (app/core/memory.py): loads estimated over it take the
+    # chunked CSV path or fail up front, and a job whose RSS growth passes it fails
+    # at the next stage boundary; 0 disables.
+    JOB_MEMORY_BUDGET_MB: int = 1024
+    JOB_MEMORY_SAMPLE_INTERVAL_MS: float = 50.0
+    # Report job queue (app/core/queue.py). "memory" is per process. "sqlite"
+    # shares the queue between the processes on one host, "postgres" between
+    # hosts (sql/13_report_queue.sql). Only standalone `python -m app.worker`
+    # processes scale out on a shared queue: upload sessions, batch groups and
+    # the pending-job caps live in the API process, so the API stays at one.
+    JOB_QUEUE_BACKEND: str = "memory"
+    JOB_QUEUE_SQLITE_PATH: str = "/tmp/cortex-job-queue.sqlite3"
+    JOB_QUEUE_LEASE_SECONDS: int = 30  # A claim not heartbeated for this long is redelivered
+    JOB_QUEUE_HEARTBEAT_SECONDS: int = 10
+    JOB_QUEUE_MAX_ATTEMPTS: int = 3  # Claims before a job whose workers keep dying is dead-lettered
+    JOB_QUEUE_RETENTION_SECONDS: int = 86400  # Finished rows (and results) kept for other processes' polls
     WORKER_JOB_TIMEOUT_SECONDS: int = 120
     WORKER_REAPER_INTERVAL_SECONDS: int = 5
 
@@ -1,8 +1,18 @@
-from supabase import create_client, Client, ClientOptions
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
 from app.core.config import settings
+from app.core.db_metrics import instrument_client
 from app.core.observability import get_logger, instrument_module_functions, log_step
 from fastapi import Request
 
+if TYPE_CHECKING:
+    from supabase import Client
+else:
+    # Annotation-only alias: importing supabase costs ~250 ms of cold start, so
+    # it happens when the first client is built (see LazyClient), not here.
+    Client = Any
+
 logger = get_logger(__name__)
 
 url: str = settings.SUPABASE_URL
@@ -12,24 +22,77 @@ service_key: str = settings.SUPABASE_SERVICE_ROLE_KEY
 if not url or not key:
     logger.warning("Supabase credentials not found in environment variables.")
 
-# Global client for operations without a specific user context (like fetching public data)
-# Disable auto refresh and persist session for background global clients to prevent thread leaks over 24h
-global_options = ClientOptions(auto_refresh_token=False, persist_session=False)
 
-supabase: Client = create_client(url, key, options=global_options)
+def create_client(supabase_url: str, supabase_key: str, options: Any = None) -> "Client":
+    from supabase import create_client as supabase_create_client
+
+    return supabase_create_client(supabase_url, supabase_key, options=options)
+
+
+def client_options(**kwargs: Any) -> Any:
+    from supabase import ClientOptions
+
+    return ClientOptions(**kwargs)
+
+
+class LazyClient:
+    """
+    Module-level client built on first use. Importers keep
+    `from app.core.database import service_role_supabase`; attribute access
+    is forwarded to the real Client, which is created once, under a lock, by
+    whichever request (or warm_clients at startup) needs it first.
+    """
+
+    def __init__(self, name: str, build: Callable[[], "Client"]):
+        self._name = name
+        self._build = build
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> "Client":
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build()
+                    log_step(logger, "database.client.built", client=self._name)
+                client = self._client
+        return client
 
-if service_key:
-    service_role_supabase: Client = create_client(url, service_key, options=global_options)
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+def _build_global_client() -> "Client":
+    # Global client for operations without a specific user context (like fetching public data)
+    # Disable auto refresh and persist session for background global clients to prevent thread leaks over 24h
+    global_options = client_options(auto_refresh_token=False, persist_session=False)
+    return instrument_client(create_client(url, key, options=global_options))
+
+
+def _build_service_role_client() -> "Client":
+    global_options = client_options(auto_refresh_token=False, persist_session=False)
+    client = create_client(url, service_key, options=global_options)
     # Explicitly force both headers on the PostgREST session.
     # supabase-py 2.11.x (pinned for Render) does not always propagate the service
     # role key into the Authorization: Bearer header, so PostgREST evaluates RLS
     # instead of bypassing it. Being explicit here makes the bypass version-agnostic.
-    service_role_supabase.postgrest.session.headers.update({
+    client.postgrest.session.headers.update({
         "apikey": service_key,
         "Authorization": f"Bearer {service_key}",
     })
-else:
-    service_role_supabase: Client = supabase
+    return instrument_client(client)
+
+
+supabase: "Client" = LazyClient("anon", _build_global_client)
+service_role_supabase: "Client" = LazyClient("service_role", _build_service_role_client) if service_key else supabase
+
+
+def warm_clients() -> None:
+    """Builds the global clients ahead of the first request that needs them (run off the event loop)."""
+    supabase.get()
+    service_role_supabase.get()
+
 
 def get_supabase(request: Request) -> Client:
     """Dependency to get a request-scoped Supabase client with the user's JWT."""
@@ -41,16 +104,16 @@ def get_supabase(request: Request) -> Client:
     headers = {}
     if auth_header:
         headers["Authorization"] = auth_header
-        
-    return create_client(
-        url, 
-        key, 
-        options=ClientOptions(
+
+    return instrument_client(create_client(
+        url,
+        key,
+        options=client_options(
             headers=headers,
             auto_refresh_token=False,
             persist_session=False
         )
-    )
+    ))
 
 
-instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions"})
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "create_client", "client_options"})
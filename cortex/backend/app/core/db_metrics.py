@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+from app.core.config import settings
+from app.core.observability import get_logger
+
+logger = get_logger(__name__)
+
+
+class RequestQueries:
+    """PostgREST round trips made while serving one HTTP request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.count = 0
+        self.duration_ms = 0.0
+        # "table.operation" -> [calls, total ms]
+        self.by_key: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()  # Sync routes and to_thread calls record from worker threads
+
+    def record(self, key: str, duration_ms: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration_ms += duration_ms
+            entry = self.by_key.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration_ms
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            if not self.by_key:
+                return None
+            key = max(self.by_key, key=lambda name: self.by_key[name][0])
+            return key, int(self.by_key[key][0])
+
+    def server_timing(self, total_ms: float) -> str:
+        return f'db;dur={self.duration_ms:.1f};desc="{self.count} queries", app;dur={total_ms:.1f}'
+
+
+# Set by request_logging_middleware; None outside requests (background loops aren't counted)
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("cortex_db_queries", default=None)
+
+
+def _query_key(request: httpx.Request) -> str:
+    segments = [segment for segment in request.url.path.split("/") if segment]
+    target = segments[-1] if segments else "?"
+    if len(segments) >= 2 and segments[-2] == "rpc":
+        return f"rpc.{target}"
+    if request.method == "POST":
+        operation = "upsert" if "resolution=" in request.headers.get("prefer", "") else "insert"
+    else:
+        operation = {"GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete"}.get(request.method, request.method.lower())
+    return f"{target}.{operation}"
+
+
+def _on_request(request: httpx.Request) -> None:
+    if current_queries.get() is not None:
+        request.extensions["cortex_db_started"] = time.perf_counter()
+
+
+def _on_response(response: httpx.Response) -> None:
+    queries = current_queries.get()
+    started = response.request.extensions.get("cortex_db_started")
+    if queries is None or started is None:
+        return
+    # Hooks run once headers arrive; read the body here so the timing covers the whole transfer
+    response.read()
+    queries.record(_query_key(response.request), (time.perf_counter() - started) * 1000)
+
+
+def instrument_client(client: Any) -> Any:
+    """Counts and times every PostgREST call the supabase client makes during a request."""
+    session = client.postgrest.session
+    if not getattr(session, "_cortex_db_metrics", False):
+        hooks = session.event_hooks
+        session.event_hooks = {
+            "request": [*hooks.get("request", []), _on_request],
+            "response": [*hooks.get("response", []), _on_response],
+        }
+        session._cortex_db_metrics = True
+    return client
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Route pattern such as /service/issues/{issue_id}/graph, so stats aggregate across ids."""
+    if scope.get("route") is None:
+        return "<unmatched>"
+    # Rebuilt from path_params: route.path lacks include_router prefixes on newer FastAPI
+    placeholders = {str(value): f"{{{name}}}" for name, value in (scope.get("path_params") or {}).items()}
+    return "/".join(placeholders.get(segment, segment) for segment in scope.get("path", "").split("/"))
+
+
+class RouteQueryStats:
+    """Per-route aggregates of RequestQueries, for /admin/stats/db-queries."""
+
+    def __init__(self, top_keys: int = 5):
+        self._lock = threading.Lock()
+        self.top_keys = top_keys
+        self.routes: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, route: str, queries: RequestQueries, over_budget: bool) -> None:
+        with queries._lock:
+            by_key = {key: entry[0] for key, entry in queries.by_key.items()}
+        with self._lock:
+            stats = self.routes.setdefault(route, {"requests": 0, "queries": 0, "queries_max": 0, "db_ms": 0.0, "over_budget": 0, "by_key": {}})
+            stats["requests"] += 1
+            stats["queries"] += queries.count
+            stats["queries_max"] = max(stats["queries_max"], queries.count)
+            stats["db_ms"] += queries.duration_ms
+            stats["over_budget"] += int(over_budget)
+            for key, calls in by_key.items():
+                stats["by_key"][key] = stats["by_key"].get(key, 0) + calls
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": stats["requests"],
+                    "queries_mean": round(stats["queries"] / stats["requests"], 2),
+                    "queries_max": stats["queries_max"],
+                    "db_ms_mean": round(stats["db_ms"] / stats["requests"], 2),
+                    "over_budget": stats["over_budget"],
+                    "top_queries": dict(sorted(stats["by_key"].items(), key=lambda item: -item[1])[: self.top_keys]),
+                }
+                for route, stats in self.routes.items()
+            }
+        return {"query_budget": settings.DB_QUERY_BUDGET_PER_REQUEST, "routes": routes}
+
+
+route_query_stats = RouteQueryStats()
+
+
+def finish_request(route: str, queries: RequestQueries) -> None:
+    """Aggregates the request's queries and warns when it blew the per-request budget (usually an N+1 loop)."""
+    budget = settings.DB_QUERY_BUDGET_PER_REQUEST
+    over_budget = budget > 0 and queries.count > budget
+    route_query_stats.record(route, queries, over_budget)
+    if over_budget:
+        repeated = queries.most_repeated()
+        logger.warning(
+            "DB QUERY BUDGET EXCEEDED | request_id=%s | route=%s | queries=%s | budget=%s | db_ms=%.2f | most_repeated=%s x%s",
+            queries.request_id,
+            route,
+            queries.count,
+            budget,
+            queries.duration_ms,
+            repeated[0] if repeated else None,
+            repeated[1] if repeated else 0,
+        )
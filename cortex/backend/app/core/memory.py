@@ -0,0 +1,161 @@
+"""
+Per-job memory budget for report jobs.
+
+The worker shares its process with the API, so a job that parses a large,
+wide upload can take the whole server down with it. JobMemory gives each job
+a budget (JOB_MEMORY_BUDGET_MB) and enforces it twice:
+
+- Before each file is loaded, the frame is sized from the upload's sniffed
+  schema plus a parsed sample (ingestion.estimate_load). A load that would
+  not fit in one pass takes the chunked CSV path, whose peak is roughly the
+  frame itself; one that would not fit either way fails the job up front
+  with JobMemoryExceeded instead of allocating.
+- While the job runs, a daemon thread samples process RSS. Stage boundaries
+  (StageTracker.done) record each stage's peak growth over the job's
+  baseline and fail the job once it passes the budget, before the next stage
+  allocates more.
+
+RSS is per process, so growth from requests served while the job runs is
+counted against it too; the worker runs one job at a time, so other jobs'
+frames only show up in the baseline.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import JOB_MEMORY_ACTIONS, JOB_MEMORY_PEAK_BYTES
+from app.core.observability import get_logger, instrument_class_methods, log_step
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+# Normalize copies the frame and widgets add group-bys on top of it; loads are
+# planned with this much headroom over their own estimate so a job that is
+# admitted also clears the stage checks (calibrated on benchmarks/datasets.py
+# shapes: whole-job peaks came in at 1.1x the full and chunked load estimates)
+PIPELINE_HEADROOM = 1.25
+
+
+class JobMemoryExceeded(Exception):
+    """A report job needs, or has grown to, more memory than JOB_MEMORY_BUDGET_MB allows."""
+    pass
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process; None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _mb(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value / MB, 1)
+
+
+class JobMemory:
+    """Budget, load reservations and sampled RSS peaks for one report job."""
+
+    def __init__(self, job_id: Optional[str] = None, budget_mb: Optional[int] = None, interval_ms: Optional[float] = None):
+        self.job_id = job_id
+        budget_mb = settings.JOB_MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+        self.budget = budget_mb * MB if budget_mb > 0 else None
+        self.interval = (interval_ms or settings.JOB_MEMORY_SAMPLE_INTERVAL_MS) / 1000.0
+        self.reserved = 0  # Estimated bytes of the frames loaded so far
+        self.loads: Dict[str, Dict[str, Any]] = {}  # path -> estimate and chosen mode
+        self.stage_peaks: Dict[str, float] = {}  # stage -> peak growth over baseline, bytes
+        self.baseline: Optional[int] = None
+        self.peak = 0
+        self._stage_peak = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "JobMemory":
+        self.baseline = process_rss_bytes()
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._run, name="cortex-job-memory", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> "JobMemory":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._sample()
+            JOB_MEMORY_PEAK_BYTES.observe(self.peak)
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> int:
+        rss = process_rss_bytes()
+        if rss is None or self.baseline is None:
+            return 0
+        growth = max(rss - self.baseline, 0)
+        with self._lock:
+            self.peak = max(self.peak, growth)
+            self._stage_peak = max(self._stage_peak, growth)
+        return growth
+
+    def plan_load(self, path: str, estimate: Optional[Dict[str, Any]]) -> str:
+        """
+        'full' or 'chunked' for loading `path`, given ingestion.estimate_load's
+        frame_bytes (steady state) and peak_bytes (one-pass parse). Raises
+        JobMemoryExceeded when even the chunked path would not fit.
+        """
+        if estimate is None:
+            self.loads[path] = {"mode": "full", "estimated": False}
+            return "full"
+        frame_bytes, peak_bytes = estimate["frame_bytes"], estimate["peak_bytes"]
+        remaining = None if self.budget is None else self.budget - self.reserved
+        if remaining is None or peak_bytes * PIPELINE_HEADROOM <= remaining:
+            mode = "full"
+        elif estimate.get("chunkable") and frame_bytes * PIPELINE_HEADROOM <= remaining:
+            mode = "chunked"
+        else:
+            needed = (frame_bytes if estimate.get("chunkable") else peak_bytes) * PIPELINE_HEADROOM
+            JOB_MEMORY_ACTIONS.labels("rejected").inc()
+            log_step(logger, "memory.load.rejected", job_id=self.job_id, file_path=path, needed_mb=_mb(needed), remaining_mb=_mb(remaining))
+            raise JobMemoryExceeded(
+                f"{os.path.basename(path)} needs an estimated {_mb(needed):.0f} MB in memory "
+                f"({estimate.get('rows')} rows x {estimate.get('columns')} columns used by the report); this job has "
+                f"{_mb(max(remaining, 0)):.0f} MB of its {_mb(self.budget):.0f} MB budget left. "
+                "Upload fewer rows or drop unused columns."
+            )
+        if mode == "chunked":
+            JOB_MEMORY_ACTIONS.labels("chunked").inc()
+        self.reserved += frame_bytes
+        self.loads[path] = {"mode": mode, "frame_mb": _mb(frame_bytes), "peak_mb": _mb(peak_bytes)}
+        log_step(logger, "memory.load.planned", job_id=self.job_id, file_path=path, mode=mode, frame_mb=_mb(frame_bytes), peak_mb=_mb(peak_bytes), reserved_mb=_mb(self.reserved))
+        return mode
+
+    def stage_done(self, stage: str) -> None:
+        """Records the stage's peak growth; raises JobMemoryExceeded once it passed the budget."""
+        growth = self._sample()
+        with self._lock:
+            stage_peak, self._stage_peak = self._stage_peak, growth
+        self.stage_peaks[stage] = stage_peak
+        if self.budget is not None and stage_peak > self.budget:
+            JOB_MEMORY_ACTIONS.labels("exceeded").inc()
+            raise JobMemoryExceeded(
+                f"Report job grew the server's memory by {_mb(stage_peak):.0f} MB during {stage}, "
+                f"over its {_mb(self.budget):.0f} MB budget. Upload fewer rows or drop unused columns."
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "budget_mb": _mb(self.budget),
+            "reserved_mb": _mb(self.reserved),
+            "peak_mb": _mb(self.peak) if self.baseline is not None else None,
+            "stage_peak_mb": {stage: _mb(peak) for stage, peak in self.stage_peaks.items()},
+            "loads": dict(self.loads),
+        }
+
+
+instrument_class_methods(JobMemory, logger, exclude_names={"_run", "_sample", "stage_done", "plan_load"})
@@ -0,0 +1,124 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Single process: the default registry, plus the standard process_* and
+python_* collectors.
+
+Several worker processes (gunicorn/uvicorn --workers): point
+PROMETHEUS_MULTIPROC_DIR at an empty directory shared by the workers and
+cleared before they start. Each worker then writes its samples to mmap'd
+files there, and whichever worker answers /metrics aggregates all of them.
+Gauges declare how they aggregate (queue depth sums over live workers, RSS
+is reported per pid).
+"""
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+from app.schemas.report import JobStatus
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+# --- HTTP ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "cortex_http_request_duration_seconds",
+    "Request latency by route template, including middleware.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS = Counter("cortex_http_requests_total", "Requests by route template and status code.", ["method", "route", "status"])
+
+# --- Report jobs ---
+
+JOBS_BY_STATUS = Gauge("cortex_report_jobs", "Report jobs held by JobManager, by status.", ["status"], multiprocess_mode="livesum")
+JOB_PHASE_SECONDS = Histogram(
+    "cortex_report_job_phase_seconds",
+    "Time spent per report pipeline stage (see STAGE_PROGRESS in analysis.py, plus serialize).",
+    ["phase"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+JOB_SECONDS = Histogram(
+    "cortex_report_job_duration_seconds",
+    "Wall time from dequeue to terminal status.",
+    ["outcome"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+JOB_MEMORY_PEAK_BYTES = Histogram(
+    "cortex_report_job_memory_peak_bytes",
+    "Peak RSS growth over the job's starting point (see app/core/memory.py).",
+    buckets=tuple(mb * 1024 * 1024 for mb in (16, 64, 128, 256, 512, 1024, 2048, 4096)),
+)
+JOB_MEMORY_ACTIONS = Counter(
+    "cortex_report_job_memory_budget_total",
+    "Per-job memory budget interventions: chunked (load switched to the chunked path), rejected (failed before loading), exceeded (failed at a stage boundary).",
+    ["action"],
+)
+JOB_QUEUE_LEASES = Counter(
+    "cortex_report_queue_leases_total",
+    "Queue lease events: claimed, lost (a heartbeat found it taken back), redelivered (expired, queued again), dead_lettered (expired with no attempts left).",
+    ["event"],
+)
+JOBS_REAPED = Counter("cortex_report_jobs_reaped_total", "Jobs failed by the reaper after exceeding the processing timeout.")
+IDEMPOTENCY_HITS = Counter("cortex_report_idempotency_hits_total", "Job requests answered with an existing job for the same file set.", ["endpoint"])
+
+# --- Uploads ---
+
+UPLOAD_BYTES = Counter("cortex_upload_bytes_total", "Bytes received by accepted uploads; rate() gives bytes/sec.", ["mode"])
+UPLOAD_THROUGHPUT = Histogram(
+    "cortex_upload_throughput_bytes_per_second",
+    "Per-request upload throughput (blob or multipart part).",
+    ["mode"],
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6),
+)
+
+# --- Process ---
+
+PROCESS_RSS = Gauge(
+    "cortex_process_resident_memory_bytes",
+    "Resident set size per worker, sampled at scrape time and after each report job.",
+    multiprocess_mode="liveall",
+)
+
+
+def observe_upload(mode: str, received_bytes: int, started: float) -> None:
+    UPLOAD_BYTES.labels(mode).inc(received_bytes)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        UPLOAD_THROUGHPUT.labels(mode).observe(received_bytes / elapsed)
+
+
+def job_status_changed(old_status: Optional[JobStatus], new_status: JobStatus) -> None:
+    if old_status == new_status:
+        return
+    if old_status is not None:
+        JOBS_BY_STATUS.labels(old_status.value).dec()
+    JOBS_BY_STATUS.labels(new_status.value).inc()
+
+
+def sample_process_rss() -> None:
+    from app.core.memory import process_rss_bytes
+
+    rss = process_rss_bytes()
+    # None when not on Linux; single-process mode still has process_resident_memory_bytes where supported
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+
+
+def render_latest() -> bytes:
+    sample_process_rss()
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """Drops this worker's live gauges from the shared directory on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
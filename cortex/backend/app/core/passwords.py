@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_module_functions, log_step
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+logger = get_logger(__name__)
+
+# Password hashing runs on its own small pool so a burst of logins can't
+# occupy every request thread with ~100-250 ms of CPU-bound work each.
+HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1)
+HASH_QUEUE_LIMIT = HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE
+TIMING_WINDOW = 256
+
+
+class PasswordHashingBusy(RuntimeError):
+    """
+    Raised when the hashing queue is full, or a blocking call waited past
+    PASSWORD_HASH_TIMEOUT_SECONDS; callers should answer 503 + Retry-After.
+    """
+    pass
+
+
+def _argon2_available() -> bool:
+    try:
+        from passlib.hash import argon2
+        return argon2.has_backend()
+    except Exception:
+        return False
+
+
+def _build_context() -> "CryptContext":
+    from passlib.context import CryptContext
+
+    scheme = settings.PASSWORD_HASH_SCHEME
+    if scheme == "argon2" and not _argon2_available():
+        log_step(logger, "passwords.argon2_unavailable", fallback="bcrypt")
+        scheme = "bcrypt"
+    schemes = [scheme] + [other for other in ("argon2", "bcrypt") if other != scheme]
+    # deprecated="auto": every non-default scheme (and default-scheme hashes
+    # with outdated cost settings) reports needs_update -> rehash on login.
+    return CryptContext(
+        schemes=schemes,
+        default=scheme,
+        deprecated="auto",
+        argon2__type="ID",
+        argon2__time_cost=settings.ARGON2_TIME_COST,
+        argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+        argon2__parallelism=settings.ARGON2_PARALLELISM,
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    )
+
+
+_pwd_context: Optional["CryptContext"] = None
+_context_lock = threading.Lock()
+
+
+def get_pwd_context() -> "CryptContext":
+    """Built on first use: passlib and its argon2/bcrypt backends stay out of startup."""
+    global _pwd_context
+    if _pwd_context is None:
+        with _context_lock:
+            if _pwd_context is None:
+                _pwd_context = _build_context()
+    return _pwd_context
+
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pwhash")
+# Counts running + waiting hash operations; bounds the executor's queue.
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+class HashTimings:
+    """Rolling hash/verify latencies, so cost settings can be tuned against latency targets."""
+
+    def __init__(self, window: int = TIMING_WINDOW):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Deque[float]] = {}
+        self._waits: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self.rejected = 0
+        self.rehashed = 0
+        self.window = window
+
+    def record(self, operation: str, duration_ms: float, wait_ms: float) -> None:
+        with self._lock:
+            self._durations.setdefault(operation, deque(maxlen=self.window)).append(duration_ms)
+            self._waits.setdefault(operation, deque(maxlen=self.window)).append(wait_ms)
+            self._counts[operation] = self._counts.get(operation, 0) + 1
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def record_rehash(self) -> None:
+        with self._lock:
+            self.rehashed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {
+                operation: {
+                    "count": self._counts[operation],
+                    "duration_ms": _percentiles(self._durations[operation]),
+                    "queue_wait_ms": _percentiles(self._waits[operation]),
+                }
+                for operation in self._counts
+            }
+            return {
+                "scheme": get_pwd_context().default_scheme(),
+                "workers": HASH_WORKERS,
+                "queue_limit": HASH_QUEUE_LIMIT,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "operations": operations,
+            }
+
+
+def _percentiles(values: Deque[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 2)}
+
+
+hash_timings = HashTimings()
+
+
+def _submit(operation: str, func: Callable[..., Any], *args: Any):
+    if not _slots.acquire(blocking=False):
+        hash_timings.record_rejected()
+        log_step(logger, "passwords.queue_full", operation=operation, queue_limit=HASH_QUEUE_LIMIT)
+        raise PasswordHashingBusy("Too many sign-in attempts in progress. Please retry shortly.")
+
+    queued_at = time.perf_counter()
+
+    def run() -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            _slots.release()
+            hash_timings.record(operation, (finished - started) * 1000, (started - queued_at) * 1000)
+
+    try:
+        return _executor.submit(run)
+    except Exception:
+        _slots.release()
+        raise
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit("hash", get_pwd_context().hash, password))
+
+
+async def verify_password_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (valid, replacement_hash). replacement_hash is set when the stored
+    hash uses a deprecated scheme or outdated cost; persist it to upgrade.
+    """
+    return await asyncio.wrap_future(_submit("verify", get_pwd_context().verify_and_update, password, hashed_password))
+
+
+def _wait(operation: str, future: Future) -> Any:
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        # Still queued: drop it and free its slot. Already running: it
+        # finishes on its own and run() frees the slot.
+        if future.cancel():
+            _slots.release()
+        hash_timings.record_rejected()
+        log_step(logger, "passwords.wait_timeout", operation=operation, timeout_s=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+        raise PasswordHashingBusy("Password hashing is taking too long right now. Please retry shortly.")
+
+
+def hash_password(password: str) -> str:
+    """Blocking variant for sync (threadpool) routes; still bounded by the hashing pool."""
+    return _wait("hash", _submit("hash", get_pwd_context().hash, password))
+
+
+def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Blocking variant of verify_password_async."""
+    return _wait("verify", _submit("verify", get_pwd_context().verify_and_update, password, hashed_password))
+
+
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "_percentiles", "_wait", "get_pwd_context"})
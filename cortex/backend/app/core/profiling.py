@@ -0,0 +1,203 @@
+"""
+Opt-in sampling CPU profiler.
+
+A daemon thread snapshots Python stacks (sys._current_frames) at a fixed
+interval and counts identical stacks; the result is written in collapsed
+stack format ("root;caller;callee <count>"), which speedscope
+(https://www.speedscope.app) and flamegraph.pl open directly.
+
+- Report jobs: with PROFILE_JOBS_OVER_SECONDS > 0 the worker samples the
+  pipeline thread of every job and keeps the profile only when the job ran
+  longer than that, as {UPLOAD_DIR}/{job_id}_profile.folded.
+- Requests: a senior arms a route via POST /admin/profiling/requests; the
+  next N matching requests are profiled into PROFILE_DIR. Requests share the
+  event loop and thread pool, so these sample every thread for the
+  request's lifetime, one root frame per thread.
+"""
+import collections
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_class_methods, log_step
+
+logger = get_logger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Samples `thread_ids` (None = every thread but the sampler's) until stopped."""
+
+    def __init__(self, thread_ids: Optional[List[int]] = None, interval_ms: Optional[float] = None):
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.interval = (interval_ms or settings.PROFILE_SAMPLE_INTERVAL_MS) / 1000.0
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_current_thread(cls, interval_ms: Optional[float] = None) -> "StackSampler":
+        return cls([threading.get_ident()], interval_ms)
+
+    def start(self) -> "StackSampler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="cortex-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                if self.thread_ids is None:
+                    stack.append(f"thread {names.get(thread_id, thread_id)}")
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.collapsed())
+        os.replace(temp_path, path)
+        return path
+
+
+def _route_pattern(route: str) -> "re.Pattern[str]":
+    # "/service/issues/{issue_id}/graph" -> ^/service/issues/[^/]+/graph$
+    parts = re.split(r"(\{[^}]+\})", route)
+    return re.compile("^" + "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts) + "$")
+
+
+class ProfileRegistry:
+    """Routes armed for request profiling and the profiles (requests and jobs) recently written by this process."""
+
+    def __init__(self, keep: int = 50):
+        self._lock = threading.Lock()
+        # (METHOD, route template) -> [compiled pattern, remaining]
+        self.armed: Dict[tuple, List[Any]] = {}
+        self.recent: Deque[Dict[str, Any]] = collections.deque(maxlen=keep)
+
+    def arm(self, method: str, route: str, count: int) -> Dict[str, Any]:
+        key = (method.upper(), route)
+        with self._lock:
+            self.armed[key] = [_route_pattern(route), count]
+        log_step(logger, "profiling.requests.armed", method=key[0], route=route, count=count)
+        return {"method": key[0], "route": route, "remaining": count}
+
+    def disarm(self) -> None:
+        with self._lock:
+            self.armed.clear()
+
+    def claim(self, method: str, path: str) -> Optional[str]:
+        """Route template if this request should be profiled; decrements the route's budget."""
+        if not self.armed:
+            return None
+        with self._lock:
+            for key, entry in list(self.armed.items()):
+                if key[0] != method or not entry[0].match(path):
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self.armed[key]
+                return key[1]
+        return None
+
+    def record(self, kind: str, name: str, path: str, sampler: StackSampler, **context: Any) -> None:
+        entry = {
+            "kind": kind,
+            "name": name,
+            "path": path,
+            "samples": sampler.samples,
+            "duration_s": round(sampler.duration, 3),
+            "recorded_at": time.time(),
+            **context,
+        }
+        with self._lock:
+            self.recent.append(entry)
+        log_step(logger, "profiling.saved", kind=kind, name=name, samples=sampler.samples, duration_s=entry["duration_s"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            armed = [{"method": key[0], "route": key[1], "remaining": entry[1]} for key, entry in self.armed.items()]
+            recent = list(self.recent)
+        return {
+            "job_threshold_seconds": settings.PROFILE_JOBS_OVER_SECONDS,
+            "sample_interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+            "armed": armed,
+            "profiles": recent,
+        }
+
+    def find(self, name: str) -> Optional[str]:
+        with self._lock:
+            for entry in self.recent:
+                if entry["name"] == name:
+                    return entry["path"]
+        return None
+
+
+profile_registry = ProfileRegistry()
+
+
+def request_profile_path(request_id: str, method: str, route: str) -> str:
+    slug = _SAFE_NAME.sub("_", route.strip("/")) or "root"
+    return os.path.join(settings.PROFILE_DIR, f"request_{request_id}_{method}_{slug}{PROFILE_SUFFIX}")
+
+
+def job_profile_path(job_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, f"{job_id}_profile{PROFILE_SUFFIX}")
+
+
+def finish_request_profile(sampler: StackSampler, request_id: str, method: str, route: str, status_code: Optional[int]) -> str:
+    """Stops and saves a request profile; returns its name for the X-Profile header."""
+    sampler.stop()
+    path = sampler.save(request_profile_path(request_id, method, route))
+    name = os.path.basename(path)
+    profile_registry.record("request", name, path, sampler, request_id=request_id, route=f"{method} {route}", status_code=status_code)
+    return name
+
+
+def finish_job_profile(sampler: StackSampler, job_id: str) -> Optional[str]:
+    """Stops the job's sampler; saves it only if the job crossed PROFILE_JOBS_OVER_SECONDS."""
+    sampler.stop()
+    if sampler.duration < settings.PROFILE_JOBS_OVER_SECONDS:
+        return None
+    path = sampler.save(job_profile_path(job_id))
+    profile_registry.record("job", os.path.basename(path), path, sampler, job_id=job_id)
+    return path
+
+
+instrument_class_methods(ProfileRegistry, logger, exclude_names={"claim"})
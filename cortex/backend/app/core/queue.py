@@ -1,96 +1,599 @@
-from typing import Optional
+"""
+Report job queue: lease-based claims that any number of worker processes share.
+
+Claiming a job takes a lease on it rather than removing it. The same
+transaction that picks the row writes the claiming worker's id and an
+expiry, so no two workers run one job. While the pipeline runs, the worker
+heartbeats (JOB_QUEUE_HEARTBEAT_SECONDS). Each heartbeat extends the lease
+and publishes progress for processes that serve polls without running the
+job. An expired lease means its worker died (crash, OOM kill, deploy). The
+reaper then queues the job again, and after JOB_QUEUE_MAX_ATTEMPTS claims
+dead-letters it: the job is failed and its row kept, rather than taking down
+one worker after another. Jobs that fail inside the pipeline (bad data,
+timeout, memory budget) are acked as failed; only lost workers cause
+redelivery.
+
+Backends (JOB_QUEUE_BACKEND):
+- memory (default): per process. One process claims and runs everything.
+- sqlite: a file shared by the processes on one host. Each operation is one
+  short IMMEDIATE transaction.
+- postgres: sql/13_report_queue.sql, called over PostgREST. Claims use
+  FOR UPDATE SKIP LOCKED, so workers on any host take different rows without
+  waiting on each other's locks. Uploads must sit on storage those hosts share.
+
+What scales out is job execution only: with sqlite or postgres, extra
+`python -m app.worker` processes claim and run jobs next to the API. The API
+itself stays one process (uvicorn --workers 1). Upload sessions, batch groups
+(job_groups_db), the idempotency index and the MAX_PENDING_JOBS /
+per-user caps are in its memory, and a second API process would see none
+of them.
+
+jobs_db (app/services/jobs.py) stays each process's own view. With a shared
+backend, the queue row also carries the job's spec, progress and finished
+result, so the API can serve a job that a worker process ran
+(QueueService.sync).
+"""
 import asyncio
-from app.services.jobs import JobManager, jobs_db
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.jobs import JobManager, TERMINAL_STATUSES, jobs_db
+from app.services.report_payloads import SerializedReport
 from app.schemas.report import JobStatus
+from app.core.config import settings
+from app.core.metrics import JOB_QUEUE_LEASES, JOBS_REAPED
 from app.core.observability import get_logger, instrument_class_methods, log_step
 
 logger = get_logger(__name__)
 
-# Strategy: DB as Queue (Poller) for V1
-# Since we are using an in-memory JobManager (Stub) for Phase B/C,
-# The QueueService will simply interface with that.
-# In a real DB scenario, this would generate SQL queries.
+# Lease holder id for this process: host and pid identify it in logs; the
+# suffix keeps a recycled pid from inheriting a dead process's leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Row states: queued -> leased -> done, or leased -> queued again when a lease
+# expires or is released, until a job out of attempts goes to dead.
+DEAD_LETTER_ERROR = "Report job was abandoned: the worker running it stopped responding on every attempt. Please try again."
+
+
+def pick_fair(candidates: Iterable[Dict[str, Any]], leased_by_owner: Dict[str, int], last_served: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Fair share across owners, given each owner's oldest queued row: the owner
+    with the fewest jobs already leased, then the least recently served. A
+    user with a 30-job batch shares the workers with everyone else instead of
+    monopolising them until the batch drains; within an owner it stays FIFO.
+    """
+    return min(
+        candidates,
+        key=lambda row: (
+            leased_by_owner.get(row["owner_emp_id"], 0),
+            last_served.get(row["owner_emp_id"], 0.0),
+            row["enqueued_at"],
+        ),
+    )
+
+
+class InProcessQueueBackend:
+    """Per-process queue. Fine for one process; queued jobs are lost on restart."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._last_served: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, job_id: str, owner_emp_id: str, spec: Dict[str, Any], now: float) -> None:
+        with self._lock:
+            self._rows[job_id] = {
+                "job_id": job_id, "owner_emp_id": owner_emp_id, "spec": spec, "state": "queued",
+                "attempts": 0, "enqueued_at": now, "worker_id": None, "lease_expires_at": None,
+            }
+
+    def claim(self, worker_id: str, lease_seconds: float, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            leased = Counter(row["owner_emp_id"] for row in self._rows.values() if row["state"] == "leased")
+            oldest: Dict[str, Dict[str, Any]] = {}
+            for row in self._rows.values():
+                current = oldest.get(row["owner_emp_id"])
+                if row["state"] == "queued" and (current is None or row["enqueued_at"] < current["enqueued_at"]):
+                    oldest[row["owner_emp_id"]] = row
+            if not oldest:
+                return None
+            row = pick_fair(oldest.values(), leased, self._last_served)
+            row.update(state="leased", worker_id=worker_id, attempts=row["attempts"] + 1, lease_expires_at=now + lease_seconds)
+            self._last_served[row["owner_emp_id"]] = now
+            return dict(row)
+
+    def _held(self, job_id: str, worker_id: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(job_id)
+        return row if row and row["state"] == "leased" and row["worker_id"] == worker_id else None
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float, now: float, progress: int, stage: Optional[str]) -> bool:
+        with self._lock:
+            row = self._held(job_id, worker_id)
+            if row:
+                row["lease_expires_at"] = now + lease_seconds
+            return row is not None
+
+    def complete(self, job_id: str, worker_id: str, now: float, status: str, progress: int, stage: Optional[str], error: Optional[str], result: Optional[bytes]) -> bool:
+        # Nothing else reads this process's rows: the finished job lives on in jobs_db
+        with self._lock:
+            row = self._held(job_id, worker_id)
+            if row:
+                del self._rows[job_id]
+            return row is not None
+
+    def release(self, job_id: str, worker_id: str, now: float) -> bool:
+        with self._lock:
+            row = self._held(job_id, worker_id)
+            if row:
+                row.update(state="queued", worker_id=None, lease_expires_at=None)
+            return row is not None
+
+    def reap(self, now: float, max_attempts: int, retention_seconds: float) -> List[Dict[str, Any]]:
+        expired = []
+        with self._lock:
+            for job_id, row in list(self._rows.items()):
+                if row["state"] != "leased" or row["lease_expires_at"] >= now:
+                    continue
+                expired.append({"job_id": job_id, "worker_id": row["worker_id"], "attempts": row["attempts"]})
+                if row["attempts"] >= max_attempts:
+                    del self._rows[job_id]
+                    expired[-1].update(state="dead", error=DEAD_LETTER_ERROR)
+                else:
+                    row.update(state="queued", worker_id=None, lease_expires_at=None)
+                    expired[-1]["state"] = "queued"
+        return expired
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        with self._lock:
+            states = Counter(row["state"] for row in self._rows.values())
+            queued = [row["enqueued_at"] for row in self._rows.values() if row["state"] == "queued"]
+        return {"states": dict(states), "oldest_queued_seconds": round(now - min(queued), 1) if queued else None}
+
+
+class SQLiteQueueBackend:
+    """
+    Queue in a SQLite file shared by every process on the host. Claims,
+    heartbeats and acks are each one IMMEDIATE transaction, so a row is
+    leased by exactly one process even with several claiming at once.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS job_queue (
+            job_id TEXT PRIMARY KEY,
+            owner_emp_id TEXT NOT NULL,
+            spec TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            enqueued_at REAL NOT NULL,
+            worker_id TEXT,
+            lease_expires_at REAL,
+            heartbeat_at REAL,
+            progress INTEGER NOT NULL DEFAULT 0,
+            stage TEXT,
+            status TEXT,
+            error TEXT,
+            result BLOB,
+            finished_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_job_queue_state ON job_queue(state, enqueued_at)",
+        "CREATE TABLE IF NOT EXISTS job_queue_owners (owner_emp_id TEXT PRIMARY KEY, last_served_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._SCHEMA:
+            self._conn.execute(statement)
+
+    def _write(self, fn):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(cursor)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return result
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        data["spec"] = json.loads(data["spec"])
+        return data
+
+    def enqueue(self, job_id: str, owner_emp_id: str, spec: Dict[str, Any], now: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_queue (job_id, owner_emp_id, spec, state, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, owner_emp_id, json.dumps(spec), now),
+            )
+
+    def claim(self, worker_id: str, lease_seconds: float, now: float) -> Optional[Dict[str, Any]]:
+        def pick(cursor: sqlite3.Cursor) -> Optional[Dict[str, Any]]:
+            # SQLite returns the row holding MIN() for the bare columns: each owner's oldest job
+            oldest = cursor.execute(
+                "SELECT job_id, owner_emp_id, MIN(enqueued_at) AS enqueued_at FROM job_queue "
+                "WHERE state = 'queued' GROUP BY owner_emp_id"
+            ).fetchall()
+            if not oldest:
+                return None
+            leased = dict(cursor.execute(
+                "SELECT owner_emp_id, COUNT(*) FROM job_queue WHERE state = 'leased' GROUP BY owner_emp_id"
+            ).fetchall())
+            last_served = dict(cursor.execute("SELECT owner_emp_id, last_served_at FROM job_queue_owners").fetchall())
+            chosen = pick_fair([dict(row) for row in oldest], leased, last_served)
+            row = cursor.execute(
+                "UPDATE job_queue SET state = 'leased', worker_id = ?, attempts = attempts + 1, "
+                "lease_expires_at = ?, heartbeat_at = ? WHERE job_id = ? RETURNING *",
+                (worker_id, now + lease_seconds, now, chosen["job_id"]),
+            ).fetchone()
+            cursor.execute(
+                "INSERT INTO job_queue_owners (owner_emp_id, last_served_at) VALUES (?, ?) "
+                "ON CONFLICT(owner_emp_id) DO UPDATE SET last_served_at = excluded.last_served_at",
+                (chosen["owner_emp_id"], now),
+            )
+            return self._row(row)
+
+        return self._write(pick)
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float, now: float, progress: int, stage: Optional[str]) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_queue SET lease_expires_at = ?, heartbeat_at = ?, progress = ?, stage = ? "
+                "WHERE job_id = ? AND worker_id = ? AND state = 'leased'",
+                (now + lease_seconds, now, progress, stage, job_id, worker_id),
+            ).rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, now: float, status: str, progress: int, stage: Optional[str], error: Optional[str], result: Optional[bytes]) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_queue SET state = 'done', status = ?, progress = ?, stage = ?, error = ?, result = ?, "
+                "finished_at = ?, lease_expires_at = NULL WHERE job_id = ? AND worker_id = ? AND state = 'leased'",
+                (status, progress, stage, error, result, now, job_id, worker_id),
+            ).rowcount == 1
+
+    def release(self, job_id: str, worker_id: str, now: float) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_queue SET state = 'queued', worker_id = NULL, lease_expires_at = NULL "
+                "WHERE job_id = ? AND worker_id = ? AND state = 'leased'",
+                (job_id, worker_id),
+            ).rowcount == 1
+
+    def reap(self, now: float, max_attempts: int, retention_seconds: float) -> List[Dict[str, Any]]:
+        def expire(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+            expired = [dict(row) for row in cursor.execute(
+                "SELECT job_id, worker_id, attempts FROM job_queue WHERE state = 'leased' AND lease_expires_at < ?", (now,)
+            ).fetchall()]
+            for row in expired:
+                if row["attempts"] >= max_attempts:
+                    row.update(state="dead", error=DEAD_LETTER_ERROR)
+                    cursor.execute(
+                        "UPDATE job_queue SET state = 'dead', status = ?, error = ?, finished_at = ?, "
+                        "worker_id = NULL, lease_expires_at = NULL WHERE job_id = ?",
+                        (JobStatus.FAILED.value, DEAD_LETTER_ERROR, now, row["job_id"]),
+                    )
+                else:
+                    row["state"] = "queued"
+                    cursor.execute(
+                        "UPDATE job_queue SET state = 'queued', worker_id = NULL, lease_expires_at = NULL WHERE job_id = ?",
+                        (row["job_id"],),
+                    )
+            cursor.execute(
+                "DELETE FROM job_queue WHERE state IN ('done', 'dead') AND finished_at < ?", (now - retention_seconds,)
+            )
+            return expired
+
+        return self._write(expire)
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        placeholders = ",".join("?" for _ in job_ids)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM job_queue WHERE job_id IN ({placeholders})", job_ids).fetchall()
+        return {row["job_id"]: self._row(row) for row in rows}
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        with self._lock:
+            states = dict(self._conn.execute("SELECT state, COUNT(*) FROM job_queue GROUP BY state").fetchall())
+            oldest = self._conn.execute("SELECT MIN(enqueued_at) FROM job_queue WHERE state = 'queued'").fetchone()[0]
+        return {"states": states, "oldest_queued_seconds": round(now - oldest, 1) if oldest is not None else None}
+
+
+class PostgresQueueBackend:
+    """
+    Queue in the report_queue table (sql/13_report_queue.sql), called through
+    the service-role client. Lease times come from the database clock, so
+    `now` is ignored and workers on hosts with skewed clocks still agree.
+    """
+
+    name = "postgres"
+    shared = True
+    TABLE = "report_queue"
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    @staticmethod
+    def _row(row: Dict[str, Any]) -> Dict[str, Any]:
+        if row.get("result") is not None:
+            row["result"] = row["result"].encode()
+        return row
+
+    def _held(self, function: str, params: Dict[str, Any]) -> bool:
+        return self.client.rpc(function, params).execute().data is True
+
+    def enqueue(self, job_id: str, owner_emp_id: str, spec: Dict[str, Any], now: float) -> None:
+        self.client.rpc("enqueue_report_job", {"p_job_id": job_id, "p_owner_emp_id": owner_emp_id, "p_spec": spec}).execute()
+
+    def claim(self, worker_id: str, lease_seconds: float, now: float) -> Optional[Dict[str, Any]]:
+        rows = self.client.rpc("claim_report_job", {"p_worker_id": worker_id, "p_lease_seconds": int(lease_seconds)}).execute().data
+        return self._row(rows[0]) if rows else None
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float, now: float, progress: int, stage: Optional[str]) -> bool:
+        return self._held("heartbeat_report_job", {
+            "p_job_id": job_id, "p_worker_id": worker_id, "p_lease_seconds": int(lease_seconds),
+            "p_progress": progress, "p_stage": stage,
+        })
+
+    def complete(self, job_id: str, worker_id: str, now: float, status: str, progress: int, stage: Optional[str], error: Optional[str], result: Optional[bytes]) -> bool:
+        return self._held("complete_report_job", {
+            "p_job_id": job_id, "p_worker_id": worker_id, "p_status": status, "p_progress": progress,
+            "p_stage": stage, "p_error": error, "p_result": result.decode() if result is not None else None,
+        })
+
+    def release(self, job_id: str, worker_id: str, now: float) -> bool:
+        return self._held("release_report_job", {"p_job_id": job_id, "p_worker_id": worker_id})
+
+    def reap(self, now: float, max_attempts: int, retention_seconds: float) -> List[Dict[str, Any]]:
+        rows = self.client.rpc("reap_report_jobs", {
+            "p_max_attempts": max_attempts, "p_retention_seconds": int(retention_seconds), "p_dead_letter_error": DEAD_LETTER_ERROR,
+        }).execute().data or []
+        for row in rows:
+            if row["state"] == "dead":
+                row["error"] = DEAD_LETTER_ERROR
+        return rows
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = self.client.table(self.TABLE).select("*").in_("job_id", job_ids).execute().data or []
+        return {row["job_id"]: self._row(row) for row in rows}
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return self.client.rpc("report_queue_stats", {}).execute().data or {}
+
+
+def _build_backend():
+    if settings.JOB_QUEUE_BACKEND == "postgres":
+        from app.core.database import service_role_supabase
+
+        return PostgresQueueBackend(service_role_supabase)
+    if settings.JOB_QUEUE_BACKEND == "sqlite":
+        try:
+            return SQLiteQueueBackend(settings.JOB_QUEUE_SQLITE_PATH)
+        except sqlite3.Error as e:
+            log_step(logger, "queue.sqlite_unavailable", path=settings.JOB_QUEUE_SQLITE_PATH, error=str(e))
+    return InProcessQueueBackend()
+
+
+queue_backend = _build_backend()
+
+
+async def _call(fn, *args):
+    # Shared backends wait on file locks or PostgREST; keep that off the event loop
+    if queue_backend.shared:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def _needs_sync(job) -> bool:
+    # Jobs this process runs are already current here; finished ones never change again
+    return job is None or (job.status not in TERMINAL_STATUSES and job.worker_id != WORKER_ID)
+
+
+def _apply_row(job_id: str, row: Dict[str, Any]) -> None:
+    """Moves the local job to the state recorded in its queue row."""
+    job = JobManager.get_job(job_id)
+    state = row["state"]
+    if state == "queued":
+        JobManager.update_job_status(job_id, JobStatus.PENDING)
+        return
+    progress = row["progress"] if row.get("progress") is not None else job.progress
+    if job.status == JobStatus.PENDING:
+        JobManager.update_job_status(job_id, JobStatus.PROCESSING, progress=progress)
+    if state == "leased":
+        JobManager.update_job_status(job_id, JobStatus.PROCESSING, progress=progress, stage=row.get("stage"))
+    elif row.get("status") == JobStatus.COMPLETED.value:
+        if row.get("result") is not None:
+            # Compressed here once; polls then serve the cached encodings
+            job.result = SerializedReport(job_id, row["result"])
+        JobManager.update_job_status(job_id, JobStatus.COMPLETED, stage=row.get("stage"))
+    else:
+        JobManager.update_job_status(job_id, JobStatus.FAILED, progress=progress, error=row.get("error") or "Report job failed.")
+
+
+def _sync_rows(job_ids: List[str]) -> None:
+    rows = queue_backend.get_many(job_ids)
+    for job_id, row in rows.items():
+        job = JobManager.get_job(job_id)
+        if job is None:
+            JobManager.adopt_job(job_id, row["owner_emp_id"], row["spec"])
+        elif not _needs_sync(job):
+            continue  # Claimed by this process while the rows were read
+        _apply_row(job_id, row)
+    log_step(logger, "queue.sync", requested=len(job_ids), found=len(rows))
+
 
 class QueueService:
     @staticmethod
     async def enqueue(job_id: str) -> bool:
         """
-        Push job to queue.
-        For V1 (DB as Queue): Just ensures status is PENDING.
+        Push job to queue: marks it PENDING and writes its queue row, with the
+        spec another process needs to run it.
         """
-        # In DB-as-Queue, creating the row with 'pending' IS enqueuing.
-        # So this might be a no-op if JobManager.create already sets PENDING.
-        # But to be explicit/safe:
+        job = JobManager.get_job(job_id)
+        if not job:
+            return False
         JobManager.update_job_status(job_id, JobStatus.PENDING)
-        log_step(logger, "queue.enqueue", job_id=job_id)
+        await _call(queue_backend.enqueue, job_id, job.owner_emp_id, JobManager.job_spec(job), time.time())
+        log_step(logger, "queue.enqueue", job_id=job_id, backend=queue_backend.name)
         return True
 
     @staticmethod
     async def dequeue() -> Optional[str]:
         """
-        Fetch next PENDING job.
-        Simulates: SELECT * FROM jobs WHERE status='PENDING' ORDER BY created_at LIMIT 1 FOR UPDATE SKIP LOCKED
+        Claims the next job under a lease held by this process, fair-shared
+        across owners (see pick_fair). A job created by another process is
+        adopted into jobs_db before its id is returned.
         """
-        # Scan in-memory DB for oldest pending job
-        # Note: This O(N) scan is fine for V1 Stub.
-        
-        # Sort jobs by creation time to ensure FIFO
-        all_jobs = sorted(jobs_db.values(), key=lambda j: j.created_at)
-        
-        for job in all_jobs:
-            if job.status == JobStatus.PENDING:
-                # "Lock" it by setting to PROCESSING (or a transient state if we had one)
-                # In real PGMQ, dequeue hides it. 
-                # Here, we'll return it. The worker immediately marks it PROCESSING.
-                log_step(logger, "queue.dequeue.hit", job_id=job.job_id)
-                return job.job_id
-                
-        log_step(logger, "queue.dequeue.empty")
-        return None
+        lease = await _call(queue_backend.claim, WORKER_ID, settings.JOB_QUEUE_LEASE_SECONDS, time.time())
+        if lease is None:
+            log_step(logger, "queue.dequeue.empty")
+            return None
+
+        job = JobManager.get_job(lease["job_id"]) or JobManager.adopt_job(lease["job_id"], lease["owner_emp_id"], lease["spec"])
+        job.worker_id = WORKER_ID
+        job.attempts = lease["attempts"]
+        JOB_QUEUE_LEASES.labels("claimed").inc()
+        log_step(logger, "queue.dequeue.hit", job_id=job.job_id, owner_emp_id=job.owner_emp_id, attempt=job.attempts)
+        return job.job_id
 
     @staticmethod
-    async def ack(job_id: str):
+    async def heartbeat(job_id: str) -> bool:
         """
-        Acknowledge processing (Remove from queue).
-        In DB-as-Queue, this means reaching a terminal state (COMPLETED/FAILED).
-        Worker handles state updates, so this might be no-op or sanity check.
+        Extends this process's lease and publishes the job's progress. False
+        once the lease is gone: the reaper took it back after a stall, and the
+        job may already be running elsewhere.
         """
-        pass
+        job = JobManager.get_job(job_id)
+        held = await _call(
+            queue_backend.heartbeat, job_id, WORKER_ID, settings.JOB_QUEUE_LEASE_SECONDS, time.time(), job.progress, job.stage
+        )
+        if not held:
+            JOB_QUEUE_LEASES.labels("lost").inc()
+            log_step(logger, "queue.heartbeat.lease_lost", job_id=job_id)
+        return held
 
     @staticmethod
-    async def nack(job_id: str):
+    async def ack(job_id: str) -> bool:
+        """
+        Finishes this process's lease with the job's terminal status, keeping
+        the result for processes that serve polls of it. A job that isn't
+        terminal is nacked instead. False when the lease was lost meanwhile:
+        the redelivered run owns the row.
+        """
+        job = JobManager.get_job(job_id)
+        if not job:
+            return False
+        if job.status not in TERMINAL_STATUSES:
+            return await QueueService.nack(job_id)
+        result = job.result.payload_json if job.result is not None else None
+        acked = await _call(
+            queue_backend.complete, job_id, WORKER_ID, time.time(), job.status.value, job.progress, job.stage, job.error, result
+        )
+        job.worker_id = None
+        if not acked:
+            log_step(logger, "queue.ack.lease_lost", job_id=job_id, status=job.status)
+        return acked
+
+    @staticmethod
+    async def nack(job_id: str) -> bool:
         """
         Negative Ack (Return to queue).
-        Reset to PENDING.
+        Gives this process's lease back and resets the job to PENDING; the
+        claim still counts towards JOB_QUEUE_MAX_ATTEMPTS.
         """
+        released = await _call(queue_backend.release, job_id, WORKER_ID, time.time())
+        job = JobManager.get_job(job_id)
+        if job:
+            job.worker_id = None
         JobManager.update_job_status(job_id, JobStatus.PENDING)
-        log_step(logger, "queue.nack", job_id=job_id)
+        log_step(logger, "queue.nack", job_id=job_id, released=released)
+        return released
 
     @staticmethod
     async def reap_stale_jobs(timeout_seconds: int = 60) -> int:
         """
-        Reaper: Finds jobs stuck in PROCESSING for > timeout.
-        Marks them FAILED.
+        Reaper:
+        - Jobs this process has been running for > timeout are marked FAILED
+          (the worker stops them at the next stage boundary, then acks them).
+        - Leases whose worker stopped heartbeating are queued again, or
+          dead-lettered once they used JOB_QUEUE_MAX_ATTEMPTS claims.
         Returns count of reaped jobs.
         """
-        from datetime import datetime
-        
         reaped_count = 0
         now = datetime.utcnow()
-        
-        # In-memory scan (V1 Stub)
-        # In SQL: UPDATE jobs SET status='FAILED' WHERE status='PROCESSING' AND created_at < NOW() - INTERVAL '60s'
-        for job in jobs_db.values():
-            if job.status == JobStatus.PROCESSING:
+
+        for job in list(jobs_db.values()):
+            if job.status == JobStatus.PROCESSING and job.worker_id == WORKER_ID:
                 started_at = job.processing_started_at or job.created_at
                 duration = (now - started_at).total_seconds()
-                
+
                 if duration > timeout_seconds:
                     logger.warning("Reaping stuck job | job_id=%s | duration_seconds=%.2f", job.job_id, duration)
                     JobManager.mark_timed_out(job.job_id)
+                    JOBS_REAPED.inc()
                     reaped_count += 1
-                    
-        return reaped_count
+
+        expired = await _call(
+            queue_backend.reap, time.time(), settings.JOB_QUEUE_MAX_ATTEMPTS, settings.JOB_QUEUE_RETENTION_SECONDS
+        )
+        for row in expired:
+            redelivered = row["state"] == "queued"
+            JOB_QUEUE_LEASES.labels("redelivered" if redelivered else "dead_lettered").inc()
+            logger.warning(
+                "Lease expired | job_id=%s | worker_id=%s | attempts=%s | outcome=%s",
+                row["job_id"], row["worker_id"], row["attempts"], "redelivered" if redelivered else "dead_lettered",
+            )
+            job = JobManager.get_job(row["job_id"])
+            if job is not None:
+                job.worker_id = None
+                _apply_row(job.job_id, row)
+        return reaped_count + len(expired)
+
+    @staticmethod
+    async def sync(job_ids: Iterable[str]) -> None:
+        """
+        Brings jobs_db up to date with a shared queue for jobs this process
+        isn't running: adopts jobs created by another process and copies
+        progress, errors and finished results. No-op for the memory backend.
+        """
+        if not queue_backend.shared:
+            return
+        stale = [job_id for job_id in dict.fromkeys(job_ids) if _needs_sync(JobManager.get_job(job_id))]
+        if stale:
+            await asyncio.to_thread(_sync_rows, stale)
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        """Rows by state and the oldest queued job's wait, across every process using the backend."""
+        return {"backend": queue_backend.name, "worker_id": WORKER_ID, **queue_backend.stats(time.time())}
 
 
 instrument_class_methods(QueueService, logger)
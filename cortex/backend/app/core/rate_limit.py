@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
+
+logger = get_logger(__name__)
+
+# Rate limiting uses GCRA (generic cell rate algorithm): each key stores a
+# single "theoretical arrival time" (TAT), so state is O(1) per key no matter
+# how many requests it makes. A key whose TAT is in the past has a full
+# bucket, which is indistinguishable from no state at all -> safe to evict.
+
+
+class RateLimitPolicy:
+    """`limit` requests per `period_seconds`, allowing bursts of up to `burst` (default: limit)."""
+
+    def __init__(self, name: str, limit: int, period_seconds: float, burst: Optional[int] = None):
+        if limit <= 0 or period_seconds <= 0:
+            raise ValueError("Rate limit policy needs a positive limit and period")
+        self.name = name
+        self.limit = limit
+        self.period_seconds = period_seconds
+        self.burst = burst or limit
+        self.emission_interval = period_seconds / limit
+        self.tolerance = self.emission_interval * (self.burst - 1)
+
+
+def gcra(tat: Optional[float], now: float, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+    """Returns (allowed, new_tat, retry_after_seconds) for one request."""
+    tat = max(tat or now, now)
+    allow_at = tat - policy.tolerance
+    if now < allow_at:
+        return False, tat, allow_at - now
+    return True, tat + policy.emission_interval, 0.0
+
+
+class InProcessRateLimitBackend:
+    """Per-process state. Fine for one worker; N workers allow N x the rate."""
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, policy: RateLimitPolicy, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            allowed, tat, retry_after = gcra(self._tats.get(key), now, policy)
+            if allowed:
+                self._tats[key] = tat
+            return allowed, retry_after
+
+    def sweep(self, now: float) -> int:
+        with self._lock:
+            idle = [key for key, tat in self._tats.items() if tat <= now]
+            for key in idle:
+                del self._tats[key]
+            return len(idle)
+
+    def size(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteRateLimitBackend:
+    """
+    State in a SQLite file shared by every worker process on the host.
+    Each hit is one short IMMEDIATE transaction, so concurrent workers
+    serialize on the row and the configured rate holds across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def hit(self, key: str, policy: RateLimitPolicy, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                allowed, tat, retry_after = gcra(row[0] if row else None, now, policy)
+                if allowed:
+                    cursor.execute(
+                        "INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET tat = excluded.tat",
+                        (key, tat),
+                    )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return allowed, retry_after
+
+    def sweep(self, now: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,)).rowcount
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, policy: RateLimitPolicy, client_key: str) -> Tuple[bool, float]:
+        allowed, retry_after = self.backend.hit(f"{policy.name}:{client_key}", policy, time.time())
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return allowed, retry_after
+
+    def sweep(self) -> int:
+        return self.backend.sweep(time.time())
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": self.backend.size(), "allowed": self.allowed, "rejected": self.rejected}
+
+
+def _build_backend():
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        try:
+            return SQLiteRateLimitBackend(settings.RATE_LIMIT_SQLITE_PATH)
+        except sqlite3.Error as e:
+            log_step(logger, "rate_limit.sqlite_unavailable", path=settings.RATE_LIMIT_SQLITE_PATH, error=str(e))
+    return InProcessRateLimitBackend()
+
+
+rate_limiter = RateLimiter(_build_backend())
+
+# Per-route policies. Routes sharing a policy share its bucket.
+POLICIES: Dict[str, RateLimitPolicy] = {
+    "auth": RateLimitPolicy("auth", settings.AUTH_RATE_LIMIT, 60, settings.AUTH_RATE_LIMIT_BURST or None),
+}
+
+
+def client_key(request: Request) -> str:
+    client_ip = request.headers.get("X-Forwarded-For")
+    if not client_ip:
+        return request.client.host if request.client else "unknown"
+    return client_ip.split(",")[0].strip()
+
+
+def rate_limit(policy_name: str) -> Callable[[Request], None]:
+    """FastAPI dependency factory: `Depends(rate_limit("auth"))`."""
+    policy = POLICIES[policy_name]
+
+    def dependency(request: Request) -> None:
+        key = client_key(request)
+        allowed, retry_after = rate_limiter.hit(policy, key)
+        if not allowed:
+            log_step(logger, "rate_limit.exceeded", policy=policy.name, client_key=key, retry_after=round(retry_after, 2))
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+    dependency.__name__ = f"rate_limit_{policy_name}"
+    return dependency
+
+
+instrument_class_methods(RateLimiter, logger, exclude_names={"hit"})
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_class_methods", "gcra", "client_key"})
@@ -1,14 +1,18 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Dict, Optional, Set, Tuple
+import hashlib
+import threading
+import time
 import jwt
 from jwt import InvalidTokenError
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from app.core.config import settings
-from app.core.observability import get_logger, instrument_module_functions, log_step
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
+from app.core import passwords
 
 # SECRET KEY - In production, this should be in .env
 # We use the Supabase JWT Secret to ensure PostgREST accepts our tokens for RLS
@@ -17,11 +21,13 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 logger = get_logger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
 class SessionUser(BaseModel):
+    # Instances are shared across requests by the token cache
+    model_config = ConfigDict(frozen=True)
+
     email: str
     emp_id: str
     dept_id: Optional[str] = None
@@ -37,10 +43,11 @@ class SessionUser(BaseModel):
         return self.role == "senior"
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = passwords.verify_password(plain_password, hashed_password)
+    return valid
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     log_step(logger, "security.create_access_token.begin", subject=data.get("sub"), aud=data.get("aud"))
@@ -66,8 +73,148 @@ def decode_access_token(token: str):
         return None
 
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified bearer tokens -> SessionUser, held until
+    the token's `exp`. Keys are SHA-256 digests so raw tokens aren't retained.
+    Revoked digests are remembered until their own expiry, so a revoked
+    token can't be re-admitted by decoding it again.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[SessionUser, float]]" = OrderedDict()
+        self._revoked: Dict[bytes, float] = {}
+        self._by_email: Dict[str, Set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[SessionUser]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, user: SessionUser, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            self._by_email.setdefault(user.email, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def is_revoked(self, key: bytes) -> bool:
+        with self._lock:
+            expires_at = self._revoked.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._revoked[key]
+                return False
+            return True
+
+    def revoke(self, key: bytes, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._drop(key)
+            self._revoked[key] = expires_at
+            # Opportunistic sweep keeps the denylist bounded by live tokens
+            for stale in [k for k, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[stale]
+
+    def revoke_email(self, email: str) -> int:
+        """Revokes every cached session for `email`; returns how many were dropped."""
+        with self._lock:
+            keys = list(self._by_email.get(email, ()))
+            for key in keys:
+                self._revoked[key] = self._entries[key][1]
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_email.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "revoked": len(self._revoked),
+            }
+
+    def _drop(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_email.get(entry[0].email)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_email[entry[0].email]
+
+
+token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def revoke_token(token: str) -> None:
+    """Revocation hook: the token is rejected until it would have expired anyway."""
+    payload = decode_access_token(token)
+    expires_at = float(payload.get("exp", 0)) if payload else 0.0
+    if expires_at:
+        token_cache.revoke(token_cache.digest(token), expires_at)
+    log_step(logger, "security.revoke_token", subject=payload.get("sub") if payload else None)
+
+
+def revoke_user_sessions(email: str) -> int:
+    """
+    Revocation hook for account changes that alter token claims (role,
+    approval, department): the user's cached sessions are rejected until
+    they expire, so the next request has to sign in again.
+    Per process only: tokens cached by other API processes, or not cached
+    here yet, stay valid until their exp.
+    """
+    revoked = token_cache.revoke_email(email)
+    log_step(logger, "security.revoke_user_sessions", email=email, revoked=revoked)
+    return revoked
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)) -> SessionUser:
+    # Hot path: the frontend polls with the same token every few seconds
+    key = token_cache.digest(token)
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached
+
     log_step(logger, "security.get_current_user.begin")
+    if token_cache.is_revoked(key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired or invalid. Please login again.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(
@@ -86,12 +233,15 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> SessionUser:
         )
 
     raw_role = payload.get("user_role") or "team_member"
-    return SessionUser(
+    user = SessionUser(
         email=email,
         emp_id=emp_id,
         dept_id=payload.get("dept_id"),
         role=str(raw_role).strip().lower(),
     )
+    if payload.get("exp"):
+        token_cache.put(key, user, float(payload["exp"]))
+    return user
 
 
 def require_senior(user: SessionUser = Depends(get_current_user)) -> SessionUser:
@@ -103,4 +253,6 @@ def require_senior(user: SessionUser = Depends(get_current_user)) -> SessionUser
     return user
 
 
-instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions"})
+instrument_class_methods(VerifiedTokenCache, logger, exclude_names={"digest", "get", "put", "is_revoked", "_drop"})
+# get_current_user runs on every authenticated request; keep its cache-hit path free of log I/O
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_class_methods", "get_current_user"})
@@ -15,6 +15,7 @@ class JobStateMachine:
     PENDING -> PROCESSING
     PROCESSING -> COMPLETED
     PROCESSING -> FAILED
+    PROCESSING -> PENDING (Lease released or expired: the queue redelivers it)
     FAILED -> PENDING (Retry - explicitly handled by creating new job or resetting)
     
     Terminal States:
@@ -24,7 +25,7 @@ class JobStateMachine:
     
     ALLOWED_TRANSITIONS = {
         JobStatus.PENDING: {JobStatus.PROCESSING},
-        JobStatus.PROCESSING: {JobStatus.COMPLETED, JobStatus.FAILED},
+        JobStatus.PROCESSING: {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.PENDING},
         JobStatus.COMPLETED: set(),  # Terminal
         JobStatus.FAILED: {JobStatus.PENDING}, # Allow manual retry reset
     }
@@ -1,15 +1,22 @@
+import asyncio
 import time
 import uuid
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints.auth import router as auth_router
 from app.api.endpoints.health import router as health_router
+from app.api.endpoints.admin_stats import router as admin_stats_router
 from app.api.endpoints.ingestion import router as ingestion_router
 from app.api.endpoints.reports import router as reports_router
 from app.api.endpoints.resolution import router as resolution_router
 from app.api.endpoints.service_hub import router as service_hub_router
+from app.api.endpoints.profiling import router as profiling_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.db_metrics import RequestQueries, current_queries, finish_request, route_template
+from app.core.metrics import CONTENT_TYPE_LATEST, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, mark_process_dead, render_latest
+from app.core.profiling import StackSampler, finish_request_profile, profile_registry
 from app.core.observability import configure_logging, get_logger, log_step, instrument_module_functions
 
 configure_logging(settings.LOG_LEVEL)
@@ -52,6 +59,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added after CORS so it sits outside it and also compresses CORS-decorated responses
+app.add_middleware(CompressionMiddleware)
+
 # Include Routers
 app.include_router(health_router, prefix="/health", tags=["health"])
 # Also expose the same health endpoints under /api/health for external monitors
@@ -61,35 +71,60 @@ app.include_router(ingestion_router, prefix="/ingest", tags=["ingestion"])
 app.include_router(reports_router, prefix="/reports", tags=["reports"])
 app.include_router(resolution_router, prefix="/resolution", tags=["resolution"])
 app.include_router(service_hub_router, prefix="/service", tags=["service"])
+app.include_router(profiling_router, prefix="/admin/profiling", tags=["admin"])
+app.include_router(admin_stats_router, prefix="/admin/stats", tags=["admin"])
 
 
 @app.middleware("http")
 async def request_logging_middleware(request: Request, call_next):
     request_id = str(uuid.uuid4())[:8]
     started = time.perf_counter()
+    queries = RequestQueries(request_id)
+    queries_token = current_queries.set(queries)
     log_step(logger, "request.start", request_id=request_id, method=request.method, path=request.url.path)
+    profiled_route = profile_registry.claim(request.method, request.url.path)
+    sampler = StackSampler().start() if profiled_route else None
+    response = None
     try:
         response = await call_next(request)
     except Exception:
         duration_ms = (time.perf_counter() - started) * 1000
         logger.exception(
-            "REQUEST ERROR | request_id=%s | method=%s | path=%s | duration_ms=%.2f",
+            "REQUEST ERROR | request_id=%s | method=%s | path=%s | duration_ms=%.2f | db_queries=%s",
             request_id,
             request.method,
             request.url.path,
             duration_ms,
+            queries.count,
         )
         raise
+    finally:
+        current_queries.reset(queries_token)
+        if sampler is not None:
+            profile_name = await asyncio.to_thread(
+                finish_request_profile, sampler, request_id, request.method, profiled_route,
+                response.status_code if response is not None else None,
+            )
+            if response is not None:
+                response.headers["X-Profile"] = profile_name
 
     duration_ms = (time.perf_counter() - started) * 1000
+    route = route_template(request.scope)
+    finish_request(f"{request.method} {route}", queries)
+    HTTP_REQUEST_SECONDS.labels(request.method, route).observe(duration_ms / 1000)
+    HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
     response.headers["X-Request-ID"] = request_id
+    # Streamed bodies may query after this point; those calls aren't included
+    response.headers["Server-Timing"] = queries.server_timing(duration_ms)
     logger.info(
-        "REQUEST END | request_id=%s | method=%s | path=%s | status_code=%s | duration_ms=%.2f",
+        "REQUEST END | request_id=%s | method=%s | path=%s | status_code=%s | duration_ms=%.2f | db_queries=%s | db_ms=%.2f",
         request_id,
         request.method,
         request.url.path,
         response.status_code,
         duration_ms,
+        queries.count,
+        queries.duration_ms,
     )
     return response
 
@@ -98,15 +133,51 @@ def root():
     log_step(logger, "root.health_ping")
     return {"message": "Cortex Engine Online"}
 
-@app.on_event("startup")
-async def startup_event():
-    import asyncio
-    from app.worker import worker_loop, reaper_loop
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus exposition; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _warm_up() -> None:
+    """Builds what the first requests would otherwise build lazily: Supabase clients, the password context."""
+    from app.core.database import warm_clients
+    from app.core.passwords import get_pwd_context
+
+    warm_clients()
+    get_pwd_context()
+
+async def _start_background_work():
+    from app.worker import worker_loop, reaper_loop, rate_limit_sweep_loop, auth_cleanup_loop, mail_outbox_loop, slack_sync_loop
 
-    log_step(logger, "startup.begin")
     await asyncio.sleep(1) # Let uvicorn finish initialization and health check response first
     asyncio.create_task(worker_loop())
     asyncio.create_task(reaper_loop())
+    asyncio.create_task(rate_limit_sweep_loop())
+    asyncio.create_task(auth_cleanup_loop())
+    asyncio.create_task(mail_outbox_loop())
+    asyncio.create_task(slack_sync_loop())
     log_step(logger, "startup.background_tasks_started")
+    # Off the loop, so the first API request after a cold start doesn't pay for imports
+    try:
+        await asyncio.to_thread(_warm_up)
+        log_step(logger, "startup.warmed_up")
+    except Exception as e:
+        # Requests retry the build on first use; startup must not die here
+        logger.exception("Startup warm-up failed | error=%s", e)
+
+@app.on_event("startup")
+async def startup_event():
+    # uvicorn only accepts connections once startup handlers return, so anything
+    # slow runs in a task: the port opens and health checks pass right away
+    log_step(logger, "startup.begin")
+    app.state.background_start = asyncio.create_task(_start_background_work())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.slack_gateway import close_client
+
+    await close_client()
+    log_step(logger, "shutdown.slack_client_closed")
+    mark_process_dead()
 
 instrument_module_functions(globals(), logger, exclude_names={"request_logging_middleware"})
@@ -157,6 +157,27 @@ class ReportResponse(BaseModel):
     job_id: str
     status: JobStatus
     progress: int = Field(0, ge=0, le=100)
+    stage: Optional[str] = Field(None, description="Last pipeline stage the job finished (load ... widgets, serialize)")
     error: Optional[str] = None
     payload: Optional[ReportPayload] = None
     is_existing: bool = Field(False, description="True if job was idempotent (already existed)")
+
+class ReportFileSet(BaseModel):
+    file_ids: List[str] = Field(..., min_items=1, max_items=10)
+    project_id: Optional[str] = None # Defaults to the batch project_id
+
+class ReportBatchRequest(BaseModel):
+    file_sets: List[ReportFileSet] = Field(..., min_items=1)
+    project_id: str
+
+class ReportBatchResponse(BaseModel):
+    group_id: str
+    status: JobStatus
+    progress: int = Field(0, ge=0, le=100)
+    total: int
+    pending: int = 0
+    processing: int = 0
+    completed: int = 0
+    failed: int = 0
+    # Status-only view of each job; payloads come from the stream or GET /jobs/{job_id}
+    jobs: List[ReportResponse] = Field(default_factory=list)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import List, Dict, Any, Optional, Tuple, Union
 import os
+import time
 import uuid
 import json
 import ast
@@ -13,8 +14,10 @@ from app.schemas.report import (
     DonutWidget, TreemapWidget, SubAnchorBlock
 )
 from app.core.config import settings
+from app.core.memory import JobMemory, JobMemoryExceeded
+from app.core.metrics import JOB_PHASE_SECONDS
 from app.core.observability import get_logger, instrument_module_functions, log_step
-from app.services.ingestion import load_dataset
+from app.services.ingestion import estimate_load, load_dataset
 
 # Configuration from Constitution
 MAX_CLUSTERS = settings.MAX_CLUSTERS
@@ -24,6 +27,55 @@ TIME_DOMAIN_IQR_THRESHOLD = settings.TIME_DOMAIN_IQR_THRESHOLD
 
 logger = get_logger(__name__)
 
+# Column Mapping (Definition)
+# Format: { StandardColumn: [aliases...] }
+COLUMN_DEFINITIONS = {
+    'Cluster': ['category_cluster', 'category', 'topic', 'cluster'],
+    'Sentiment': ['average_polarity', 'polarity', 'rating', 'score', 'sentiment'],
+    'SentimentClass': [], # Deprecated, merged into Classification
+    'ID': ['id'],
+    'Timestamp': ['timestamp', 'date', 'created_at', 'time'],
+    # GameTitle: categorical product/series names (low cardinality, short values)
+    # These are game names, series names, publisher names — NOT review text.
+    'GameTitle': [
+        'game', 'game_title', 'game title',
+        'game_series', 'game series', 'series',
+        'app', 'app_title', 'app title',
+        'product', 'product_name', 'product name',
+        'publisher', 'creator',
+    ],
+    # ReviewTitle: the individual review's headline/subject line
+    # This is kept separate to avoid polluting the categorical treemap.
+    'ReviewTitle': [
+        'title', 'headline', 'name',
+    ],
+    'Confidence': ['confidence', 'score_confidence'],
+}
+
+# Flatten for O(1) Lookup: { 'alias': 'Standard' }
+ROLE_ALIAS_MAP = {
+    alias: standard
+    for standard, aliases in COLUMN_DEFINITIONS.items()
+    for alias in aliases
+}
+
+# Columns read as-is (no alias) by normalization and role detection
+PASSTHROUGH_ROLE_COLUMNS = {'classification', 'sentiment_class', 'title'}
+
+def is_role_column(name: str) -> bool:
+    """
+    Load-time projection: True if normalize_frame/detect_roles can use the
+    column. Everything else is skipped by the loaders, so a wide export costs
+    the same as one carrying only the standard-role columns.
+    """
+    lower = str(name).lower().strip()
+    return (
+        lower in ROLE_ALIAS_MAP
+        or lower.replace(' ', '_') in ROLE_ALIAS_MAP
+        or lower in PASSTHROUGH_ROLE_COLUMNS
+        or any(lower == standard.lower() for standard in COLUMN_DEFINITIONS)
+    )
+
 # --- NORMALIZATION & HYGIENE ---
 
 def normalize_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, Dict[str, Any]]:
@@ -35,37 +87,8 @@ def normalize_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, Dict[str, Any]]:
     """
     meta = {"transformations": []}
     
-    # 1. Column Mapping (Definition)
-    # Format: { StandardColumn: [aliases...] }
-    definition_map = {
-        'Cluster': ['category_cluster', 'category', 'topic', 'cluster'],
-        'Sentiment': ['average_polarity', 'polarity', 'rating', 'score', 'sentiment'],
-        'SentimentClass': [], # Deprecated, merged into Classification
-        'ID': ['id'],
-        'Timestamp': ['timestamp', 'date', 'created_at', 'time'],
-        # GameTitle: categorical product/series names (low cardinality, short values)
-        # These are game names, series names, publisher names — NOT review text.
-        'GameTitle': [
-            'game', 'game_title', 'game title',
-            'game_series', 'game series', 'series',
-            'app', 'app_title', 'app title',
-            'product', 'product_name', 'product name',
-            'publisher', 'creator',
-        ],
-        # ReviewTitle: the individual review's headline/subject line
-        # This is kept separate to avoid polluting the categorical treemap.
-        'ReviewTitle': [
-            'title', 'headline', 'name',
-        ],
-        'Confidence': ['confidence', 'score_confidence'],
-    }
-    
-    # Flatten for O(1) Lookup: { 'alias': 'Standard' }
-    normalization_map = {
-        alias: standard 
-        for standard, aliases in definition_map.items() 
-        for alias in aliases
-    }
+    # 1. Column Mapping (Definition) -- see COLUMN_DEFINITIONS
+    normalization_map = ROLE_ALIAS_MAP
     
     rename_map = {}
     
@@ -119,18 +142,15 @@ def normalize_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, Dict[str, Any]]:
     text_cols = ['Title', 'Cluster', 'Classification', 'SentimentClass']
     for col in text_cols:
         if col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                # Dictionary-encoded input (Parquet): same cleanup, once per label
+                df[col] = _normalize_category_labels(df[col], col)
+                continue
+
             # Handle List-Strings for Cluster (e.g., "['tag1', 'tag2']")
             if col == 'Cluster' and df[col].dropna().astype(str).str.startswith('[').any():
                  try:
-                    def safe_parse(x):
-                        import pandas as pd
-                        import numpy as np
-                        try:
-                            val = ast.literal_eval(str(x))
-                            return val[0] if isinstance(val, list) and val else None # Take first tag for now
-                        except:
-                            return str(x)
-                    df[col] = df[col].apply(safe_parse)
+                    df[col] = df[col].apply(_first_list_tag)
                  except:
                      pass
 
@@ -172,8 +192,51 @@ def normalize_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, Dict[str, Any]]:
             if num_unique < len(df) * 0.5: # Heuristic: <50% unique
                 df[col] = df[col].astype('category')
 
+    # Categoricals that arrived from the loader keep labels of filtered-out
+    # rows; drop them so value_counts() doesn't report zero-count groups.
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+
     return df, meta
 
+def _first_list_tag(x):
+    try:
+        val = ast.literal_eval(str(x))
+        return val[0] if isinstance(val, list) and val else None # Take first tag for now
+    except:
+        return str(x)
+
+def _normalize_category_labels(series: pd.Series, col: str) -> pd.Series:
+    import pandas as pd
+    import numpy as np
+    """
+    normalize_frame's text cleanup for a categorical column: the label rules
+    run over the categories and rows are re-pointed via their codes, so the
+    column is never expanded into a per-row object array.
+    """
+    labels = pd.Series(series.cat.categories, dtype=object)
+    if col == 'Cluster' and labels.astype(str).str.startswith('[').any():
+        labels = labels.apply(_first_list_tag)
+    labels = labels.fillna("(Unclassified)").astype(str).str.strip()
+    labels = labels.replace(r'(?i)^(nan|none|null|)$', "(Unclassified)", regex=True)
+    missing_label = "(Unclassified)"
+    if col == 'Title':
+        labels = labels.replace("(Unclassified)", "Untitled")
+        missing_label = "Untitled"
+
+    # Cleanup can merge labels ("A " and "A"), so rebuild unique categories
+    uniques, inverse = np.unique(np.append(labels.to_numpy(dtype=object), missing_label), return_inverse=True)
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.full(len(codes), inverse[-1])
+    present = codes >= 0
+    new_codes[present] = inverse[:-1][codes[present]]
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=uniques).remove_unused_categories(),
+        index=series.index,
+        name=series.name,
+    )
+
 # --- ALGORITHMS ---
 
 def lttb_downsample(df: pd.DataFrame, time_col: str, value_col: str, threshold: int = 500) -> pd.DataFrame:
@@ -660,19 +723,182 @@ def _build_title_treemap(df: pd.DataFrame) -> TreemapWidget:
         nodes=nodes
     )
 
+# --- MERGE ---
+
+def smart_merge(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+    import pandas as pd
+    import numpy as np
+    """
+    Combines "Split CSVs" (Features + Clusters + Classes): ID-keyed frames are
+    left-joined onto the largest one (the fact table), the rest are appended.
+    Module-level so the benchmarks can time it on its own.
+    """
+    if not dfs: return pd.DataFrame()
+    if len(dfs) == 1: return dfs[0]
+
+    # A. Normalize IDs first (Local normalization)
+    for d in dfs:
+        # Case-insensitive find 'id'
+        id_col = next((c for c in d.columns if c.strip().lower() == 'id'), None)
+        if id_col:
+            d.rename(columns={id_col: 'ID'}, inplace=True)
+
+    # B. Separate Joinable vs Independent
+    joinable = [d for d in dfs if 'ID' in d.columns]
+    remainder = [d for d in dfs if 'ID' not in d.columns]
+
+    if not joinable:
+        return pd.concat(dfs, ignore_index=True)
+
+    # C. Merge Strategy: Left Join onto "Fact Table" (Largest DF)
+    # Sort by length desc (assuming largest is features/facts)
+    joinable.sort(key=len, reverse=True)
+    base_df = joinable[0]
+
+    for other_df in joinable[1:]:
+        # Clean duplicate columns in other_df to avoid suffix hell before merging?
+        # No, merge handles it with suffixes.
+        
+        # Left merge: Keep all rows of base (Features), attach info from other (Classes)
+        # If base has 100k rows and other has 3k (IDs), this populates the 3k IDs' features
+        # and leaves others null (or matched). 
+        # Note: If other_df has duplicates of ID, this explodes base. 
+        # We assume dimension tables are unique on ID. 
+        # To be safe, we could drop duplicates on ID in other_df if it's meant to be a dimension?
+        # But maybe other_df is ALSO a fact table? 
+        # Let's trust pandas merge.
+        
+        common_cols = set(base_df.columns) & set(other_df.columns) - {'ID'}
+        
+        base_df = pd.merge(base_df, other_df, on='ID', how='left', suffixes=('', '_new'))
+
+        # D. Coalesce Columns (Resolve Overlaps)
+        # If 'Cluster' is in both, usually the specialized file (smaller?) or the new one 
+        # has the 'correct' value. 
+        # Strategy: Prefer non-null values from the *new* merge (other_df).
+        for col in common_cols:
+            new_col = f"{col}_new"
+            if new_col in base_df.columns:
+                base_df[col] = base_df[new_col].fillna(base_df[col])
+                base_df.drop(columns=[new_col], inplace=True)
+
+    # D. Append Remainder
+    if remainder:
+        base_df = pd.concat([base_df] + remainder, ignore_index=True)
+        
+    return base_df
+
+# --- PIPELINE STAGES ---
+
+# Job progress (%) once each stage has finished. The worker reports 10 before
+# the pipeline starts; serialize runs in JobManager on completion (-> 100).
+STAGE_PROGRESS = {
+    "load": 40,
+    "merge": 50,
+    "normalize": 65,
+    "resolution_save": 70,
+    "roles": 75,
+    "widgets": 95,
+}
+
+
+class JobCancelled(Exception):
+    """Raised between stages once the job has been failed elsewhere (reaper) or ran past its deadline."""
+    pass
+
+
+class StageTracker:
+    """
+    Marks stage boundaries in generate_report_payload: records each stage's
+    duration (and memory peak, with a JobMemory), reports progress, then
+    checks for cancellation so a timed-out job stops at the next boundary
+    instead of running to completion.
+    """
+
+    def __init__(
+        self,
+        job_id: Optional[str] = None,
+        on_progress: Optional[Any] = None,
+        is_cancelled: Optional[Any] = None,
+        memory: Optional[JobMemory] = None,
+    ):
+        self.job_id = job_id
+        self.on_progress = on_progress  # (progress, stage, duration_ms) -> None
+        self.is_cancelled = is_cancelled  # () -> bool
+        self.memory = memory
+        self.durations: Dict[str, float] = {}  # stage -> ms
+        self._last = time.perf_counter()
+
+    def check(self) -> None:
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def done(self, stage: str) -> None:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        duration_ms = round(elapsed * 1000, 2)
+        self.durations[stage] = duration_ms
+        JOB_PHASE_SECONDS.labels(stage).observe(elapsed)
+        log_step(logger, "analysis.stage.done", job_id=self.job_id, stage=stage, duration_ms=duration_ms)
+        if self.memory is not None:
+            self.memory.stage_done(stage)
+        self.check()
+        if self.on_progress is not None:
+            self.on_progress(STAGE_PROGRESS[stage], stage, duration_ms)
+
 # --- PUBLIC API ---
 
-def generate_report_payload(file_paths: List[str], job_id: str = None) -> ReportPayload:
+def _load_frame(
+    path: str,
+    frame_cache: Optional[Dict[str, Any]] = None,
+    hints: Optional[Dict[str, Any]] = None,
+    memory: Optional[JobMemory] = None,
+) -> pd.DataFrame:
+    """
+    Loads one dataset, reusing a parsed frame from a batch group's cache if present.
+    Merge/normalize mutate frames in place, so cached frames are handed out as copies.
+    With a JobMemory, the load is sized first: over budget it goes chunked or fails
+    with JobMemoryExceeded before parsing (cached copies count against it too).
+    """
+    chunked = False
+    if memory is not None and memory.budget is not None:
+        chunked = memory.plan_load(path, estimate_load(path, hints, columns=is_role_column)) == "chunked"
+
+    if frame_cache is None:
+        return load_dataset(path, hints, columns=is_role_column, chunked=chunked)
+
+    cached = frame_cache.get(path)
+    if cached is None:
+        cached = load_dataset(path, hints, columns=is_role_column, chunked=chunked)
+        frame_cache[path] = cached
+    else:
+        log_step(logger, "analysis.frame_cache.hit", file_path=path)
+    return cached.copy()
+
+def generate_report_payload(
+    file_paths: List[str],
+    job_id: str = None,
+    frame_cache: Optional[Dict[str, Any]] = None,
+    file_hints: Optional[Dict[str, Dict[str, Any]]] = None,
+    stages: Optional[StageTracker] = None,
+) -> ReportPayload:
     import pandas as pd
     import numpy as np
+    stages = stages or StageTracker(job_id)
     # 1. Load & Merge
     dfs = []
     for path in file_paths:
         if path and os.path.exists(path):
             try:
-                dfs.append(load_dataset(path))
+                dfs.append(_load_frame(path, frame_cache, (file_hints or {}).get(path), stages.memory))
+            except (JobMemoryExceeded, MemoryError):
+                raise
             except Exception as e:
                 logger.error(f"Failed to load {path}: {e}")
+            # Parsing dominates; don't wait for the last file to notice a cancel
+            stages.check()
+    stages.done("load")
     
     if not dfs:
         return UnsupportedPayload(
@@ -682,66 +908,8 @@ def generate_report_payload(file_paths: List[str], job_id: str = None) -> Report
     
     # 2. Smart Merge (Fact Table + Dimension Tables Strategy)
     # Replaces simple concat to handle "Split CSVs" (Features + Clusters + Classes)
-    
-    def smart_merge(dfs: List[pd.DataFrame]) -> pd.DataFrame:
-        import pandas as pd
-        import numpy as np
-        if not dfs: return pd.DataFrame()
-        if len(dfs) == 1: return dfs[0]
-
-        # A. Normalize IDs first (Local normalization)
-        for d in dfs:
-            # Case-insensitive find 'id'
-            id_col = next((c for c in d.columns if c.strip().lower() == 'id'), None)
-            if id_col:
-                d.rename(columns={id_col: 'ID'}, inplace=True)
-
-        # B. Separate Joinable vs Independent
-        joinable = [d for d in dfs if 'ID' in d.columns]
-        remainder = [d for d in dfs if 'ID' not in d.columns]
-
-        if not joinable:
-            return pd.concat(dfs, ignore_index=True)
-
-        # C. Merge Strategy: Left Join onto "Fact Table" (Largest DF)
-        # Sort by length desc (assuming largest is features/facts)
-        joinable.sort(key=len, reverse=True)
-        base_df = joinable[0]
-
-        for other_df in joinable[1:]:
-            # Clean duplicate columns in other_df to avoid suffix hell before merging?
-            # No, merge handles it with suffixes.
-            
-            # Left merge: Keep all rows of base (Features), attach info from other (Classes)
-            # If base has 100k rows and other has 3k (IDs), this populates the 3k IDs' features
-            # and leaves others null (or matched). 
-            # Note: If other_df has duplicates of ID, this explodes base. 
-            # We assume dimension tables are unique on ID. 
-            # To be safe, we could drop duplicates on ID in other_df if it's meant to be a dimension?
-            # But maybe other_df is ALSO a fact table? 
-            # Let's trust pandas merge.
-            
-            common_cols = set(base_df.columns) & set(other_df.columns) - {'ID'}
-            
-            base_df = pd.merge(base_df, other_df, on='ID', how='left', suffixes=('', '_new'))
-
-            # D. Coalesce Columns (Resolve Overlaps)
-            # If 'Cluster' is in both, usually the specialized file (smaller?) or the new one 
-            # has the 'correct' value. 
-            # Strategy: Prefer non-null values from the *new* merge (other_df).
-            for col in common_cols:
-                new_col = f"{col}_new"
-                if new_col in base_df.columns:
-                    base_df[col] = base_df[new_col].fillna(base_df[col])
-                    base_df.drop(columns=[new_col], inplace=True)
-
-        # D. Append Remainder
-        if remainder:
-            base_df = pd.concat([base_df] + remainder, ignore_index=True)
-            
-        return base_df
-
     raw_df = smart_merge(dfs)
+    stages.done("merge")
     
     # 2. Normalize
     df, meta = normalize_frame(raw_df)
@@ -754,7 +922,12 @@ def generate_report_payload(file_paths: List[str], job_id: str = None) -> Report
         if cand:
             log_step(logger, "analysis.force_classification_rename", source_column=cand)
             df.rename(columns={cand: 'Classification'}, inplace=True)
+            if isinstance(df['Classification'].dtype, pd.CategoricalDtype):
+                # Sorted, as for object columns, so series and colors don't depend on the file format
+                labels = set(df['Classification'].cat.categories) | {"(Unclassified)"}
+                df['Classification'] = df['Classification'].cat.set_categories(sorted(labels))
             df['Classification'] = df['Classification'].fillna("(Unclassified)")
+    stages.done("normalize")
 
     if len(df) == 0:
         return UnsupportedPayload(
@@ -776,12 +949,14 @@ def generate_report_payload(file_paths: List[str], job_id: str = None) -> Report
                  json.dump(res_data, f)
         except Exception as e:
             logger.error(f"Resolution Save Failed: {e}")
+    stages.done("resolution_save")
 
     # 4. Detect Roles
     roles = detect_roles(df)
     
     # 5. Determine Intent
     strategy, anchor_type = determine_intent(roles)
+    stages.done("roles")
     
     # 6. Generate Payload
     meta_kpis = {
@@ -862,6 +1037,7 @@ def generate_report_payload(file_paths: List[str], job_id: str = None) -> Report
         payload = UnsupportedPayload(
             layout_strategy="UNSUPPORTED_DATASET", meta=meta, reason_code="DATA_NOT_SUITABLE", missing_requirements=["Unknown Logic"]
         )
+    stages.done("widgets")
 
     # Aggressive Garbage Collection to free RAM immediately
     import gc
@@ -876,4 +1052,4 @@ def generate_report_payload(file_paths: List[str], job_id: str = None) -> Report
     return payload
 
 
-instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions"})
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "is_role_column"})
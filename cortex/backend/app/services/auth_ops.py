@@ -2,21 +2,14 @@ from __future__ import annotations
 
 import hashlib
 import secrets
-import smtplib
 from datetime import datetime, timedelta, timezone
-from email.message import EmailMessage
-from email.utils import formataddr
-from typing import Any, Dict, Iterable, List, Optional
-from pathlib import Path
-import ssl
-
-# Absolute path to the backend root directory (cortex/backend/)
-_BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
-_FALLBACK_LOG_PATH = _BACKEND_ROOT / "invites_fallback.log"
+from typing import Any, Dict, List, Optional
 
 from app.core.config import settings
 from app.core.database import service_role_supabase as supabase
 from app.core.observability import get_logger, instrument_module_functions, log_step
+from app.services.mail_outbox import enqueue_mail, log_fallback, smtp_configured
+from app.services.reference_data import cached_departments, cached_user
 
 logger = get_logger(__name__)
 
@@ -46,8 +39,7 @@ def build_invite_link(token: str) -> str:
 
 
 def list_departments() -> List[Dict[str, Any]]:
-    res = supabase.table("departments").select("dept_id,dept_name").order("dept_id").execute()
-    return res.data or []
+    return cached_departments()
 
 
 def get_department_ids() -> set[str]:
@@ -69,122 +61,44 @@ def get_pending_requests() -> List[Dict[str, Any]]:
     return rows
 
 
-def _collect_ids(rows: Iterable[Dict[str, Any]], key: str = "id") -> List[str]:
-    ids: List[str] = []
-    for row in rows:
-        value = row.get(key)
-        if value:
-            ids.append(value)
-    return ids
+CLEANUP_SUMMARY_KEYS = (
+    "expired_invites_deleted",
+    "approved_marked_expired",
+    "pending_deleted",
+    "rejected_deleted",
+    "expired_deleted",
+    "completed_deleted",
+)
 
 
 def run_auth_cleanup() -> Dict[str, int]:
+    """
+    Expires/deletes invite tokens and access requests past their retention
+    windows via the auth_cleanup_batch SQL function (sql/11). Each RPC is
+    one chunk of at most AUTH_CLEANUP_BATCH_SIZE rows per step; keep calling
+    while any step filled its chunk.
+    """
     log_step(logger, "auth_ops.cleanup.begin")
-    now = utc_now()
-    now_iso = now.isoformat()
-    summary = {
-        "expired_invites_deleted": 0,
-        "approved_marked_expired": 0,
-        "pending_deleted": 0,
-        "rejected_deleted": 0,
-        "expired_deleted": 0,
-        "completed_deleted": 0,
+    summary = {key: 0 for key in CLEANUP_SUMMARY_KEYS}
+    batch_size = settings.AUTH_CLEANUP_BATCH_SIZE
+    params = {
+        "p_now": utc_now().isoformat(),
+        "p_pending_days": settings.AUTH_PENDING_RETENTION_DAYS,
+        "p_rejected_days": settings.AUTH_REJECTED_RETENTION_DAYS,
+        "p_expired_days": settings.AUTH_EXPIRED_RETENTION_DAYS,
+        "p_batch_size": batch_size,
     }
-    marked_expired_request_ids = set()
 
-    expired_invites = (
-        supabase.table("invite_tokens")
-        .select("id,request_id")
-        .lt("expires_at", now_iso)
-        .execute()
-        .data
-        or []
-    )
-    expired_invite_ids = _collect_ids(expired_invites)
-    expired_request_ids = _collect_ids(expired_invites, "request_id")
-    if expired_invite_ids:
-        supabase.table("invite_tokens").delete().in_("id", expired_invite_ids).execute()
-        summary["expired_invites_deleted"] += len(expired_invite_ids)
-    if expired_request_ids:
-        (
-            supabase.table("access_requests")
-            .update({"status": "expired", "reviewed_at": now_iso})
-            .in_("id", expired_request_ids)
-            .eq("status", "approved")
-            .execute()
-        )
-        unique_request_ids = set(expired_request_ids)
-        marked_expired_request_ids.update(unique_request_ids)
-        summary["approved_marked_expired"] += len(unique_request_ids)
-
-    approved_rows = (
-        supabase.table("access_requests")
-        .select("id")
-        .eq("status", "approved")
-        .execute()
-        .data
-        or []
-    )
-    approved_ids = _collect_ids(approved_rows)
-    if approved_ids:
-        live_invites = (
-            supabase.table("invite_tokens")
-            .select("request_id")
-            .in_("request_id", approved_ids)
-            .execute()
-            .data
-            or []
-        )
-        live_request_ids = {row["request_id"] for row in live_invites if row.get("request_id")}
-        missing_ids = [
-            req_id
-            for req_id in approved_ids
-            if req_id not in live_request_ids and req_id not in marked_expired_request_ids
-        ]
-        if missing_ids:
-            (
-                supabase.table("access_requests")
-                .update({"status": "expired", "reviewed_at": now_iso})
-                .in_("id", missing_ids)
-                .eq("status", "approved")
-                .execute()
-            )
-            summary["approved_marked_expired"] += len(missing_ids)
-
-    def delete_old_requests(status_value: str, max_age_days: int, summary_key: str, timestamp_field: str) -> None:
-        cutoff = (now - timedelta(days=max_age_days)).isoformat()
-        stale_rows = (
-            supabase.table("access_requests")
-            .select("id")
-            .eq("status", status_value)
-            .lt(timestamp_field, cutoff)
-            .execute()
-            .data
-            or []
-        )
-        stale_ids = _collect_ids(stale_rows)
-        if stale_ids:
-            supabase.table("access_requests").delete().in_("id", stale_ids).execute()
-            summary[summary_key] += len(stale_ids)
-
-    delete_old_requests("pending", settings.AUTH_PENDING_RETENTION_DAYS, "pending_deleted", "created_at")
-    delete_old_requests("rejected", settings.AUTH_REJECTED_RETENTION_DAYS, "rejected_deleted", "reviewed_at")
-    delete_old_requests("expired", settings.AUTH_EXPIRED_RETENTION_DAYS, "expired_deleted", "reviewed_at")
-
-    completed_rows = (
-        supabase.table("access_requests")
-        .select("id")
-        .eq("status", "completed")
-        .execute()
-        .data
-        or []
-    )
-    completed_ids = _collect_ids(completed_rows)
-    if completed_ids:
-        supabase.table("access_requests").delete().in_("id", completed_ids).execute()
-        summary["completed_deleted"] += len(completed_ids)
+    batches = 0
+    while batches < settings.AUTH_CLEANUP_MAX_BATCHES:
+        counts = supabase.rpc("auth_cleanup_batch", params).execute().data or {}
+        batches += 1
+        for key in CLEANUP_SUMMARY_KEYS:
+            summary[key] += int(counts.get(key) or 0)
+        if all(int(counts.get(key) or 0) < batch_size for key in CLEANUP_SUMMARY_KEYS):
+            break
 
-    log_step(logger, "auth_ops.cleanup.complete", **summary)
+    log_step(logger, "auth_ops.cleanup.complete", batches=batches, **summary)
     return summary
 
 
@@ -200,9 +114,7 @@ def get_request_by_email(email: str) -> Optional[Dict[str, Any]]:
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    normalized = normalize_email(email)
-    res = supabase.table("users").select("*").eq("email", normalized).execute()
-    return res.data[0] if res.data else None
+    return cached_user(normalize_email(email))
 
 
 def get_invite_by_token(raw_token: str) -> Optional[Dict[str, Any]]:
@@ -281,20 +193,6 @@ def delete_invite_by_request_id(request_id: str) -> None:
     supabase.table("invite_tokens").delete().eq("request_id", request_id).execute()
 
 
-def _require_smtp_config() -> None:
-    required = {
-        "SMTP_HOST": settings.SMTP_HOST,
-        "SMTP_PORT": settings.SMTP_PORT,
-        "SMTP_USERNAME": settings.SMTP_USERNAME,
-        "SMTP_PASSWORD": settings.SMTP_PASSWORD,
-        "SMTP_FROM_EMAIL": settings.SMTP_FROM_EMAIL,
-    }
-    missing = [key for key, value in required.items() if value in ("", None)]
-    if missing:
-        joined = ", ".join(missing)
-        raise RuntimeError(f"SMTP is not configured. Missing: {joined}.")
-
-
 def _build_invite_email(full_name: str, invite_link: str, approved_dept_id: str, expires_minutes: int) -> tuple[str, str, str]:
     recipient_name = normalize_name(full_name) or "there"
     subject = "Your Cortex access invite"
@@ -371,46 +269,33 @@ def _build_invite_email(full_name: str, invite_link: str, approved_dept_id: str,
     return subject, text_body, html_body
 
 
-def send_invite_email(email: str, full_name: str, invite_token: str, approved_dept_id: str) -> Dict[str, Any]:
+def queue_invite_email(email: str, full_name: str, invite_token: str, approved_dept_id: str) -> Dict[str, Any]:
+    """
+    Puts the invite on the mail outbox; the worker delivers it (see
+    app/services/mail_outbox.py). Without SMTP settings the link goes
+    straight to the fallback log, as there is nothing to deliver it with.
+    """
     norm_email = normalize_email(email)
-    log_step(logger, "auth_ops.mail.send.begin", email=norm_email, approved_dept_id=approved_dept_id)
+    log_step(logger, "auth_ops.mail.queue.begin", email=norm_email, approved_dept_id=approved_dept_id)
     invite_link = build_invite_link(invite_token)
     expires_minutes = settings.INVITE_TOKEN_EXPIRE_MINUTES
     subject, text_body, html_body = _build_invite_email(full_name, invite_link, approved_dept_id, expires_minutes)
+    fallback_note = f"Email: {norm_email} | Dept: {approved_dept_id} | Link: {invite_link}"
 
-    try:
-        _require_smtp_config()
-        message = EmailMessage()
-        message["Subject"] = subject
-        message["From"] = formataddr((settings.SMTP_FROM_NAME, settings.SMTP_FROM_EMAIL))
-        message["To"] = norm_email
-        message.set_content(text_body)
-        message.add_alternative(html_body, subtype="html")
-
-        context = ssl.create_default_context()
-        with smtplib.SMTP(settings.SMTP_HOST, int(settings.SMTP_PORT), timeout=20) as smtp:
-            smtp.ehlo()
-            log_step(logger, "auth_ops.mail.smtp.connected", host=settings.SMTP_HOST, port=settings.SMTP_PORT)
-            smtp.starttls(context=context)
-            smtp.ehlo()
-            smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-            log_step(logger, "auth_ops.mail.smtp.authenticated", username=settings.SMTP_USERNAME)
-            smtp.send_message(message)
-
-        log_step(logger, "auth_ops.mail.send.success", email=norm_email)
-        return {"status": "sent", "to": norm_email}
-    except Exception as exc:
-        # Fallback 4A: Log invite link to console and file when SMTP is unavailable or fails
-        fallback_msg = f"[INVITE FALLBACK LINK] Email: {norm_email} | Dept: {approved_dept_id} | Link: {invite_link}"
-        logger.warning(fallback_msg)
-        print(f"\n{fallback_msg}\n")
-        try:
-            with open(_FALLBACK_LOG_PATH, "a", encoding="utf-8") as f:
-                f.write(f"{utc_now().isoformat()} - {fallback_msg}\n")
-        except Exception:
-            pass
-        log_step(logger, "auth_ops.mail.send.fallback", email=norm_email, error=str(exc))
+    if not smtp_configured():
+        log_fallback(fallback_note)
+        log_step(logger, "auth_ops.mail.queue.fallback", email=norm_email, error="SMTP is not configured")
         return {"status": "fallback_logged", "to": norm_email, "invite_link": invite_link}
 
+    outbox_row = enqueue_mail(
+        recipient=norm_email,
+        subject=subject,
+        text_body=text_body,
+        html_body=html_body,
+        kind="invite",
+        fallback_note=fallback_note,
+    )
+    return {"status": "queued", "to": norm_email, "outbox_id": outbox_row.get("id")}
+
 
 instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions"})
@@ -1,27 +1,998 @@
 from __future__ import annotations
+import asyncio
+import codecs
+import contextlib
+import csv
+import hashlib
+import io
+import json
 import os
+import zipfile
+import zlib
 from pathlib import Path
-from typing import Optional
-from app.core.observability import get_logger, instrument_module_functions, log_step
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
 
 # 100MB Limit
 MAX_FILE_SIZE_MB = 100
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 logger = get_logger(__name__)
 
-def load_dataset(file_path: str) -> pd.DataFrame:
+# Streaming upload tuning
+UPLOAD_WRITE_BUFFER_BYTES = 1024 * 1024  # Flush to disk in ~1 MiB batches
+SNIFF_SAMPLE_BYTES = 64 * 1024           # Header/delimiter detection window
+CANDIDATE_DELIMITERS = ",;\t|"
+PARQUET_MAGIC = b"PAR1"
+
+# Compressed uploads: stored as-is, decompressed on the fly when read
+MAX_DECOMPRESSED_SIZE_BYTES = settings.MAX_DECOMPRESSED_SIZE_MB * 1024 * 1024
+DECOMPRESS_STEP_BYTES = 1024 * 1024  # Bound output per decompress call (zip-bomb safety)
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd", ".zip": "zip"}
+COMPRESSION_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"PK\x03\x04", "zip"),
+)
+ARCHIVE_DATA_SUFFIXES = {".csv", ".tsv", ".txt", ".json", ".jsonl", ".ndjson"}
+
+# JSON inputs are streamed record-by-record into column buffers
+JSON_LINES_SUFFIXES = {".jsonl", ".ndjson"}
+JSON_READ_CHUNK_CHARS = 1024 * 1024
+JSON_WHITESPACE = "\ufeff \t\r\n"
+JSON_SEPARATORS = JSON_WHITESPACE + ","
+
+# Load sizing for the per-job memory budget (app/core/memory.py)
+ESTIMATE_SAMPLE_ROWS = 2000
+CSV_CHUNK_ROWS = 100_000
+# read_csv(low_memory=False) tokenizes the whole file before building any
+# column; its buffers peak at about this multiple of the decompressed text
+CSV_PARSE_BUFFER_FACTOR = 1.0
+
+
+class DecompressedSizeExceeded(ValueError):
+    """Raised when a compressed upload inflates past MAX_DECOMPRESSED_SIZE_MB."""
+    pass
+
+
+def split_compression_suffix(filename: str) -> tuple[str, Optional[str]]:
+    """'export.csv.gz' -> ('.csv', 'gzip'); 'export.csv' -> ('.csv', None)."""
+    path = Path(filename)
+    compression = COMPRESSION_SUFFIXES.get(path.suffix.lower())
+    if compression:
+        return Path(path.stem).suffix.lower(), compression
+    return path.suffix.lower(), None
+
+
+def json_layout(text: str) -> str:
+    """
+    Classifies a JSON sample: 'lines' (NDJSON, one object per line),
+    'array' (top-level list of records) or 'document' (anything else,
+    e.g. a column-oriented object), which is left to pandas.
+    """
+    stripped = text.lstrip(JSON_WHITESPACE)
+    if stripped.startswith("["):
+        return "array"
+    if not stripped.startswith("{"):
+        return "document"
+    try:
+        _, end = json.JSONDecoder().raw_decode(stripped)
+    except json.JSONDecodeError:
+        # First object doesn't fit in the sample: one large document
+        return "document"
+    rest = stripped[end:].lstrip(" \t\r")
+    if rest.startswith("\n") and rest.lstrip(JSON_WHITESPACE).startswith("{"):
+        return "lines"
+    return "document"
+
+
+def pick_archive_member(archive: zipfile.ZipFile) -> str:
+    """The single data file inside a zip, ignoring folders and macOS metadata."""
+    members = [
+        info.filename
+        for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/") and not Path(info.filename).name.startswith(".")
+    ]
+    data_members = [name for name in members if Path(name).suffix.lower() in ARCHIVE_DATA_SUFFIXES] or members
+    if len(data_members) != 1:
+        raise ValueError(f"Zip uploads must contain exactly one data file (found {len(data_members)}).")
+    return data_members[0]
+
+
+class PartScanner:
+    """
+    Hash + quote-aware newline statistics for one contiguous byte range.
+    Stats are recorded for both possible "inside quotes" starting states, so
+    parts uploaded out of order can be combined into an exact row count
+    without re-reading them (see `combine_row_count`).
+    """
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.total_bytes = 0
+        self.newlines_total = 0
+        # Newlines reached with an even quote count since the start of the range
+        self.newlines_even = 0
+        self.quote_parity = 0
+        self.last_byte = b""
+
+    def feed(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+        self.total_bytes += len(chunk)
+        self._count_records(chunk)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.total_bytes,
+            "sha256": self.hasher.hexdigest(),
+            "newlines_total": self.newlines_total,
+            "newlines_even": self.newlines_even,
+            "quote_parity": self.quote_parity,
+            "ends_with_newline": self.last_byte == b"\n",
+        }
+
+    def _count_records(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        # A newline ends a record only when the number of quotes seen so far
+        # is even. Per-line bytes.count keeps this in C for the no-quote case.
+        lines = chunk.split(b"\n")
+        for line in lines[:-1]:
+            self.quote_parity ^= line.count(b'"') & 1
+            self.newlines_total += 1
+            if not self.quote_parity:
+                self.newlines_even += 1
+        self.quote_parity ^= lines[-1].count(b'"') & 1
+        self.last_byte = chunk[-1:]
+
+    @staticmethod
+    def combine_row_count(parts: List[Dict[str, Any]]) -> int:
+        """Data rows (header excluded) across ordered part stats."""
+        records = 0
+        in_quotes = False
+        for part in parts:
+            if in_quotes:
+                records += part["newlines_total"] - part["newlines_even"]
+            else:
+                records += part["newlines_even"]
+            in_quotes ^= bool(part["quote_parity"])
+
+        non_empty = [part for part in parts if part["size"]]
+        # Trailing line without newline still counts; header row does not.
+        if non_empty and not non_empty[-1]["ends_with_newline"]:
+            records += 1
+        return max(records - 1, 0)
+
+
+class _IngestSink:
+    """File-like target for zstandard's stream_writer."""
+
+    def __init__(self, ingest: Callable[[bytes], None]):
+        self.ingest = ingest
+
+    def write(self, data: bytes) -> int:
+        self.ingest(bytes(data))
+        return len(data)
+
+
+class UploadSniffer(PartScanner):
+    """
+    Incrementally inspects an upload as bytes arrive.
+    Computes the SHA-256, detects format/encoding/delimiter from the first
+    SNIFF_SAMPLE_BYTES, and counts CSV rows (newlines outside quotes) so the
+    report job never has to re-read the file to learn its shape.
+    """
+
+    def __init__(self, filename: str):
+        super().__init__()
+        self.extension, self.compression = split_compression_suffix(filename)
+        self._compression_checked = self.compression is not None
+        self._decompressor = None
+        self.decompressed_bytes = 0
+        self.archive_member: Optional[str] = None
+        self._sample = bytearray()
+        self._sniffed = False
+        self._decoder = None
+        self.format: Optional[str] = None
+        self.encoding: Optional[str] = None
+        self.delimiter: Optional[str] = None
+        self.columns: List[str] = []
+        self.json_layout: Optional[str] = None
+        # Parquet / JSON array row count, known only once the file is stored
+        self.record_count: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> None:
+        # Hash/size cover the stored (possibly compressed) bytes; everything
+        # else looks at the decompressed stream.
+        self.hasher.update(chunk)
+        self.total_bytes += len(chunk)
+        if not self._compression_checked:
+            self._compression_checked = True
+            self.compression = next((codec for magic, codec in COMPRESSION_MAGIC if chunk.startswith(magic)), None)
+        if self.compression:
+            self._decompress(chunk)
+            return
+        self._ingest(chunk)
+
+    def _ingest(self, chunk: bytes) -> None:
+        self.decompressed_bytes += len(chunk)
+        if self.decompressed_bytes > MAX_DECOMPRESSED_SIZE_BYTES:
+            raise DecompressedSizeExceeded(
+                f"File expands past the {settings.MAX_DECOMPRESSED_SIZE_MB} MB decompressed size limit."
+            )
+        if not self._sniffed:
+            self._sample.extend(chunk)
+            if len(self._sample) >= SNIFF_SAMPLE_BYTES:
+                self._sniff(bytes(self._sample))
+                self._sample = bytearray()
+            return
+        self._scan(chunk)
+
+    def _decompress(self, chunk: bytes) -> None:
+        if self.error is not None or self.compression == "zip":
+            # Zip needs its central directory (end of file); see inspect_archive.
+            return
+        try:
+            if self.compression == "gzip":
+                data = chunk
+                while data:
+                    if self._decompressor is None:
+                        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                    self._ingest(self._decompressor.decompress(data, DECOMPRESS_STEP_BYTES))
+                    data = self._decompressor.unconsumed_tail
+                    if self._decompressor.eof:
+                        # Concatenated gzip members are valid (e.g. `cat a.gz b.gz`)
+                        data = self._decompressor.unused_data
+                        self._decompressor = None
+            elif self.compression == "zstd":
+                if self._decompressor is None:
+                    import zstandard
+                    # decompressobj() has no output bound; the stream writer hands
+                    # _ingest at most DECOMPRESS_STEP_BYTES at a time, so the size
+                    # limit is checked after every step.
+                    self._decompressor = zstandard.ZstdDecompressor().stream_writer(
+                        _IngestSink(self._ingest), write_size=DECOMPRESS_STEP_BYTES
+                    )
+                self._decompressor.write(chunk)
+        except DecompressedSizeExceeded:
+            raise
+        except ImportError:
+            self.error = "zstd uploads are not supported on this server."
+        except Exception:
+            self.error = f"Compressed data is corrupt or not {self.compression}."
+
+    def inspect_archive(self, file_path: str) -> None:
+        """Streams the single data member of a stored zip through the sniffer."""
+        if self.compression != "zip" or self.error is not None:
+            return
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                self.archive_member = pick_archive_member(archive)
+                self.extension = Path(self.archive_member).suffix.lower()
+                with archive.open(self.archive_member) as member:
+                    while True:
+                        block = member.read(DECOMPRESS_STEP_BYTES)
+                        if not block:
+                            break
+                        self._ingest(block)
+        except DecompressedSizeExceeded:
+            raise
+        except (zipfile.BadZipFile, ValueError) as exc:
+            self.error = str(exc) if isinstance(exc, ValueError) else "File is not a valid zip archive."
+
+    def sniff_result(self) -> Dict[str, Any]:
+        """Format/encoding/header findings, without finalizing the row count."""
+        if self.compression == "zip" and self.archive_member is None and self.error is None:
+            # Nothing decompressed yet; the caller must run inspect_archive first.
+            return {
+                "format": None,
+                "encoding": None,
+                "delimiter": None,
+                "columns": [],
+                "compression": self.compression,
+                "sniff_error": None,
+            }
+        if not self._sniffed and self.error is None:
+            # (A decompression error stands; sniffing its partial output would replace it.)
+            self._sniff(bytes(self._sample))
+            self._sample = bytearray()
+        if self._decoder is not None and self.error is None:
+            try:
+                self._decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                self.encoding = "latin-1"
+        return {
+            "format": self.format,
+            "encoding": self.encoding,
+            "delimiter": self.delimiter,
+            "columns": self.columns,
+            "compression": self.compression,
+            "archive_member": self.archive_member,
+            "json_layout": self.json_layout,
+            "sniff_error": self.error,
+        }
+
+    def finish(self, file_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Finalizes the sniff. `file_path` is read for zip uploads, whose member
+        can't be decompressed until the central directory has arrived, for the
+        Parquet footer, and to count the records of a JSON array.
+        """
+        if self.compression == "zip" and file_path:
+            self.inspect_archive(file_path)
+        result = self.sniff_result()
+        if file_path and self.error is None and self.format in ("parquet", "json"):
+            shape = record_shape(file_path, result)
+            self.record_count = shape.get("row_count")
+            self.columns = shape.get("columns", self.columns)
+            self.error = shape.get("sniff_error")
+            result = self.sniff_result()
+        row_count = None
+        if self.format == "csv":
+            row_count = self.combine_row_count([self.stats()])
+        elif self.format == "jsonl":
+            row_count = self.newlines_total + (1 if self.last_byte not in (b"", b"\n") else 0)
+        elif self.format in ("parquet", "json"):
+            row_count = self.record_count
+
+        return {
+            "sha256": self.hasher.hexdigest(),
+            "row_count": row_count,
+            "decompressed_size": self.decompressed_bytes if self.compression and self.error is None else None,
+            **result,
+        }
+
+    def _sniff(self, sample: bytes) -> None:
+        self._sniffed = True
+        if self.extension == ".parquet" or sample[:4] == PARQUET_MAGIC:
+            self.format = "parquet"
+            if sample[:4] != PARQUET_MAGIC:
+                self.error = "File does not look like Parquet (missing PAR1 header)."
+            elif self.compression:
+                self.error = "Parquet is already compressed; upload the .parquet file directly."
+            return
+
+        self.encoding = self._detect_encoding(sample)
+        text = sample.decode(self.encoding, errors="ignore")
+        stripped = text.lstrip("\ufeff \t\r\n")
+        if self.extension == ".json" or self.extension in JSON_LINES_SUFFIXES or stripped[:1] in ("[", "{"):
+            self.json_layout = "lines" if self.extension in JSON_LINES_SUFFIXES else json_layout(stripped)
+            is_lines = self.json_layout == "lines"
+            self.format = "jsonl" if is_lines else "json"
+            if stripped[:1] not in ("[", "{"):
+                self.error = "File does not look like JSON."
+            elif is_lines:
+                self._detect_jsonl_columns(stripped)
+            elif self.json_layout == "array":
+                self._detect_json_array_columns(stripped)
+            self._decoder = codecs.getincrementaldecoder(self.encoding)()
+            self._scan(sample)
+            return
+
+        self.format = "csv"
+        if "\x00" in text and not self.encoding.startswith("utf-16"):
+            self.error = "File looks binary, not CSV text."
+            return
+
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+        self._detect_csv_header(text)
+        self._scan(sample)
+
+    @staticmethod
+    def _detect_encoding(sample: bytes) -> str:
+        if sample.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return "utf-16"
+        try:
+            # A multi-byte sequence may be cut at the sample edge; ignore only that tail.
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            return "latin-1"
+
+    def _detect_csv_header(self, text: str) -> None:
+        # Only complete lines take part in sniffing
+        complete = text[: text.rfind("\n") + 1] if "\n" in text else text
+        complete = complete.lstrip("\ufeff")
+        try:
+            dialect = csv.Sniffer().sniff(complete[:SNIFF_SAMPLE_BYTES], delimiters=CANDIDATE_DELIMITERS)
+            self.delimiter = dialect.delimiter
+        except csv.Error:
+            self.delimiter = ","
+        header = next(csv.reader(io.StringIO(complete), delimiter=self.delimiter), [])
+        self.columns = [column.strip() for column in header]
+        if not any(self.columns):
+            self.error = "CSV header row is empty."
+
+    def _detect_jsonl_columns(self, text: str) -> None:
+        try:
+            record = json.loads(text.split("\n", 1)[0])
+        except json.JSONDecodeError:
+            # First record longer than the sample; columns stay unknown
+            return
+        if isinstance(record, dict):
+            self.columns = [str(key) for key in record]
+        else:
+            self.error = "JSON Lines records must be objects."
+
+    def _detect_json_array_columns(self, text: str) -> None:
+        try:
+            record = next(_iter_json_array([text]), None)
+        except (ValueError, StopIteration):
+            # First record longer than the sample; columns stay unknown
+            return
+        if isinstance(record, dict):
+            self.columns = [str(key) for key in record]
+
+    def _validate_text(self, chunk: bytes) -> None:
+        if self._decoder is None or self.error is not None:
+            return
+        try:
+            self._decoder.decode(chunk)
+        except UnicodeDecodeError:
+            # Valid UTF-8 header but stray legacy bytes later on: latin-1 reads
+            # every byte, so fall back instead of rejecting the whole export.
+            log_step(logger, "ingest.sniff.encoding_fallback", encoding=self.encoding, offset=self.total_bytes)
+            self.encoding = "latin-1"
+            self._decoder = None
+
+    def _scan(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.format == "json":
+            self._validate_text(chunk)
+            return
+        if self.format == "jsonl":
+            # Newlines inside JSON strings are always escaped, so every raw
+            # newline ends a record; no quote tracking needed.
+            self._validate_text(chunk)
+            self.newlines_total += chunk.count(b"\n")
+            self.last_byte = chunk[-1:]
+            return
+        if self.format != "csv" or self.error is not None:
+            return
+        self._validate_text(chunk)
+        self._count_records(chunk)
+
+
+class StreamingUploadWriter:
+    """
+    Buffers incoming chunks and hands them to a worker thread in ~1 MiB
+    batches, so disk writes and hashing/sniffing never block the event loop.
+    `sniffer` is any PartScanner (a full UploadSniffer or a bare part scanner).
+    """
+
+    def __init__(self, file_path: str, sniffer: PartScanner, buffer_bytes: int = UPLOAD_WRITE_BUFFER_BYTES):
+        self.file_path = file_path
+        self.sniffer = sniffer
+        self.buffer_bytes = buffer_bytes
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._file = None
+
+    async def open(self) -> None:
+        self._file = await asyncio.to_thread(open, self.file_path, "wb", buffering=0)
+
+    async def write(self, chunk: bytes) -> None:
+        self._pending.append(chunk)
+        self._pending_bytes += len(chunk)
+        if self._pending_bytes >= self.buffer_bytes:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        chunks, self._pending, self._pending_bytes = self._pending, [], 0
+        await asyncio.to_thread(self._write_batch, chunks)
+
+    async def close(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            if self._file is not None:
+                await asyncio.to_thread(self._file.close)
+                self._file = None
+
+    def _write_batch(self, chunks: List[bytes]) -> None:
+        for chunk in chunks:
+            self.sniffer.feed(chunk)
+        # writelines hands each chunk straight to the OS without joining them first
+        self._file.writelines(chunks)
+
+
+def sniff_file(file_path: str, filename: str) -> Dict[str, Any]:
+    """Runs a stored file through UploadSniffer (used when streaming sniff wasn't possible)."""
+    sniffer = UploadSniffer(filename)
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(UPLOAD_WRITE_BUFFER_BYTES)
+            if not block:
+                break
+            sniffer.feed(block)
+    return sniffer.finish(file_path)
+
+
+def record_shape(file_path: str, sniff: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Row count and columns of a stored Parquet file (from its footer) or JSON
+    array (one streaming pass, records decoded one at a time and dropped),
+    whose shape the byte-level scan can't see. Returns the keys it learned;
+    `sniff_error` only for an unreadable Parquet footer.
+    """
+    if sniff.get("format") == "parquet":
+        import pyarrow.parquet as pq
+
+        try:
+            metadata = pq.ParquetFile(file_path).metadata
+        except Exception:
+            return {"sniff_error": "File is not a valid Parquet file (unreadable footer)."}
+        return {"row_count": metadata.num_rows, "columns": list(metadata.schema.to_arrow_schema().names)}
+    if sniff.get("format") != "json" or sniff.get("json_layout") != "array":
+        return {}
+    try:
+        with _dataset_source(file_path, ".json", sniff.get("compression"), sniff) as (source, _, compression):
+            with _open_text(source, compression, sniff.get("encoding") or "utf-8") as stream:
+                return {"row_count": sum(1 for _ in _iter_json_array(_read_text_chunks(stream)))}
+    except (ValueError, UnicodeDecodeError) as exc:
+        # Left to load_dataset, which reports the parse error with the job
+        log_step(logger, "ingest.sniff.json_count_failed", error=str(exc)[:200])
+        return {}
+
+
+def assemble_parts(part_paths: List[str], dest_path: str) -> int:
+    """
+    Concatenates uploaded parts into `dest_path` in order.
+    Uses copy_file_range so the kernel moves the bytes (no userspace copy);
+    falls back to sendfile / buffered copy where that syscall is unavailable.
+    Returns the number of bytes written.
+    """
+    import shutil
+
+    written = 0
+    with open(dest_path, "wb") as dest:
+        dest_fd = dest.fileno()
+        for part_path in part_paths:
+            size = os.path.getsize(part_path)
+            with open(part_path, "rb") as src:
+                src_fd = src.fileno()
+                remaining = size
+                try:
+                    while remaining > 0:
+                        if hasattr(os, "copy_file_range"):
+                            copied = os.copy_file_range(src_fd, dest_fd, remaining)
+                        else:
+                            copied = os.sendfile(dest_fd, src_fd, None, remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                except OSError:
+                    # Cross-filesystem or unsupported: finish with a plain copy
+                    src.seek(size - remaining)
+                    dest.seek(written + size - remaining)
+                    shutil.copyfileobj(src, dest, UPLOAD_WRITE_BUFFER_BYTES)
+                    dest.flush()
+                    remaining = 0
+            written += size
+    log_step(logger, "ingest.parts.assembled", dest_path=dest_path, part_count=len(part_paths), bytes=written)
+    return written
+
+class ColumnBuffers:
+    """
+    Column-oriented accumulator for streamed JSON records.
+    Only keys accepted by `columns` are kept, so memory follows the projected
+    columns (as with CSV `usecols`) rather than every field of every record.
+    """
+
+    def __init__(self, columns: Optional[Callable[[str], bool]] = None):
+        self.columns = columns
+        self.buffers: Dict[str, List[Any]] = {}
+        # Every key seen so far, projected or not
+        self.known: set[str] = set()
+        self.rows = 0
+
+    def append(self, record: Any) -> None:
+        if not isinstance(record, dict):
+            raise ValueError("JSON records must be objects.")
+        for key, buffer in self.buffers.items():
+            buffer.append(record.get(key))
+        if not record.keys() <= self.known:
+            for key in record:
+                if key in self.known:
+                    continue
+                self.known.add(key)
+                if self.columns is None or self.columns(key):
+                    # Key first seen mid-stream: earlier rows didn't have it
+                    self.buffers[key] = [None] * self.rows + [record[key]]
+        self.rows += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        import pandas as pd
+
+        df = pd.DataFrame(self.buffers, index=pd.RangeIndex(self.rows))
+        return _convert_epoch_columns(df)
+
+
+def _convert_epoch_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Mirrors pd.read_json's default date handling for numeric epoch columns."""
+    import pandas as pd
+
+    for column in df.columns:
+        lower = str(column).lower()
+        date_like = lower.endswith(("_at", "_time")) or lower.startswith("timestamp") or lower in ("modified", "date", "datetime")
+        if not date_like or not pd.api.types.is_numeric_dtype(df[column]) or pd.api.types.is_bool_dtype(df[column]):
+            continue
+        values = df[column].dropna()
+        if values.empty or not (values > 31536000).all():
+            continue
+        for unit in ("s", "ms", "us", "ns"):
+            try:
+                df[column] = pd.to_datetime(df[column], unit=unit, errors="raise")
+                break
+            except (OverflowError, ValueError):
+                continue
+    return df
+
+
+def _iter_json_lines(chunks: Iterable[str]) -> Iterator[Any]:
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.strip(JSON_WHITESPACE)
+            if line:
+                yield json.loads(line)
+    pending = pending.strip(JSON_WHITESPACE)
+    if pending:
+        yield json.loads(pending)
+
+
+def _iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Yields the elements of a top-level JSON array without parsing the whole document."""
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ""
+    while not buffer.lstrip(JSON_WHITESPACE):
+        buffer = next(chunks, None)
+        if buffer is None:
+            raise ValueError("JSON document is empty.")
+    buffer = buffer.lstrip(JSON_WHITESPACE)
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of records.")
+    pos = 1
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in JSON_SEPARATORS:
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array.")
+            more = next(chunks, None)
+            eof = more is None
+            buffer, pos = more or "", 0
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            # A bare number at the very end of the buffer may continue in the next chunk
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            more = next(chunks, None)
+            eof = more is None
+            buffer, pos = buffer[pos:] + (more or ""), 0
+            continue
+        yield record
+        pos = end
+
+
+def _read_text_chunks(stream: io.TextIOBase, first: str = "") -> Iterator[str]:
+    if first:
+        yield first
+    while True:
+        chunk = stream.read(JSON_READ_CHUNK_CHARS)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_json_records(
+    stream: io.TextIOBase,
+    layout: Optional[str] = None,
+    columns: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
+    """
+    Streams JSON Lines or a JSON array of records into column buffers.
+    `layout` is 'lines', 'array' or None (detect from the first chunk);
+    column-oriented documents fall back to pd.read_json.
+    """
+    import pandas as pd
+
+    first = stream.read(JSON_READ_CHUNK_CHARS)
+    layout = layout or json_layout(first)
+    if layout == "document":
+        df = pd.read_json(io.StringIO(first + stream.read()))
+        if columns is not None:
+            df = df[[column for column in df.columns if columns(str(column))]]
+        return df
+
+    buffers = ColumnBuffers(columns)
+    chunks = _read_text_chunks(stream, first)
+    records = _iter_json_lines(chunks) if layout == "lines" else _iter_json_array(chunks)
+    for record in records:
+        buffers.append(record)
+    return buffers.to_frame()
+
+
+def read_parquet_projected(source: Any, columns: Optional[Callable[[str], bool]] = None) -> pd.DataFrame:
+    """
+    Memory-mapped Parquet read that decodes only the projected columns.
+    String columns are read dictionary-encoded and arrive as pandas
+    categoricals (codes + one copy of each label) instead of per-row Python
+    strings; Arrow buffers are released column by column while converting.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(source, memory_map=True)
+    names = [field.name for field in schema if columns is None or columns(field.name)]
+    if not names:
+        num_rows = pq.ParquetFile(source, memory_map=True).metadata.num_rows
+        return pd.DataFrame(index=pd.RangeIndex(num_rows))
+
+    string_columns = [
+        name for name in names
+        if pa.types.is_string(schema.field(name).type) or pa.types.is_large_string(schema.field(name).type)
+    ]
+    parquet_file = pq.ParquetFile(source, memory_map=True, read_dictionary=string_columns)
+    table = parquet_file.read(columns=names, use_threads=True)
+    df = table.to_pandas(self_destruct=True, split_blocks=True)
+    del table
+
+    # IDs and free text gain nothing from a dictionary (same <50% unique
+    # heuristic normalize_frame uses for its categoricals)
+    for column in df.select_dtypes(include=["category"]).columns:
+        if len(df[column].cat.categories) >= len(df) * 0.5:
+            df[column] = df[column].astype(object)
+        else:
+            # Arrow keeps first-seen order; sort so groupby/crosstab output
+            # matches what the same data loaded as strings produces.
+            df[column] = df[column].cat.reorder_categories(df[column].cat.categories.sort_values())
+    return df
+
+
+def _open_text(source: Any, compression: Optional[str], encoding: str) -> io.TextIOBase:
+    """Text stream over a path or binary file object, decompressing gzip/zstd as it reads."""
+    import gzip
+
+    raw = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    if compression == "gzip":
+        raw = gzip.GzipFile(fileobj=raw)
+    elif compression == "zstd":
+        import zstandard
+        raw = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    elif compression:
+        raise ValueError(f"Unsupported compression for JSON: {compression}")
+    return io.TextIOWrapper(raw, encoding=encoding)
+
+
+def _dataset_format(file_path: str, hints: Dict[str, Any]) -> tuple[str, Optional[str]]:
+    """(extension, compression) to parse with: sniffed hints win over the file name."""
+    ext, compression = split_compression_suffix(file_path)
+    if hints.get("format"):
+        ext = f".{hints['format']}"
+    if "compression" in hints:
+        compression = hints["compression"]
+    return ext, compression
+
+
+@contextlib.contextmanager
+def _dataset_source(file_path: str, ext: str, compression: Optional[str], hints: Dict[str, Any]) -> Iterator[tuple[Any, str, Optional[str]]]:
+    """
+    Yields (source, ext, compression) for the parser: the path itself, or for
+    zip uploads the open (seekable) data member and its format.
+    """
+    if compression != "zip":
+        yield file_path, ext, compression
+        return
+    # Open the member ourselves so stray macOS metadata doesn't trip pandas
+    with zipfile.ZipFile(file_path) as archive:
+        member = hints.get("archive_member") or pick_archive_member(archive)
+        if not hints.get("format"):
+            ext = Path(member).suffix.lower()
+        with archive.open(member) as source:
+            yield source, ext, None
+
+
+def _csv_options(hints: Dict[str, Any], compression: Optional[str]) -> Dict[str, Any]:
+    return dict(
+        low_memory=False,
+        sep=hints.get("delimiter") or ",",
+        encoding=hints.get("encoding") or "utf-8",
+        compression=compression,
+    )
+
+
+def read_csv_chunked(source: Any, usecols: Optional[Callable[[str], bool]] = None, **csv_options: Any) -> pd.DataFrame:
+    """
+    Parses a CSV CSV_CHUNK_ROWS rows at a time, storing each chunk's text
+    columns as categoricals, so peak memory follows the frame being built
+    rather than the one-pass parser's whole-file buffers. Columns come out as
+    read_parquet_projected's do: categoricals with sorted categories, except
+    mostly-unique ones, which end up as plain object columns.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    csv_options.pop("low_memory", None)
+    pieces = []
+    for chunk in pd.read_csv(source, usecols=usecols, chunksize=CSV_CHUNK_ROWS, **csv_options):
+        for column in chunk.select_dtypes(include=["object"]).columns:
+            chunk[column] = chunk[column].astype("category")
+        pieces.append(chunk)
+    if len(pieces) <= 1:
+        df = pieces[0] if pieces else pd.read_csv(source, usecols=usecols, nrows=0, **csv_options)
+        return _finish_chunked_categoricals(df)
+
+    columns = {}
+    for column in pieces[0].columns:
+        parts = [piece[column] for piece in pieces]
+        is_text = [isinstance(part.dtype, pd.CategoricalDtype) for part in parts]
+        if all(is_text):
+            columns[column] = pd.Series(union_categoricals(parts), name=column)
+        elif any(is_text):
+            # Numbers in some chunks, text in others: a one-pass read keeps the whole
+            # column as text, so render the numeric chunks as text too
+            columns[column] = pd.concat(
+                [part.astype(object).where(part.isna(), part.astype(str)) for part in parts], ignore_index=True
+            )
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+        for piece in pieces:
+            del piece[column]
+    return _finish_chunked_categoricals(pd.DataFrame(columns))
+
+
+def _finish_chunked_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    # Same <50% unique rule as read_parquet_projected and normalize_frame
+    for column in df.select_dtypes(include=["category"]).columns:
+        if len(df[column].cat.categories) >= len(df) * 0.5:
+            df[column] = df[column].astype(object)
+        else:
+            df[column] = df[column].cat.reorder_categories(df[column].cat.categories.sort_values())
+    return df
+
+
+def _read_sample(file_path: str, ext: str, compression: Optional[str], hints: Dict[str, Any], columns: Optional[Callable[[str], bool]]) -> Optional[pd.DataFrame]:
+    """The first ESTIMATE_SAMPLE_ROWS rows as load_dataset would materialize them."""
+    import pandas as pd
+
+    with _dataset_source(file_path, ext, compression, hints) as (source, ext, compression):
+        if ext == ".csv":
+            csv_options = _csv_options(hints, compression)
+            sample = pd.read_csv(source, usecols=columns, nrows=ESTIMATE_SAMPLE_ROWS, **csv_options)
+            if columns is not None and len(sample.columns) == 0:
+                if source is not file_path:
+                    source.seek(0)
+                sample = pd.read_csv(source, nrows=ESTIMATE_SAMPLE_ROWS, **csv_options)
+            return sample
+        if ext in JSON_LINES_SUFFIXES:
+            with _open_text(source, compression, hints.get("encoding") or "utf-8") as stream:
+                head = "".join(line for _, line in zip(range(ESTIMATE_SAMPLE_ROWS), stream))
+            return read_json_records(io.StringIO(head), "lines", columns)
+        if ext == ".json":
+            # Only JSON arrays get a sniffed row count; see record_shape
+            import itertools
+
+            buffers = ColumnBuffers(columns)
+            with _open_text(source, compression, hints.get("encoding") or "utf-8") as stream:
+                for record in itertools.islice(_iter_json_array(_read_text_chunks(stream)), ESTIMATE_SAMPLE_ROWS):
+                    buffers.append(record)
+            return buffers.to_frame()
+        if ext == ".parquet" and not compression:
+            import pyarrow.parquet as pq
+
+            parquet_file = pq.ParquetFile(source, memory_map=True)
+            names = [name for name in parquet_file.schema_arrow.names if columns is None or columns(name)]
+            batch = next(parquet_file.iter_batches(batch_size=ESTIMATE_SAMPLE_ROWS, columns=names), None)
+            return batch.to_pandas() if batch is not None else None
+    return None
+
+
+def estimate_load(
+    file_path: str,
+    hints: Optional[Dict[str, Any]] = None,
+    columns: Optional[Callable[[str], bool]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Sizes the frame load_dataset would build, without building it: a parsed
+    sample's deep memory per row, scaled to the row count sniffed at upload.
+
+    Returns rows, columns, frame_bytes (the loaded frame), peak_bytes (frame
+    plus the one-pass parser's working set) and chunkable (read_csv_chunked
+    can load it near frame_bytes). None when the row count isn't known up
+    front (column-oriented JSON documents, files without sniff hints) or the
+    sample fails to parse; load_dataset reports the parse error itself.
+    """
+    hints = hints or {}
+    ext, compression = _dataset_format(file_path, hints)
+    rows = hints.get("row_count")
+    if ext == ".parquet" and not compression:
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(file_path).metadata
+        rows = metadata.num_rows
+        # Arrow table before to_pandas: about the projected columns' uncompressed size
+        names = {field.name for field in metadata.schema.to_arrow_schema() if columns is None or columns(field.name)}
+        parse_bytes = sum(
+            chunk.total_uncompressed_size
+            for group in range(metadata.num_row_groups)
+            for chunk in (metadata.row_group(group).column(i) for i in range(metadata.num_columns))
+            if chunk.path_in_schema in names
+        )
+    elif ext == ".csv":
+        parse_bytes = (hints.get("decompressed_size") or os.path.getsize(file_path)) * CSV_PARSE_BUFFER_FACTOR
+    elif ext == ".json" or ext in JSON_LINES_SUFFIXES:
+        parse_bytes = None  # Column buffers hold about one more copy of the frame
+    else:
+        return None
+    if not rows:
+        return None
+
+    try:
+        sample = _read_sample(file_path, ext, compression, hints, columns)
+    except Exception:
+        return None
+    if sample is None or len(sample) == 0:
+        return None
+    frame_bytes = int(sample.memory_usage(deep=True, index=False).sum() / len(sample) * rows)
+    return {
+        "rows": rows,
+        "columns": len(sample.columns),
+        "frame_bytes": frame_bytes,
+        "peak_bytes": int(frame_bytes + (frame_bytes if parse_bytes is None else parse_bytes)),
+        "chunkable": ext == ".csv",
+    }
+
+
+def load_dataset(
+    file_path: str,
+    hints: Optional[Dict[str, Any]] = None,
+    columns: Optional[Callable[[str], bool]] = None,
+    chunked: bool = False,
+) -> pd.DataFrame:
     import pandas as pd
     import numpy as np
     """
     Loads a dataset from the given path into a Pandas DataFrame.
     
     Guardrails:
-    1. File Size < 100MB
-    2. Supported Formats: CSV, JSON, Parquet
+    1. File Size < 100MB (stored bytes) and < MAX_DECOMPRESSED_SIZE_MB inflated
+    2. Supported Formats: CSV, JSON, Parquet (CSV/JSON may be gzip/zstd/zip)
     3. Memory Optimization: specific types
     4. Sanitization: NaN/Inf -> None
+
+    Compressed files are decompressed on the fly by the parser; no
+    decompressed copy is written to disk.
+
+    `hints` is the sniff result recorded at upload time (encoding, delimiter,
+    format); when present the loader trusts it instead of re-detecting.
+
+    `columns` is an optional projection predicate on column names; only
+    matching columns are materialized (CSV `usecols`, JSON column buffers).
+
+    `chunked` parses CSV through read_csv_chunked: lower peak memory, for
+    loads the job's memory budget can't fit in one pass (see estimate_load).
     """
-    log_step(logger, "dataset.load.begin", file_path=file_path)
+    hints = hints or {}
+    log_step(logger, "dataset.load.begin", file_path=file_path, chunked=chunked)
     
     # --- Guardrail 1: File Size ---
     if not os.path.exists(file_path):
@@ -34,19 +1005,41 @@ def load_dataset(file_path: str) -> pd.DataFrame:
             f"Maximum allowed size is {MAX_FILE_SIZE_MB} MB."
         )
 
+    decompressed_size = hints.get("decompressed_size")
+    if decompressed_size and decompressed_size > MAX_DECOMPRESSED_SIZE_BYTES:
+        raise ValueError(
+            f"File expands to {decompressed_size / 1024 / 1024:.2f} MB. "
+            f"Maximum decompressed size is {settings.MAX_DECOMPRESSED_SIZE_MB} MB."
+        )
+
     # --- Loading Logic ---
-    ext = Path(file_path).suffix.lower()
-    log_step(logger, "dataset.load.extension_detected", file_path=file_path, extension=ext)
-    
+    ext, compression = _dataset_format(file_path, hints)
+    log_step(logger, "dataset.load.extension_detected", file_path=file_path, extension=ext, compression=compression)
+
     try:
-        if ext == '.csv':
-            df = pd.read_csv(file_path, low_memory=False)
-        elif ext == '.json':
-            df = pd.read_json(file_path)
-        elif ext == '.parquet':
-            df = pd.read_parquet(file_path)
-        else:
-            raise ValueError(f"Unsupported file extension: {ext}")
+        with _dataset_source(file_path, ext, compression, hints) as (source, ext, compression):
+            if ext == '.csv':
+                csv_options = _csv_options(hints, compression)
+                read_csv = read_csv_chunked if chunked else pd.read_csv
+                df = read_csv(source, usecols=columns, **csv_options)
+                if columns is not None and len(df.columns) == 0:
+                    # No column matched: keep the row count by loading unprojected
+                    if source is not file_path:
+                        source.seek(0)
+                    df = read_csv(source, **csv_options)
+            elif ext in ('.json', '.jsonl', '.ndjson'):
+                layout = "lines" if ext in JSON_LINES_SUFFIXES else None
+                with _open_text(source, compression, hints.get("encoding") or "utf-8") as stream:
+                    df = read_json_records(stream, layout, columns)
+            elif ext == '.parquet':
+                if compression:
+                    raise ValueError("Compressed Parquet files are not supported")
+                df = read_parquet_projected(source, columns)
+            else:
+                raise ValueError(f"Unsupported file extension: {ext}")
+    except MemoryError:
+        # Not a parse failure; let the job fail with the memory error rather than skip the file
+        raise
     except Exception as e:
         raise ValueError(f"Failed to parse file: {str(e)}")
 
@@ -60,17 +1053,28 @@ def load_dataset(file_path: str) -> pd.DataFrame:
     #          df[col] = df[col].astype('category')
 
     # --- Sanitization: NaN/Inf -> None ---
-    # Replace infinite values with NaN
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    # Replace infinite values with NaN (only float columns can hold them)
+    float_columns = df.select_dtypes(include=["floating"]).columns
+    if len(float_columns):
+        df[float_columns] = df[float_columns].replace([np.inf, -np.inf], np.nan)
     
     # Replace specific string "NaN" or "Infinity" variants if necessary (pandas handles most)
     
     # Replace NaN with None (JSON safe)
-    # Note: efficient way for whole DF
-    df = df.where(pd.notnull(df), None)
+    # Typed columns (numeric, datetime, categorical) keep their own null
+    # marker; only object columns are rewritten, so typed data isn't copied.
+    object_columns = df.select_dtypes(include=["object"]).columns
+    if len(object_columns):
+        df[object_columns] = df[object_columns].where(df[object_columns].notna(), None)
 
     log_step(logger, "dataset.load.success", file_path=file_path, row_count=len(df), column_count=len(df.columns))
     return df
 
 
-instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions"})
+instrument_class_methods(
+    UploadSniffer,
+    logger,
+    exclude_names={"feed", "_ingest", "_decompress", "_scan", "_validate_text", "_count_records"},
+)
+# _read_sample failures are expected (estimate_load falls back to no estimate)
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_class_methods", "_read_sample"})
@@ -1,25 +1,67 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 import uuid
 import hashlib
+import time
+from collections import Counter
 from datetime import datetime
 from app.schemas.report import JobStatus, ReportPayload
+from app.services.report_payloads import SerializedReport, serialize_report
+from app.core.metrics import JOB_PHASE_SECONDS, job_status_changed
 from app.core.observability import get_logger, instrument_class_methods, log_step
 
 logger = get_logger(__name__)
 
 class Job:
-    def __init__(self, job_id: str, file_ids: List[str], file_paths: List[str], project_id: str, owner_emp_id: str):
+    def __init__(
+        self,
+        job_id: str,
+        file_ids: List[str],
+        file_paths: List[str],
+        project_id: str,
+        owner_emp_id: str,
+        file_hints: Optional[Dict[str, dict]] = None,
+    ):
         self.job_id = job_id
         self.file_ids = file_ids
         self.file_paths = file_paths
+        # path -> sniff result from upload (format/encoding/delimiter/columns)
+        self.file_hints: Dict[str, dict] = file_hints or {}
         self.project_id = project_id
         self.owner_emp_id = owner_emp_id
         self.status = JobStatus.PENDING
         self.progress = 0
+        # Last finished pipeline stage and per-stage wall time (see StageTracker in analysis.py)
+        self.stage: Optional[str] = None
+        self.stage_durations_ms: Dict[str, float] = {}
+        # Sampling profile of a slow run (PROFILE_JOBS_OVER_SECONDS), see app/core/profiling.py
+        self.profile_path: Optional[str] = None
+        # Memory budget, load plan and RSS peaks of the last run (see app/core/memory.py)
+        self.memory: Dict[str, Any] = {}
         self.error: Optional[str] = None
-        self.payload: Optional[ReportPayload] = None
+        # Completed payload, serialized + compressed once (see report_payloads.py)
+        self.result: Optional[SerializedReport] = None
         self.created_at = datetime.utcnow()
         self.processing_started_at: Optional[datetime] = None
+        self.group_id: Optional[str] = None
+        # Queue lease holder while this process runs the job, and claims so far (see app/core/queue.py)
+        self.worker_id: Optional[str] = None
+        self.attempts = 0
+
+class JobGroup:
+    """
+    A batch of report jobs submitted together.
+    Jobs in the same group share parsed frames for overlapping file paths,
+    so a path used by N file sets is only parsed once.
+    """
+    def __init__(self, group_id: str, job_ids: List[str], project_id: str, owner_emp_id: str):
+        self.group_id = group_id
+        self.job_ids = job_ids
+        self.project_id = project_id
+        self.owner_emp_id = owner_emp_id
+        self.created_at = datetime.utcnow()
+        # path -> parsed DataFrame, released once no unfinished job needs it
+        self.frame_cache: Dict[str, Any] = {}
+        self.frame_refs: Counter = Counter()
 
 # In-Memory Stores
 # WARNING: This is a DEVELOPMENT STUB.
@@ -27,6 +69,8 @@ class Job:
 # - LOST ON RESTART
 # - NO CONCURRENCY SAFETY
 # Must be replaced by Redis/Postgres in Phase C.
+# Other processes see a job through its queue row (app/core/queue.py), which
+# carries the spec, progress and result; this store is per process.
 # 1. Main Job Store: job_id -> Job
 jobs_db: Dict[str, Job] = {}
 
@@ -34,6 +78,11 @@ jobs_db: Dict[str, Job] = {}
 # Prevents duplicate processing for exact same file set
 idempotency_index: Dict[str, str] = {}
 
+# 3. Batch Store: group_id -> JobGroup
+job_groups_db: Dict[str, JobGroup] = {}
+
+TERMINAL_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED}
+
 class JobManager:
     @staticmethod
     def _generate_idempotency_key(file_ids: List[str], owner_emp_id: str) -> str:
@@ -72,7 +121,21 @@ class JobManager:
         return sum(1 for job in jobs_db.values() if job.status == JobStatus.PENDING)
 
     @staticmethod
-    def create_job(file_ids: List[str], file_paths: List[str], project_id: str, owner_emp_id: str) -> tuple[str, bool]:
+    def count_pending_jobs_for_owner(owner_emp_id: str) -> int:
+        return sum(
+            1
+            for job in jobs_db.values()
+            if job.owner_emp_id == owner_emp_id and job.status == JobStatus.PENDING
+        )
+
+    @staticmethod
+    def create_job(
+        file_ids: List[str],
+        file_paths: List[str],
+        project_id: str,
+        owner_emp_id: str,
+        file_hints: Optional[Dict[str, dict]] = None,
+    ) -> tuple[str, bool]:
         """
         Creates a new job or returns existing one if duplicate (Idempotency).
         Returns: (job_id, is_existing)
@@ -87,10 +150,11 @@ class JobManager:
         
         # Create New
         job_id = str(uuid.uuid4())
-        new_job = Job(job_id, file_ids, file_paths, project_id, owner_emp_id)
+        new_job = Job(job_id, file_ids, file_paths, project_id, owner_emp_id, file_hints=file_hints)
         
         jobs_db[job_id] = new_job
         idempotency_index[key] = job_id
+        job_status_changed(None, new_job.status)
 
         log_step(logger, "jobs.create.success", job_id=job_id, owner_emp_id=owner_emp_id, file_count=len(file_ids))
         return job_id, False
@@ -100,12 +164,132 @@ class JobManager:
         return jobs_db.get(job_id)
 
     @staticmethod
-    def update_job_status(job_id: str, status: JobStatus, progress: int = 0, error: str = None, payload: ReportPayload = None):
+    def job_spec(job: Job) -> Dict[str, Any]:
+        """What another process needs to run or serve the job (stored on its queue row)."""
+        return {
+            "file_ids": job.file_ids,
+            "file_paths": job.file_paths,
+            "file_hints": job.file_hints,
+            "project_id": job.project_id,
+        }
+
+    @staticmethod
+    def adopt_job(job_id: str, owner_emp_id: str, spec: Dict[str, Any]) -> Job:
+        """
+        Registers a job created by another process, from its queue spec.
+        Starts PENDING; the caller moves it to the queue row's state.
+        """
+        existing = jobs_db.get(job_id)
+        if existing:
+            return existing
+        job = Job(job_id, spec["file_ids"], spec["file_paths"], spec["project_id"], owner_emp_id, file_hints=spec.get("file_hints"))
+        jobs_db[job_id] = job
+        idempotency_index.setdefault(JobManager._generate_idempotency_key(job.file_ids, owner_emp_id), job_id)
+        job_status_changed(None, job.status)
+        log_step(logger, "jobs.adopted", job_id=job_id, owner_emp_id=owner_emp_id)
+        return job
+
+    @staticmethod
+    def create_group(job_ids: List[str], project_id: str, owner_emp_id: str) -> JobGroup:
+        """
+        Registers a batch of already-created jobs as one group.
+        Jobs that are still unfinished take a reference on each of their file
+        paths so the group's frame cache knows when a frame can be dropped.
+        """
+        group_id = str(uuid.uuid4())
+        group = JobGroup(group_id, list(dict.fromkeys(job_ids)), project_id, owner_emp_id)
+        for job_id in group.job_ids:
+            job = jobs_db.get(job_id)
+            if not job or job.status in TERMINAL_STATUSES:
+                continue
+            # A job shared with an older group keeps using that group's cache.
+            if job.group_id is None:
+                job.group_id = group_id
+            if job.group_id == group_id:
+                group.frame_refs.update(set(job.file_paths))
+
+        job_groups_db[group_id] = group
+        log_step(logger, "jobs.group.created", group_id=group_id, owner_emp_id=owner_emp_id, job_count=len(group.job_ids))
+        return group
+
+    @staticmethod
+    def get_group(group_id: str) -> Optional[JobGroup]:
+        return job_groups_db.get(group_id)
+
+    @staticmethod
+    def summarize_group(group: JobGroup) -> Dict[str, Any]:
+        """Aggregate status/progress across the jobs of a group."""
+        jobs = [jobs_db[job_id] for job_id in group.job_ids if job_id in jobs_db]
+        counts = Counter(job.status for job in jobs)
+        total = len(jobs)
+        finished = counts[JobStatus.COMPLETED] + counts[JobStatus.FAILED]
+
+        if total and counts[JobStatus.FAILED] == total:
+            status = JobStatus.FAILED
+        elif finished == total:
+            status = JobStatus.COMPLETED
+        elif counts[JobStatus.PENDING] == total:
+            status = JobStatus.PENDING
+        else:
+            status = JobStatus.PROCESSING
+
+        progress = round(sum(job.progress for job in jobs) / total) if total else 100
+        if status != JobStatus.COMPLETED:
+            progress = min(progress, 99)
+
+        return {
+            "status": status,
+            "progress": progress,
+            "total": total,
+            "pending": counts[JobStatus.PENDING],
+            "processing": counts[JobStatus.PROCESSING],
+            "completed": counts[JobStatus.COMPLETED],
+            "failed": counts[JobStatus.FAILED],
+        }
+
+    @staticmethod
+    def release_group_frames(job_id: str) -> None:
+        """Drops the job's references on its group's cached frames."""
+        job = jobs_db.get(job_id)
+        if not job or not job.group_id:
+            return
+        group = job_groups_db.get(job.group_id)
+        if not group:
+            return
+
+        for path in set(job.file_paths):
+            if group.frame_refs[path] <= 0:
+                continue
+            group.frame_refs[path] -= 1
+            if group.frame_refs[path] <= 0:
+                del group.frame_refs[path]
+                group.frame_cache.pop(path, None)
+        log_step(logger, "jobs.group.frames_released", group_id=group.group_id, job_id=job_id, cached=len(group.frame_cache))
+
+    @staticmethod
+    def update_job_status(
+        job_id: str,
+        status: JobStatus,
+        progress: int = 0,
+        error: str = None,
+        payload: ReportPayload = None,
+        stage: str = None,
+        stage_duration_ms: float = None,
+    ):
         # Local import to avoid circular dependency if any (though state.py only imports schema)
         from app.core.state import JobStateMachine, InvalidTransitionError
         
         job = jobs_db.get(job_id)
         if job:
+            # Serialize before touching the job: this may run in a worker thread, and
+            # pollers must never see COMPLETED without the result bytes.
+            result = None
+            if payload:
+                serialize_started = time.perf_counter()
+                result = serialize_report(job_id, payload)
+                serialize_seconds = time.perf_counter() - serialize_started
+                JOB_PHASE_SECONDS.labels("serialize").observe(serialize_seconds)
+
             # 1. Validate Transition
             try:
                 JobStateMachine.validate_transition(job.status, status)
@@ -131,16 +315,25 @@ class JobManager:
                 if progress >= 100:
                     progress = 99
 
+            job_status_changed(job.status, status)
+            entering_processing = status == JobStatus.PROCESSING and job.status != JobStatus.PROCESSING
+            if result is not None:
+                job.result = result
+                job.stage = "serialize"
+                job.stage_durations_ms["serialize"] = round(serialize_seconds * 1000, 2)
             job.status = status
             job.progress = progress
-            if status == JobStatus.PROCESSING:
+            if entering_processing:
+                # Progress updates within PROCESSING must not push back the reaper's deadline
                 job.processing_started_at = datetime.utcnow()
             elif status in {JobStatus.COMPLETED, JobStatus.FAILED}:
                 job.processing_started_at = None
             if error:
                 job.error = error
-            if payload:
-                job.payload = payload
+            if stage:
+                job.stage = stage
+                if stage_duration_ms is not None:
+                    job.stage_durations_ms[stage] = stage_duration_ms
             # If failed, should we release idempotency?
             # Workflow Step 7 mentions Reaper does it. 
             # Immediate fail could also do it.
@@ -150,7 +343,7 @@ class JobManager:
                  key = JobManager._generate_idempotency_key(job.file_ids, job.owner_emp_id)
                  if key in idempotency_index and idempotency_index[key] == job_id:
                      del idempotency_index[key]
-            log_step(logger, "jobs.status.updated", job_id=job_id, status=status, progress=progress)
+            log_step(logger, "jobs.status.updated", job_id=job_id, status=status, progress=progress, stage=job.stage)
 
     @staticmethod
     def mark_timed_out(job_id: str, error: str = "TIMEOUT_EXCEEDED") -> None:
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import service_role_supabase as supabase
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
+
+if TYPE_CHECKING:
+    import smtplib
+
+logger = get_logger(__name__)
+
+# Absolute path to the backend root directory (cortex/backend/)
+_BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+_FALLBACK_LOG_PATH = _BACKEND_ROOT / "invites_fallback.log"
+
+OUTBOX_TABLE = "mail_outbox"
+# Cleared once a row is sent or given up on (see sql/12_mail_outbox.sql)
+_BODY_COLUMNS = {"text_body": None, "html_body": None, "fallback_note": None}
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def smtp_configured() -> bool:
+    """Host, port and sender are enough; credentials only when a username is set (local debug servers need none)."""
+    if not settings.SMTP_HOST or not settings.SMTP_PORT or not settings.SMTP_FROM_EMAIL:
+        return False
+    return not settings.SMTP_USERNAME or bool(settings.SMTP_PASSWORD)
+
+
+def log_fallback(note: str) -> None:
+    """Last resort when mail can't go out: the admin copies the link from the console or invites_fallback.log."""
+    fallback_msg = f"[INVITE FALLBACK LINK] {note}"
+    logger.warning(fallback_msg)
+    print(f"\n{fallback_msg}\n")
+    try:
+        with open(_FALLBACK_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(f"{utc_now().isoformat()} - {fallback_msg}\n")
+    except Exception:
+        pass
+
+
+def enqueue_mail(
+    recipient: str,
+    subject: str,
+    text_body: str,
+    html_body: Optional[str] = None,
+    kind: str = "invite",
+    fallback_note: Optional[str] = None,
+) -> Dict[str, Any]:
+    row = {
+        "kind": kind,
+        "recipient": recipient,
+        "subject": subject,
+        "text_body": text_body,
+        "html_body": html_body,
+        "fallback_note": fallback_note,
+        "status": "queued",
+        "next_attempt_at": utc_now().isoformat(),
+    }
+    res = supabase.table(OUTBOX_TABLE).insert(row).execute()
+    outbox_row = res.data[0] if res.data else row
+    log_step(logger, "mail_outbox.enqueued", outbox_id=outbox_row.get("id"), kind=kind, recipient=recipient)
+    return outbox_row
+
+
+def build_message(row: Dict[str, Any]) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = row["subject"]
+    message["From"] = formataddr((settings.SMTP_FROM_NAME, settings.SMTP_FROM_EMAIL))
+    message["To"] = row["recipient"]
+    message.set_content(row.get("text_body") or "")
+    if row.get("html_body"):
+        message.add_alternative(row["html_body"], subtype="html")
+    return message
+
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection reused across messages and batches.
+    Reconnects once if the server dropped it; the sender loop closes it
+    after MAIL_OUTBOX_SMTP_IDLE_SECONDS without traffic.
+    """
+
+    def __init__(self):
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connections = 0
+
+    def send(self, message: EmailMessage) -> None:
+        import smtplib
+
+        with self._lock:
+            try:
+                self._connection().send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self._close()
+                self._connection().send_message(message)
+            self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        with self._lock:
+            if self._smtp is not None and time.monotonic() - self._last_used > settings.MAIL_OUTBOX_SMTP_IDLE_SECONDS:
+                self._close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _connection(self) -> smtplib.SMTP:
+        # Caller holds self._lock
+        if self._smtp is not None:
+            return self._smtp
+        # smtplib/ssl load with the first message rather than at startup
+        import smtplib
+        import ssl
+
+        smtp = smtplib.SMTP(settings.SMTP_HOST, int(settings.SMTP_PORT), timeout=settings.SMTP_TIMEOUT_SECONDS)
+        try:
+            smtp.ehlo()
+            log_step(logger, "mail_outbox.smtp.connected", host=settings.SMTP_HOST, port=settings.SMTP_PORT)
+            if settings.SMTP_STARTTLS:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if settings.SMTP_USERNAME:
+                smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+                log_step(logger, "mail_outbox.smtp.authenticated", username=settings.SMTP_USERNAME)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._last_used = time.monotonic()
+        self.connections += 1
+        return smtp
+
+    def _close(self) -> None:
+        # Caller holds self._lock
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+        log_step(logger, "mail_outbox.smtp.closed")
+
+
+class OutboxStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"sent": 0, "retried": 0, "failed": 0, "batches": 0}
+        self.last_error: Optional[str] = None
+
+    def record(self, outcome: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+            if error:
+                self.last_error = error
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "smtp_connections": smtp_session.connections, "last_error": self.last_error}
+
+
+smtp_session = SMTPSession()
+outbox_stats = OutboxStats()
+
+
+def _retry_delay_seconds(attempts: int) -> float:
+    return min(settings.MAIL_OUTBOX_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), 3600)
+
+
+def _is_permanent(exc: Exception) -> bool:
+    import smtplib
+
+    # 5xx replies to the message itself (bad recipient, rejected content) won't
+    # succeed on retry; connection/auth problems and 4xx replies might.
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, (smtplib.SMTPAuthenticationError, smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return False
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 500 <= exc.smtp_code < 600
+    return False
+
+
+def _is_session_error(exc: Exception) -> bool:
+    import smtplib
+
+    # smtplib errors subclass OSError; plain OSErrors are socket/TLS failures
+    if isinstance(exc, (smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError, smtplib.SMTPServerDisconnected)):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _mark_sent(row: Dict[str, Any]) -> None:
+    supabase.table(OUTBOX_TABLE).update(
+        {"status": "sent", "sent_at": utc_now().isoformat(), "last_error": None, **_BODY_COLUMNS}
+    ).eq("id", row["id"]).execute()
+    outbox_stats.record("sent")
+    log_step(logger, "mail_outbox.sent", outbox_id=row["id"], recipient=row["recipient"], attempts=row.get("attempts"))
+
+
+def _mark_failed(row: Dict[str, Any], exc: Exception) -> None:
+    attempts = int(row.get("attempts") or 0)
+    error = f"{type(exc).__name__}: {exc}"[:500]
+    if _is_permanent(exc) or attempts >= settings.MAIL_OUTBOX_MAX_ATTEMPTS:
+        if row.get("fallback_note"):
+            log_fallback(row["fallback_note"])
+        supabase.table(OUTBOX_TABLE).update(
+            {"status": "failed", "last_error": error, **_BODY_COLUMNS}
+        ).eq("id", row["id"]).execute()
+        outbox_stats.record("failed", error)
+        log_step(logger, "mail_outbox.failed", outbox_id=row["id"], recipient=row["recipient"], attempts=attempts, error=error)
+        return
+
+    next_attempt_at = utc_now() + timedelta(seconds=_retry_delay_seconds(attempts))
+    supabase.table(OUTBOX_TABLE).update(
+        {"status": "queued", "last_error": error, "next_attempt_at": next_attempt_at.isoformat()}
+    ).eq("id", row["id"]).execute()
+    outbox_stats.record("retried", error)
+    log_step(
+        logger,
+        "mail_outbox.retry_scheduled",
+        outbox_id=row["id"],
+        attempts=attempts,
+        next_attempt_at=next_attempt_at.isoformat(),
+        error=error,
+    )
+
+
+def claim_due(limit: int) -> List[Dict[str, Any]]:
+    res = supabase.rpc(
+        "claim_mail_outbox",
+        {
+            "p_now": utc_now().isoformat(),
+            "p_limit": limit,
+            "p_stale_seconds": settings.MAIL_OUTBOX_STALE_CLAIM_SECONDS,
+        },
+    ).execute()
+    return res.data or []
+
+
+def deliver_due(limit: Optional[int] = None) -> int:
+    """
+    Claims one batch of due messages and sends them over the shared SMTP
+    session. Returns how many rows were claimed (0 = outbox idle).
+    """
+    rows = claim_due(limit or settings.MAIL_OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+    outbox_stats.record("batches")
+
+    if not smtp_configured():
+        for row in rows:
+            _mark_failed(row, RuntimeError("SMTP is not configured"))
+        return len(rows)
+
+    for index, row in enumerate(rows):
+        try:
+            smtp_session.send(build_message(row))
+        except Exception as exc:
+            if not _is_session_error(exc):
+                _mark_failed(row, exc)
+                continue
+            # The session itself is broken: back off the rest of the batch
+            # rather than reconnecting once per message.
+            smtp_session.close()
+            for pending in rows[index:]:
+                _mark_failed(pending, exc)
+            break
+        else:
+            _mark_sent(row)
+    return len(rows)
+
+
+instrument_class_methods(SMTPSession, logger, exclude_names={"_connection", "_close"})
+instrument_module_functions(
+    globals(),
+    logger,
+    exclude_names={"instrument_module_functions", "instrument_class_methods", "utc_now", "_retry_delay_seconds", "_is_permanent", "_is_session_error"},
+)
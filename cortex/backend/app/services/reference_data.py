@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import service_role_supabase as supabase
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
+
+logger = get_logger(__name__)
+
+# Background refreshes for stale entries; one slow Supabase call must not
+# hold up the request that happened to notice the entry went stale.
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="refcache")
+
+
+class ReadThroughCache:
+    """
+    TTL read-through cache for rarely-changing reference rows.
+
+    - Fresh entries are served from memory.
+    - Stale entries (older than ttl, younger than ttl + stale_ttl) are still
+      served while a single background refresh reloads them.
+    - Misses load once per key: concurrent callers wait on the same load
+      instead of stampeding Supabase. A loader result of None (no such row)
+      is returned but not cached, so a row created later shows up at once.
+    - Writers call invalidate(key) after changing the row.
+
+    Values are handed out as deep copies so callers can't mutate the cache.
+    Invalidation is per process; other workers converge within `ttl`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[Hashable], Any],
+        ttl_seconds: float,
+        stale_ttl_seconds: float = 0.0,
+        max_entries: int = 1024,
+    ):
+        self.name = name
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._generation: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl_seconds:
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                if age < self.ttl_seconds + self.stale_ttl_seconds:
+                    self.stale_hits += 1
+                    self._start_load(key, background=True)
+                    return copy.deepcopy(value)
+            self.misses += 1
+            future, owner = self._start_load(key, background=False)
+            if not owner:
+                self.coalesced += 1
+
+        if owner:
+            self._load(key, future)
+        return copy.deepcopy(future.result())
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drops one key (or everything). Loads already in flight won't repopulate it."""
+        with self._lock:
+            self.invalidations += 1
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                self._entries.pop(k, None)
+                self._generation[k] = self._generation.get(k, 0) + 1
+            if key is None:
+                for k in list(self._inflight):
+                    self._generation[k] = self._generation.get(k, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            reads = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / reads, 4) if reads else None,
+                "loads": self.loads,
+                "load_errors": self.load_errors,
+                "coalesced": self.coalesced,
+                "invalidations": self.invalidations,
+            }
+
+    def _start_load(self, key: Hashable, background: bool) -> Tuple[Future, bool]:
+        # Caller holds self._lock
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        self._inflight[key] = future
+        if background:
+            _refresh_pool.submit(self._load, key, future)
+        return future, True
+
+    def _load(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            generation = self._generation.get(key, 0)
+        try:
+            value = self.loader(key)
+        except Exception as exc:
+            with self._lock:
+                self.load_errors += 1
+                self._inflight.pop(key, None)
+            log_step(logger, "reference_cache.load_failed", cache=self.name, error=str(exc))
+            future.set_exception(exc)
+            return
+
+        with self._lock:
+            self.loads += 1
+            self._inflight.pop(key, None)
+            # An invalidation raced this load: the value may predate the write
+            if value is not None and self._generation.get(key, 0) == generation:
+                if key not in self._entries and len(self._entries) >= self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                    del self._entries[oldest]
+                self._entries[key] = (value, time.monotonic())
+        future.set_result(value)
+
+
+def _load_departments(_key: Hashable) -> List[Dict[str, Any]]:
+    res = supabase.table("departments").select("dept_id,dept_name").order("dept_id").execute()
+    return res.data or []
+
+
+# What cached_user callers read; never hashed_password (login reads it uncached)
+USER_PROFILE_COLUMNS = (
+    "email,emp_id,full_name,dept_id,role,is_approved,"
+    "slack_access_token,slack_connected_at,slack_user_id,slack_team_id,slack_team_name"
+)
+
+
+def _load_user(email: Hashable) -> Optional[Dict[str, Any]]:
+    res = supabase.table("users").select(USER_PROFILE_COLUMNS).eq("email", email).execute()
+    return res.data[0] if res.data else None
+
+
+department_cache = ReadThroughCache(
+    "departments",
+    _load_departments,
+    ttl_seconds=settings.REFERENCE_CACHE_DEPARTMENTS_TTL_SECONDS,
+    stale_ttl_seconds=settings.REFERENCE_CACHE_DEPARTMENTS_TTL_SECONDS,
+    max_entries=1,
+)
+user_profile_cache = ReadThroughCache(
+    "user_profiles",
+    _load_user,
+    ttl_seconds=settings.REFERENCE_CACHE_USERS_TTL_SECONDS,
+    stale_ttl_seconds=settings.REFERENCE_CACHE_USERS_TTL_SECONDS,
+    max_entries=settings.REFERENCE_CACHE_USERS_MAX_ENTRIES,
+)
+
+
+def cached_departments() -> List[Dict[str, Any]]:
+    return department_cache.get("all")
+
+
+def cached_user(email: str) -> Optional[Dict[str, Any]]:
+    """Profile and Slack columns of the `users` row (or None) for a normalized email."""
+    return user_profile_cache.get(email)
+
+
+def invalidate_departments() -> None:
+    department_cache.invalidate()
+
+
+def invalidate_user(email: str) -> None:
+    user_profile_cache.invalidate(email)
+    log_step(logger, "reference_cache.user_invalidated", email=email)
+
+
+def reference_cache_stats() -> Dict[str, Any]:
+    return {
+        department_cache.name: department_cache.stats(),
+        user_profile_cache.name: user_profile_cache.stats(),
+    }
+
+
+instrument_class_methods(ReadThroughCache, logger, exclude_names={"get", "_start_load", "stats"})
+instrument_module_functions(
+    globals(),
+    logger,
+    exclude_names={"instrument_module_functions", "instrument_class_methods", "cached_departments", "cached_user"},
+)
@@ -0,0 +1,74 @@
+import gzip
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from app.core.compression import brotli, negotiate_encoding
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_module_functions, log_step
+from app.schemas.report import JobStatus, ReportPayload
+
+logger = get_logger(__name__)
+
+_payload_adapter = TypeAdapter(ReportPayload)
+
+
+class SerializedReport:
+    """
+    A completed job's response, serialized and compressed once.
+
+    Polls of a finished job only pick the right pre-encoded bytes; the widget
+    tree is never re-validated or re-serialized. The pydantic payload isn't
+    kept, which also drops its (much larger) object graph from memory.
+    """
+
+    __slots__ = ("job_id", "payload_json", "stage", "etag", "encoded")
+
+    def __init__(self, job_id: str, payload_json: bytes, stage: Optional[str] = "serialize"):
+        self.job_id = job_id
+        # Result bytes only exist once the serialize stage has run
+        self.stage = stage
+        self.payload_json = payload_json
+        self.etag = '"' + hashlib.sha256(payload_json).hexdigest()[:32] + '"'
+        body = self.envelope()
+        self.encoded: Dict[str, bytes] = {"gzip": gzip.compress(body, compresslevel=settings.REPORT_PAYLOAD_GZIP_LEVEL)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=settings.REPORT_PAYLOAD_BROTLI_QUALITY)
+
+    def envelope(self, is_existing: bool = False) -> bytes:
+        """ReportResponse JSON for the completed job, same field order as the pydantic model."""
+        head = json.dumps(
+            {"job_id": self.job_id, "status": JobStatus.COMPLETED.value, "progress": 100, "stage": self.stage, "error": None},
+            separators=(",", ":"),
+        )
+        tail = b',"is_existing":true}' if is_existing else b',"is_existing":false}'
+        return head[:-1].encode() + b',"payload":' + self.payload_json + tail
+
+    def body_for(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """(body, content_encoding) for a GET; identity only for clients that accept nothing else."""
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            return self.envelope(), None
+        return self.encoded[encoding], encoding
+
+    def sizes(self) -> Dict[str, int]:
+        return {"identity": len(self.payload_json), **{name: len(data) for name, data in self.encoded.items()}}
+
+
+def serialize_report(job_id: str, payload: ReportPayload) -> SerializedReport:
+    report = SerializedReport(job_id, _payload_adapter.dump_json(payload))
+    log_step(logger, "report_payloads.serialized", job_id=job_id, **report.sizes())
+    return report
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "etag_matches"})
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_module_functions, log_step
+
+logger = get_logger(__name__)
+
+SLACK_API_BASE = "https://slack.com/api"
+SLACK_AUTH_ERRORS = {"invalid_auth", "token_revoked", "not_authed", "account_inactive"}
+HISTORY_CHANNEL_LIMIT = 5
+HISTORY_PAGE_SIZE = 20
+
+
+class SlackAPIError(RuntimeError):
+    def __init__(self, method: str, error: str):
+        super().__init__(f"{method}: {error}")
+        self.method = method
+        self.error = error
+
+
+class SlackAuthError(SlackAPIError):
+    """The user's token is no longer valid; the connection should be cleared."""
+    pass
+
+
+class SlackRateLimited(SlackAPIError):
+    def __init__(self, method: str, retry_after: float):
+        super().__init__(method, "ratelimited")
+        self.retry_after = retry_after
+
+
+# One pooled client for the process: keeps TLS sessions to slack.com alive
+# across widget refreshes instead of a handshake per request.
+_client: Optional[httpx.AsyncClient] = None
+# (user key, method) -> monotonic time before which Slack asked us not to call
+_blocked_until: Dict[Tuple[Hashable, str], float] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    # httpx is imported with the first Slack call, not at startup
+    import httpx
+
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=SLACK_API_BASE,
+            timeout=httpx.Timeout(settings.SLACK_HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class TTLCache:
+    """Small LRU with per-entry expiry; event-loop only, so no locking."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def drop_user(self, user_key: Hashable) -> None:
+        for key in [k for k in self._entries if k == user_key or (isinstance(k, tuple) and k[0] == user_key)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "ttl_seconds": self.ttl_seconds, "hits": self.hits, "misses": self.misses}
+
+
+channel_cache = TTLCache(settings.SLACK_CHANNELS_CACHE_TTL_SECONDS, settings.SLACK_CACHE_MAX_ENTRIES)
+message_cache = TTLCache(settings.SLACK_MESSAGES_CACHE_TTL_SECONDS, settings.SLACK_CACHE_MAX_ENTRIES)
+# Concurrent refreshes for the same (user, oldest) share one fetch
+_inflight: Dict[Hashable, "asyncio.Future[List[Dict[str, Any]]]"] = {}
+
+
+async def slack_call(user_key: Hashable, method: str, token: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    GET a Web API method. Honors Retry-After: short waits are slept through
+    once, longer ones raise SlackRateLimited and block the method for this
+    user until the window passes.
+    """
+    block_key = (user_key, method)
+    for _attempt in range(2):
+        blocked_for = _blocked_until.get(block_key, 0.0) - time.monotonic()
+        if blocked_for > 0:
+            if blocked_for > settings.SLACK_MAX_RETRY_WAIT_SECONDS:
+                raise SlackRateLimited(method, blocked_for)
+            await asyncio.sleep(blocked_for)
+
+        resp = await get_client().get(f"/{method}", headers={"Authorization": f"Bearer {token}"}, params=params)
+        if resp.status_code == 429:
+            retry_after = float(resp.headers.get("Retry-After") or 1)
+            _blocked_until[block_key] = time.monotonic() + retry_after
+            log_step(logger, "slack.rate_limited", method=method, retry_after=retry_after)
+            continue
+
+        data = resp.json()
+        if not data.get("ok"):
+            error = data.get("error", "slack_unavailable")
+            if error in SLACK_AUTH_ERRORS:
+                raise SlackAuthError(method, error)
+            raise SlackAPIError(method, error)
+        return data
+
+    raise SlackRateLimited(method, max(0.0, _blocked_until.get(block_key, 0.0) - time.monotonic()))
+
+
+async def list_channels(user_key: Hashable, token: str) -> List[Dict[str, Any]]:
+    channels = channel_cache.get(user_key)
+    if channels is None:
+        data = await slack_call(user_key, "users.conversations", token, {
+            "types": "public_channel,private_channel",
+            "limit": 20,
+        })
+        channels = data.get("channels", [])
+        channel_cache.put(user_key, channels)
+    return channels
+
+
+async def channel_history(
+    user_key: Hashable,
+    token: str,
+    channel_id: str,
+    oldest: str = "0",
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    latest: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One conversations.history page: messages newer than `oldest` and, if
+    given, older than `latest` (both exclusive), newest first.
+    """
+    params: Dict[str, Any] = {"channel": channel_id, "oldest": oldest, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if latest:
+        params["latest"] = latest
+    return await slack_call(user_key, "conversations.history", token, params)
+
+
+def is_user_message(message: Dict[str, Any]) -> bool:
+    return message.get("type") == "message" and not message.get("subtype")
+
+
+def to_widget_message(channel: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "channel": channel.get("name", channel["id"]),
+        "user": message.get("user", ""),
+        "text": message.get("text", ""),
+        "ts": float(message.get("ts", 0)),
+    }
+
+
+async def _channel_messages(
+    user_key: Hashable,
+    token: str,
+    channel: Dict[str, Any],
+    oldest: float,
+    semaphore: asyncio.Semaphore,
+) -> List[Dict[str, Any]]:
+    async with semaphore:
+        try:
+            data = await channel_history(user_key, token, channel["id"], str(oldest) if oldest else "0")
+        except (SlackAuthError, SlackRateLimited):
+            raise
+        except SlackAPIError as exc:
+            # One unreadable channel shouldn't blank the widget
+            log_step(logger, "slack.history.skipped", channel=channel["id"], error=exc.error)
+            return []
+
+    return [to_widget_message(channel, message) for message in data.get("messages", []) if is_user_message(message)]
+
+
+async def _fetch_recent_messages(user_key: Hashable, token: str, oldest: float) -> List[Dict[str, Any]]:
+    channels = (await list_channels(user_key, token))[:HISTORY_CHANNEL_LIMIT]
+    semaphore = asyncio.Semaphore(settings.SLACK_HISTORY_CONCURRENCY)
+    batches = await asyncio.gather(*(
+        _channel_messages(user_key, token, channel, oldest, semaphore) for channel in channels
+    ))
+    messages = [message for batch in batches for message in batch]
+    messages.sort(key=lambda item: item["ts"])
+    return messages
+
+
+async def recent_messages(user_key: Hashable, token: str, oldest: float = 0.0) -> List[Dict[str, Any]]:
+    """Messages from the user's first few channels since `oldest`, oldest first."""
+    cache_key = (user_key, oldest)
+    cached = message_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(cache_key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        messages = await _fetch_recent_messages(user_key, token, oldest)
+    except BaseException as exc:
+        future.set_exception(exc)
+        # Mark retrieved so a failure nobody else awaited isn't logged as unhandled
+        future.exception()
+        raise
+    else:
+        message_cache.put(cache_key, messages)
+        future.set_result(messages)
+        return messages
+    finally:
+        _inflight.pop(cache_key, None)
+
+
+def forget_user(user_key: Hashable) -> None:
+    """Drops cached channels/messages and rate-limit blocks after disconnect or token change."""
+    channel_cache.drop_user(user_key)
+    message_cache.drop_user(user_key)
+    for key in [k for k in _blocked_until if k[0] == user_key]:
+        del _blocked_until[key]
+
+
+def gateway_stats() -> Dict[str, Any]:
+    now = time.monotonic()
+    return {
+        "channels": channel_cache.stats(),
+        "messages": message_cache.stats(),
+        "inflight": len(_inflight),
+        "rate_limited_methods": sum(1 for until in _blocked_until.values() if until > now),
+    }
+
+
+instrument_module_functions(
+    globals(),
+    logger,
+    exclude_names={"instrument_module_functions", "get_client", "gateway_stats", "is_user_message", "to_widget_message"},
+)
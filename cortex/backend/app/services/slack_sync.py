@@ -0,0 +1,360 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.observability import get_logger, instrument_class_methods, instrument_module_functions, log_step
+from app.services import slack_gateway
+from app.services.reference_data import cached_user
+
+logger = get_logger(__name__)
+
+# Slack messages are synced incrementally into a host-local SQLite file:
+# each (user, channel) keeps the newest ts seen as its cursor, and the next
+# sync asks conversations.history only for messages after it. The widget
+# endpoint reads the store, so polling it costs no Slack calls at all.
+#
+# History pages come newest first, so a sync that runs out of pages has a
+# gap between the cursor and the oldest message it reached. The cursor then
+# stays put and the channel records where the walk stopped (backfill_latest)
+# and the newest ts it saw (backfill_newest); later syncs continue the walk
+# down to the cursor before moving it up to backfill_newest.
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS slack_sync_users (
+        user_key TEXT PRIMARY KEY,
+        last_requested_at REAL NOT NULL,
+        last_synced_at REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS slack_channels (
+        user_key TEXT NOT NULL,
+        channel_id TEXT NOT NULL,
+        channel_name TEXT NOT NULL,
+        cursor_ts TEXT NOT NULL DEFAULT '0',
+        backfill_latest TEXT,
+        backfill_newest TEXT,
+        PRIMARY KEY (user_key, channel_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS slack_messages (
+        user_key TEXT NOT NULL,
+        channel_id TEXT NOT NULL,
+        ts_raw TEXT NOT NULL,
+        ts REAL NOT NULL,
+        channel_name TEXT NOT NULL,
+        author TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (user_key, channel_id, ts_raw)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_slack_messages_user_ts ON slack_messages(user_key, ts)",
+)
+# Columns added after the first release; store files outlive deploys
+_ADDED_COLUMNS = (
+    "ALTER TABLE slack_channels ADD COLUMN backfill_latest TEXT",
+    "ALTER TABLE slack_channels ADD COLUMN backfill_newest TEXT",
+)
+
+
+class SlackMessageStore:
+    """Cursors and already-seen messages per user; safe to share between worker processes on one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        for statement in _ADDED_COLUMNS:
+            try:
+                self._conn.execute(statement)
+            except sqlite3.OperationalError:
+                pass  # Already there
+
+    def touch(self, user_key: str, now: float) -> bool:
+        """Marks the user's widget as active. Returns True if the user has never been synced."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO slack_sync_users (user_key, last_requested_at) VALUES (?, ?) "
+                "ON CONFLICT(user_key) DO UPDATE SET last_requested_at = excluded.last_requested_at",
+                (user_key, now),
+            )
+            row = self._conn.execute("SELECT last_synced_at FROM slack_sync_users WHERE user_key = ?", (user_key,)).fetchone()
+            return not row or row[0] == 0
+
+    def claim_due_users(self, now: float, interval: float, active_window: float, limit: int) -> List[str]:
+        """Users with an open widget whose last sync is older than `interval`, claimed for this process."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                rows = cursor.execute(
+                    "SELECT user_key FROM slack_sync_users "
+                    "WHERE last_requested_at >= ? AND last_synced_at <= ? "
+                    "ORDER BY last_synced_at LIMIT ?",
+                    (now - active_window, now - interval, limit),
+                ).fetchall()
+                users = [row[0] for row in rows]
+                cursor.executemany(
+                    "UPDATE slack_sync_users SET last_synced_at = ? WHERE user_key = ?",
+                    [(now, user_key) for user_key in users],
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return users
+
+    def mark_synced(self, user_key: str, now: float) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE slack_sync_users SET last_synced_at = ? WHERE user_key = ?", (now, user_key))
+
+    def cursors(self, user_key: str) -> Dict[str, Tuple[str, Optional[str], Optional[str]]]:
+        """channel_id -> (cursor_ts, backfill_latest, backfill_newest)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id, cursor_ts, backfill_latest, backfill_newest FROM slack_channels WHERE user_key = ?",
+                (user_key,),
+            ).fetchall()
+            return {channel_id: tuple(state) for channel_id, *state in rows}
+
+    def retain_channels(self, user_key: str, channels: Iterable[Dict[str, Any]]) -> None:
+        """Registers the user's current channels and drops stored data for channels no longer synced."""
+        channels = list(channels)
+        keep = [channel["id"] for channel in channels]
+        placeholders = ",".join("?" for _ in keep) or "''"
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(
+                    f"DELETE FROM slack_messages WHERE user_key = ? AND channel_id NOT IN ({placeholders})",
+                    (user_key, *keep),
+                )
+                cursor.execute(
+                    f"DELETE FROM slack_channels WHERE user_key = ? AND channel_id NOT IN ({placeholders})",
+                    (user_key, *keep),
+                )
+                cursor.executemany(
+                    "INSERT INTO slack_channels (user_key, channel_id, channel_name) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_key, channel_id) DO UPDATE SET channel_name = excluded.channel_name",
+                    [(user_key, channel["id"], channel.get("name", channel["id"])) for channel in channels],
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def add_messages(
+        self,
+        user_key: str,
+        channel: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+        cursor_ts: str,
+        backfill_latest: Optional[str] = None,
+        backfill_newest: Optional[str] = None,
+    ) -> int:
+        """
+        Stores new messages, records the channel cursor (and any unfinished
+        backfill) and trims the channel to SLACK_SYNC_KEEP_PER_CHANNEL.
+        """
+        channel_name = channel.get("name", channel["id"])
+        rows = [
+            (user_key, channel["id"], message["ts"], float(message["ts"]), channel_name, message.get("user", ""), message.get("text", ""))
+            for message in messages
+        ]
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO slack_messages "
+                    "(user_key, channel_id, ts_raw, ts, channel_name, author, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                inserted = cursor.rowcount
+                cursor.execute(
+                    "UPDATE slack_channels SET cursor_ts = ?, backfill_latest = ?, backfill_newest = ? "
+                    "WHERE user_key = ? AND channel_id = ?",
+                    (cursor_ts, backfill_latest, backfill_newest, user_key, channel["id"]),
+                )
+                cursor.execute(
+                    "DELETE FROM slack_messages WHERE user_key = ? AND channel_id = ? AND ts_raw NOT IN ("
+                    "SELECT ts_raw FROM slack_messages WHERE user_key = ? AND channel_id = ? ORDER BY ts DESC LIMIT ?)",
+                    (user_key, channel["id"], user_key, channel["id"], settings.SLACK_SYNC_KEEP_PER_CHANNEL),
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return inserted
+
+    def recent(self, user_key: str, oldest: float, limit: int) -> List[Dict[str, Any]]:
+        """The newest `limit` messages after `oldest`, oldest first; one index range scan."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_name, author, text, ts FROM slack_messages "
+                "WHERE user_key = ? AND ts > ? ORDER BY ts DESC LIMIT ?",
+                (user_key, oldest, limit),
+            ).fetchall()
+        return [{"channel": name, "user": author, "text": text, "ts": ts} for name, author, text, ts in reversed(rows)]
+
+    def forget(self, user_key: str) -> None:
+        with self._lock:
+            for table in ("slack_messages", "slack_channels", "slack_sync_users"):
+                self._conn.execute(f"DELETE FROM {table} WHERE user_key = ?", (user_key,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            users = self._conn.execute("SELECT COUNT(*) FROM slack_sync_users").fetchone()[0]
+            messages = self._conn.execute("SELECT COUNT(*) FROM slack_messages").fetchone()[0]
+        return {"users": users, "messages": messages}
+
+
+def _build_store() -> Optional[SlackMessageStore]:
+    try:
+        return SlackMessageStore(settings.SLACK_SYNC_SQLITE_PATH)
+    except sqlite3.Error as e:
+        log_step(logger, "slack_sync.store_unavailable", path=settings.SLACK_SYNC_SQLITE_PATH, error=str(e))
+        return None
+
+
+message_store = _build_store()
+
+
+async def _sync_channel(
+    user_key: str,
+    token: str,
+    channel: Dict[str, Any],
+    state: Tuple[str, Optional[str], Optional[str]],
+) -> int:
+    # First sync takes one page of recent history; later syncs page through
+    # everything after the cursor (bounded by SLACK_SYNC_MAX_PAGES per sync,
+    # resuming an unfinished walk first).
+    cursor_ts, backfill_latest, backfill_newest = state
+    initial = cursor_ts == "0" and backfill_latest is None
+    page_size = slack_gateway.HISTORY_PAGE_SIZE if initial else settings.SLACK_SYNC_PAGE_SIZE
+    newest = backfill_newest or cursor_ts
+    reached = backfill_latest
+    fresh: List[Dict[str, Any]] = []
+    page_cursor = None
+    for _page in range(1 if initial else settings.SLACK_SYNC_MAX_PAGES):
+        data = await slack_gateway.channel_history(
+            user_key, token, channel["id"], cursor_ts, page_size, page_cursor, latest=backfill_latest
+        )
+        for message in data.get("messages", []):
+            ts = message.get("ts", "0")
+            if float(ts) > float(newest):
+                newest = ts
+            if reached is None or float(ts) < float(reached):
+                reached = ts
+            if slack_gateway.is_user_message(message):
+                fresh.append(message)
+        page_cursor = (data.get("response_metadata") or {}).get("next_cursor")
+        if initial or not data.get("has_more") or not page_cursor:
+            break
+    else:
+        # Out of pages with older messages still waiting: keep the cursor
+        # and resume below the oldest message reached on the next sync.
+        log_step(logger, "slack_sync.backfill_pending", channel=channel["id"], reached=reached)
+        return await asyncio.to_thread(
+            message_store.add_messages, user_key, channel, fresh, cursor_ts, reached, newest
+        )
+
+    if newest == cursor_ts and not fresh:
+        return 0
+    return await asyncio.to_thread(message_store.add_messages, user_key, channel, fresh, newest)
+
+
+async def sync_user(user_key: str, token: str) -> int:
+    """Fetches messages newer than each channel's cursor. Returns how many new messages were stored."""
+    channels = (await slack_gateway.list_channels(user_key, token))[:slack_gateway.HISTORY_CHANNEL_LIMIT]
+    await asyncio.to_thread(message_store.retain_channels, user_key, channels)
+    cursors = await asyncio.to_thread(message_store.cursors, user_key)
+    semaphore = asyncio.Semaphore(settings.SLACK_HISTORY_CONCURRENCY)
+
+    async def bounded(channel: Dict[str, Any]) -> int:
+        async with semaphore:
+            try:
+                return await _sync_channel(user_key, token, channel, cursors.get(channel["id"], ("0", None, None)))
+            except (slack_gateway.SlackAuthError, slack_gateway.SlackRateLimited):
+                raise
+            except slack_gateway.SlackAPIError as exc:
+                log_step(logger, "slack_sync.channel_skipped", channel=channel["id"], error=exc.error)
+                return 0
+
+    counts = await asyncio.gather(*(bounded(channel) for channel in channels))
+    await asyncio.to_thread(message_store.mark_synced, user_key, time.time())
+    return sum(counts)
+
+
+async def sync_due_users() -> int:
+    """One background pass over active users; returns how many were synced."""
+    now = time.time()
+    users = await asyncio.to_thread(
+        message_store.claim_due_users,
+        now,
+        settings.SLACK_SYNC_INTERVAL_SECONDS,
+        settings.SLACK_SYNC_ACTIVE_WINDOW_SECONDS,
+        settings.SLACK_SYNC_BATCH_SIZE,
+    )
+    for user_key in users:
+        try:
+            user = await asyncio.to_thread(cached_user, user_key)
+            token = (user or {}).get("slack_access_token")
+            if not token:
+                await asyncio.to_thread(message_store.forget, user_key)
+                continue
+            stored = await sync_user(user_key, token)
+            if stored:
+                log_step(logger, "slack_sync.user_synced", user=user_key, new_messages=stored)
+        except slack_gateway.SlackAuthError:
+            # The endpoint clears the connection on its next call; stop syncing until then
+            await asyncio.to_thread(message_store.forget, user_key)
+        except slack_gateway.SlackRateLimited as exc:
+            log_step(logger, "slack_sync.rate_limited", user=user_key, retry_after=round(exc.retry_after, 2))
+        except Exception as e:
+            logger.exception("Slack sync error | user=%s | error=%s", user_key, e)
+    return len(users)
+
+
+async def read_messages(user_key: str, token: str, oldest: float, limit: int) -> List[Dict[str, Any]]:
+    """
+    Widget read path. Serves the local store, syncing inline only on a
+    user's first request; background syncs keep it fresh afterwards.
+    Without a store, falls back to fetching through the gateway cache.
+    """
+    if message_store is None:
+        return (await slack_gateway.recent_messages(user_key, token, oldest))[-limit:]
+
+    never_synced = await asyncio.to_thread(message_store.touch, user_key, time.time())
+    if never_synced:
+        await sync_user(user_key, token)
+    return await asyncio.to_thread(message_store.recent, user_key, oldest, limit)
+
+
+def forget_user(user_key: str) -> None:
+    if message_store is not None:
+        message_store.forget(user_key)
+
+
+def sync_stats() -> Dict[str, Any]:
+    if message_store is None:
+        return {"enabled": False}
+    return {"enabled": True, "interval_seconds": settings.SLACK_SYNC_INTERVAL_SECONDS, **message_store.stats()}
+
+
+instrument_class_methods(SlackMessageStore, logger, exclude_names={"recent", "touch"})
+instrument_module_functions(globals(), logger, exclude_names={"instrument_module_functions", "instrument_class_methods"})
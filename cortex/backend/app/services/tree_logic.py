@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-from supabase import Client
+from app.core.database import Client
 from typing import Optional, Dict, Any, List
 from app.core.observability import get_logger, instrument_class_methods
 
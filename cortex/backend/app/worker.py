@@ -1,15 +1,25 @@
 import asyncio
+import threading
+import time
 
-from app.services.jobs import JobManager
-from app.services.analysis import generate_report_payload
-from app.core.queue import QueueService
+from app.services.jobs import JobManager, TERMINAL_STATUSES
+from app.services.analysis import JobCancelled, StageTracker, generate_report_payload
+from app.core.queue import QueueService, queue_backend
+from app.core.rate_limit import rate_limiter
+from app.services.auth_ops import run_auth_cleanup
+from app.services.mail_outbox import deliver_due, smtp_session
+from app.services import slack_sync
 from app.core.config import settings
+from app.core.memory import JobMemory, JobMemoryExceeded
+from app.core.metrics import JOB_SECONDS, sample_process_rss
+from app.core.profiling import StackSampler, finish_job_profile
 from app.core.observability import configure_logging, get_logger, instrument_module_functions, log_step
 from app.schemas.report import JobStatus
 
 # Config
 POLL_INTERVAL_SECONDS = 1
 REAPER_INTERVAL_SECONDS = settings.WORKER_REAPER_INTERVAL_SECONDS
+HEARTBEAT_INTERVAL_SECONDS = settings.JOB_QUEUE_HEARTBEAT_SECONDS
 JOB_TIMEOUT_SECONDS = settings.WORKER_JOB_TIMEOUT_SECONDS
 configure_logging(settings.LOG_LEVEL)
 logger = get_logger(__name__)
@@ -27,6 +37,98 @@ async def reaper_loop():
 
         await asyncio.sleep(REAPER_INTERVAL_SECONDS)
 
+async def rate_limit_sweep_loop():
+    # Idle keys (bucket already refilled) carry no information; drop them so
+    # limiter state tracks active clients, not every address ever seen.
+    log_step(logger, "worker.rate_limit_sweep.started", interval_seconds=settings.RATE_LIMIT_SWEEP_INTERVAL_SECONDS)
+    while True:
+        await asyncio.sleep(settings.RATE_LIMIT_SWEEP_INTERVAL_SECONDS)
+        try:
+            evicted = await asyncio.to_thread(rate_limiter.sweep)
+            if evicted:
+                log_step(logger, "worker.rate_limit_sweep.evicted", count=evicted)
+        except Exception as e:
+            logger.exception("Rate limit sweep error | error=%s", e)
+
+async def auth_cleanup_loop():
+    # Expired invites and stale access requests are purged here rather than
+    # on every auth request; lookups check expiry themselves.
+    log_step(logger, "worker.auth_cleanup.started", interval_seconds=settings.AUTH_CLEANUP_INTERVAL_SECONDS)
+    while True:
+        try:
+            summary = await asyncio.to_thread(run_auth_cleanup)
+            if any(summary.values()):
+                log_step(logger, "worker.auth_cleanup.summary", **summary)
+        except Exception as e:
+            logger.exception("Auth cleanup error | error=%s", e)
+
+        await asyncio.sleep(settings.AUTH_CLEANUP_INTERVAL_SECONDS)
+
+async def mail_outbox_loop():
+    # Drains queued mail back-to-back over one SMTP connection; polls only
+    # when the outbox is empty.
+    log_step(logger, "worker.mail_outbox.started", poll_interval_seconds=settings.MAIL_OUTBOX_POLL_SECONDS)
+    while True:
+        try:
+            claimed = await asyncio.to_thread(deliver_due)
+            if claimed:
+                continue
+            await asyncio.to_thread(smtp_session.close_if_idle)
+        except Exception as e:
+            logger.exception("Mail outbox error | error=%s", e)
+
+        await asyncio.sleep(settings.MAIL_OUTBOX_POLL_SECONDS)
+
+async def slack_sync_loop():
+    if slack_sync.message_store is None:
+        return
+    log_step(logger, "worker.slack_sync.started", interval_seconds=settings.SLACK_SYNC_INTERVAL_SECONDS)
+    while True:
+        try:
+            await slack_sync.sync_due_users()
+        except Exception as e:
+            logger.exception("Slack sync loop error | error=%s", e)
+
+        await asyncio.sleep(settings.SLACK_SYNC_INTERVAL_SECONDS)
+
+def _run_pipeline(job, frame_cache, stages: StageTracker):
+    """
+    Runs in the job's thread; samples that thread when slow-job profiling is on,
+    and process RSS for the job's memory budget.
+    """
+    # The analysis stack is imported lazily; load it before the memory baseline so
+    # the first job isn't charged for ~100 MB of module state
+    import pandas, pyarrow.parquet  # noqa: F401
+
+    sampler = StackSampler.for_current_thread().start() if settings.PROFILE_JOBS_OVER_SECONDS > 0 else None
+    stages.memory.start()
+    try:
+        return generate_report_payload(
+            job.file_paths,
+            job.job_id,
+            frame_cache=frame_cache,
+            file_hints=job.file_hints,
+            stages=stages,
+        )
+    finally:
+        job.memory = stages.memory.stop().snapshot()
+        if sampler is not None:
+            # Kept for failed and cancelled jobs too: those are usually the slow ones
+            job.profile_path = finish_job_profile(sampler, job.job_id)
+
+async def _keep_lease(job_id: str, lease_lost: threading.Event):
+    # Runs beside the pipeline thread: extends the lease and publishes progress
+    # for other processes. A failed heartbeat is retried on the next tick; only
+    # a lease taken back by the reaper stops the job.
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            if not await QueueService.heartbeat(job_id):
+                lease_lost.set()
+                return
+        except Exception as e:
+            logger.exception("Lease heartbeat error | job_id=%s | error=%s", job_id, e)
+
 async def worker_loop():
     log_step(logger, "worker.loop.started", poll_interval_seconds=POLL_INTERVAL_SECONDS)
     while True:
@@ -46,26 +148,65 @@ async def worker_loop():
             if not job:
                 log_step(logger, "worker.job.missing", job_id=job_id)
                 continue
+            if job.status in TERMINAL_STATUSES:
+                # Finished here before a redelivery reached this process; record it on the row
+                await QueueService.ack(job_id)
+                continue
                 
             # 3. Mark Processing
             JobManager.update_job_status(job_id, JobStatus.PROCESSING, progress=0)
             
             # 4. Execute Analysis directly in-process
+            # Batch jobs share parsed frames through their group's cache.
+            group = JobManager.get_group(job.group_id) if job.group_id else None
+            frame_cache = group.frame_cache if group else None
+            job_started = time.perf_counter()
+            outcome = "failed"
+            deadline = job_started + JOB_TIMEOUT_SECONDS
+            lease_lost = threading.Event()
+            stages = StageTracker(
+                job_id,
+                on_progress=lambda progress, stage, duration_ms: JobManager.update_job_status(
+                    job_id, JobStatus.PROCESSING, progress=progress, stage=stage, stage_duration_ms=duration_ms
+                ),
+                # The reaper fails the job while the pipeline runs in its thread; stop at the next stage boundary.
+                # Same once the lease is lost: the job has been handed to another worker.
+                is_cancelled=lambda: job.status == JobStatus.FAILED or time.perf_counter() > deadline or lease_lost.is_set(),
+                memory=JobMemory(job_id),
+            )
+            heartbeat = asyncio.create_task(_keep_lease(job_id, lease_lost))
             try:
                 JobManager.update_job_status(job_id, JobStatus.PROCESSING, progress=10)
-                payload = generate_report_payload(job.file_paths, job_id)
+                # Off the event loop, so status polls (and the reaper) keep running during long jobs
+                payload = await asyncio.to_thread(_run_pipeline, job, frame_cache, stages)
 
-                JobManager.update_job_status(
+                # Serializing + compressing a large payload is CPU work too; keep it off the loop
+                await asyncio.to_thread(
+                    JobManager.update_job_status,
                     job_id,
                     JobStatus.COMPLETED,
                     progress=100,
                     payload=payload
                 )
-                log_step(logger, "worker.job.completed", job_id=job_id)
+                outcome = "completed"
+                log_step(logger, "worker.job.completed", job_id=job_id, memory_peak_mb=job.memory.get("peak_mb"))
                 
-            except asyncio.TimeoutError:
-                log_step(logger, "worker.job.timeout", job_id=job_id, timeout_seconds=JOB_TIMEOUT_SECONDS)
-                JobManager.mark_timed_out(job_id)
+            except (asyncio.TimeoutError, JobCancelled):
+                if lease_lost.is_set():
+                    # Not ours to finish any more; polls here follow the queue row again
+                    outcome = "lease_lost"
+                    log_step(logger, "worker.job.lease_lost", job_id=job_id, stages_done=",".join(stages.durations))
+                    JobManager.update_job_status(job_id, JobStatus.PENDING)
+                else:
+                    outcome = "timeout"
+                    log_step(logger, "worker.job.timeout", job_id=job_id, timeout_seconds=JOB_TIMEOUT_SECONDS, stages_done=",".join(stages.durations))
+                    JobManager.mark_timed_out(job_id)
+            except (JobMemoryExceeded, MemoryError) as e:
+                # The frames are gone with the pipeline's stack; fail just this job, not the server
+                outcome = "memory"
+                error = str(e) if isinstance(e, JobMemoryExceeded) else "Report job ran out of memory. Upload fewer rows or drop unused columns."
+                log_step(logger, "worker.job.memory_exceeded", job_id=job_id, error=error, peak_mb=job.memory.get("peak_mb"), budget_mb=job.memory.get("budget_mb"))
+                JobManager.update_job_status(job_id, JobStatus.FAILED, progress=job.progress, error=error)
             except Exception as e:
                 logger.exception("Worker job failed | job_id=%s | error=%s", job_id, e)
                 JobManager.update_job_status(
@@ -73,19 +214,35 @@ async def worker_loop():
                     JobStatus.FAILED, 
                     error=str(e)
                 )
+            finally:
+                heartbeat.cancel()
+                JobManager.release_group_frames(job_id)
+                JOB_SECONDS.labels(outcome).observe(time.perf_counter() - job_started)
+                sample_process_rss()
             
-            # 6. Ack (Optional in DB-as-Queue since status update effectively acks)
-            await QueueService.ack(job_id)
-            log_step(logger, "worker.job.acked", job_id=job_id)
+            # 6. Ack: ends the lease with the terminal status (and result, for other processes)
+            if outcome == "lease_lost":
+                job.worker_id = None
+                continue
+            acked = await QueueService.ack(job_id)
+            log_step(logger, "worker.job.acked", job_id=job_id, acked=acked)
 
         except Exception as e:
             logger.exception("Worker loop error | error=%s", e)
             await asyncio.sleep(POLL_INTERVAL_SECONDS)
 
+async def run_worker():
+    # A standalone worker next to the API (or another worker): claims jobs from the
+    # shared queue and reaps leases its peers stopped heartbeating
+    if not queue_backend.shared:
+        log_step(logger, "worker.standalone.unshared_queue", backend=queue_backend.name,
+                 hint="set JOB_QUEUE_BACKEND=sqlite or postgres; this worker can't see the API's jobs")
+    await asyncio.gather(worker_loop(), reaper_loop())
+
 if __name__ == "__main__":
     # Ensure event loop
     try:
-        asyncio.run(worker_loop())
+        asyncio.run(run_worker())
     except KeyboardInterrupt:
         log_step(logger, "worker.loop.stopping")
 
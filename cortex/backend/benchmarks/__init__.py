@@ -0,0 +1,4 @@
+"""
+Benchmarks for the analysis pipeline (ingestion -> normalization -> roles ->
+widgets -> payload) on synthetic datasets. See benchmarks/run.py for usage.
+"""
@@ -0,0 +1,182 @@
+"""
+Synthetic datasets shaped like the exports users upload. Column names are the
+aliases normalize_frame maps (COLUMN_DEFINITIONS), so every shape drives a
+different path through the pipeline:
+
+  reviews        timestamped review export, one file -> TEMPORAL_SUPREME
+  split          fact table + two ID-keyed dimension CSVs -> smart_merge joins
+  list_clusters  cluster column holding "['tag', ...]" list-strings
+  titles         near-unique review titles, fragmented clusters, no timestamp
+
+Files are written in chunks so 10M-row tiers don't need the whole frame in
+memory, and cached under the data dir keyed by shape/rows/format/seed.
+"""
+import os
+import shutil
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 500_000
+SPAN_DAYS = 180
+START = np.datetime64("2025-01-01T00:00:00")
+
+CLUSTERS = [
+    "performance", "pricing", "ui", "crashes", "login", "multiplayer",
+    "graphics", "audio", "matchmaking", "updates", "support", "content",
+]
+CLASSES = ["positive", "neutral", "negative"]
+GAMES = [f"Game {chr(65 + i % 26)}{i // 26}" for i in range(40)]
+HEADLINES = [f"{adj} {noun}" for adj in ("Great", "Broken", "Fun", "Slow", "Okay", "Buggy", "Solid", "Laggy")
+             for noun in ("launch", "update", "servers", "story", "controls", "season", "patch", "event")]
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+
+
+def _pick(rng: np.random.Generator, pool: List[str], n: int, p=None) -> np.ndarray:
+    return np.asarray(pool, dtype=object)[rng.choice(len(pool), size=n, p=p)]
+
+
+def _timestamps(rng: np.random.Generator, n: int) -> np.ndarray:
+    return START + rng.integers(0, SPAN_DAYS * 86400, size=n).astype("timedelta64[s]")
+
+
+def _polarity(rng: np.random.Generator, n: int, missing: float = 0.02) -> np.ndarray:
+    values = np.round(rng.uniform(-1, 1, size=n), 4)
+    values[rng.random(n) < missing] = np.nan
+    return values
+
+
+def _review_text(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Wide free-text column the loaders should skip (not a role column)
+    bodies = [" ".join(WORDS[j % len(WORDS)] for j in range(i, i + 12)) for i in range(64)]
+    return _pick(rng, bodies, n)
+
+
+def _ids(start: int, n: int) -> np.ndarray:
+    return np.arange(start, start + n, dtype=np.int64)
+
+
+def reviews_chunk(rng: np.random.Generator, start: int, n: int) -> Dict[str, pd.DataFrame]:
+    return {"reviews": pd.DataFrame({
+        "id": _ids(start, n),
+        "timestamp": _timestamps(rng, n),
+        "game_title": _pick(rng, GAMES, n),
+        "title": _pick(rng, HEADLINES, n),
+        "category": _pick(rng, CLUSTERS, n),
+        "sentiment_class": _pick(rng, CLASSES, n, p=[0.5, 0.2, 0.3]),
+        "polarity": _polarity(rng, n),
+        "confidence": np.round(rng.uniform(0.5, 1, size=n), 3),
+        "review_text": _review_text(rng, n),
+    })}
+
+
+def split_chunk(rng: np.random.Generator, start: int, n: int) -> Dict[str, pd.DataFrame]:
+    ids = _ids(start, n)
+    # Dimension tables cover a subset of the facts and are unique on id
+    clustered = np.sort(rng.choice(ids, size=max(1, int(n * 0.6)), replace=False))
+    classified = np.sort(rng.choice(ids, size=max(1, int(n * 0.4)), replace=False))
+    return {
+        "features": pd.DataFrame({
+            "ID": ids,
+            "created_at": _timestamps(rng, n),
+            "rating": rng.integers(1, 6, size=n),
+            "product_name": _pick(rng, GAMES, n),
+            "headline": _pick(rng, HEADLINES, n),
+        }),
+        "clusters": pd.DataFrame({
+            "id": clustered,
+            "category_cluster": _pick(rng, CLUSTERS, len(clustered)),
+        }),
+        "classes": pd.DataFrame({
+            "id": classified,
+            "sentiment_class": _pick(rng, CLASSES, len(classified)),
+        }),
+    }
+
+
+def _list_tags(rng: np.random.Generator) -> List[str]:
+    tags = []
+    for _ in range(200):
+        picked = rng.choice(CLUSTERS, size=int(rng.integers(1, 4)), replace=False)
+        tags.append(str([str(tag) for tag in picked]))
+    return tags + ["[]", ""]
+
+
+def list_clusters_chunk(rng: np.random.Generator, start: int, n: int) -> Dict[str, pd.DataFrame]:
+    return {"reviews": pd.DataFrame({
+        "id": _ids(start, n),
+        "date": _timestamps(rng, n).astype("datetime64[D]"),
+        "topic": _pick(rng, _list_tags(rng), n),
+        "sentiment_class": _pick(rng, CLASSES, n),
+        "sentiment": _polarity(rng, n, missing=0.1),
+        "app": _pick(rng, GAMES[:12], n),
+    })}
+
+
+def titles_chunk(rng: np.random.Generator, start: int, n: int) -> Dict[str, pd.DataFrame]:
+    ids = _ids(start, n)
+    words = _pick(rng, WORDS, n)
+    return {"reviews": pd.DataFrame({
+        "id": ids,
+        "title": [f"{word} review {i}" for word, i in zip(words, ids)],
+        "cluster": _pick(rng, [f"topic_{i}" for i in range(60)], n),
+        "score": _polarity(rng, n),
+        "sentiment_class": _pick(rng, CLASSES + ["mixed"], n),
+    })}
+
+
+SHAPES: Dict[str, Callable[[np.random.Generator, int, int], Dict[str, pd.DataFrame]]] = {
+    "reviews": reviews_chunk,
+    "split": split_chunk,
+    "list_clusters": list_clusters_chunk,
+    "titles": titles_chunk,
+}
+FORMATS = ("csv", "parquet")
+
+
+def _chunks(shape: str, rows: int, seed: int) -> Iterator[Dict[str, pd.DataFrame]]:
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, CHUNK_ROWS):
+        yield SHAPES[shape](rng, start, min(CHUNK_ROWS, rows - start))
+
+
+def _write(shape: str, rows: int, fmt: str, seed: int, dest: str) -> None:
+    writers = {}
+    try:
+        for frames in _chunks(shape, rows, seed):
+            for name, frame in frames.items():
+                path = os.path.join(dest, f"{name}.{fmt}")
+                if fmt == "csv":
+                    frame.to_csv(path, mode="a", header=name not in writers, index=False)
+                    writers[name] = None
+                else:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    table = pa.Table.from_pandas(frame, preserve_index=False)
+                    if name not in writers:
+                        writers[name] = pq.ParquetWriter(path, table.schema)
+                    writers[name].write_table(table)
+    finally:
+        for writer in writers.values():
+            if writer is not None:
+                writer.close()
+
+
+def materialize(shape: str, rows: int, data_dir: str, fmt: str = "csv", seed: int = 42) -> List[str]:
+    """Paths of the dataset's files, generating them on first use. The largest (fact) file comes first."""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape!r}; expected one of {sorted(SHAPES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+
+    dest = os.path.join(data_dir, f"{shape}-{rows}-{fmt}-s{seed}")
+    marker = os.path.join(dest, ".complete")
+    if not os.path.exists(marker):
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+        _write(shape, rows, fmt, seed, dest)
+        open(marker, "w").close()
+
+    paths = [os.path.join(dest, name) for name in os.listdir(dest) if not name.startswith(".")]
+    return sorted(paths, key=os.path.getsize, reverse=True)
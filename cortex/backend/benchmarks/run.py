@@ -0,0 +1,369 @@
+"""
+Times the analysis pipeline stage by stage on synthetic datasets and checks
+the numbers against a JSON baseline.
+
+    cd cortex/backend
+    python -m benchmarks.run                          # 10k + 100k, all shapes
+    python -m benchmarks.run --sizes all --format parquet
+    python -m benchmarks.run --shapes split --sizes 1m --repeat 3
+    python -m benchmarks.run --save-baseline          # record/refresh the baseline
+
+Each (shape, size) runs in two fresh interpreters: one walks the stages
+(load_dataset, smart_merge, normalize_frame, detect_roles, every widget
+builder) feeding each stage the previous one's output, the other runs
+generate_report_payload end to end. Per case we record wall time, the peak
+RSS reached during the case and that peak minus the RSS at its start; on
+Linux the peak is reset before each case (/proc/self/clear_refs), elsewhere
+it is the process high-water mark so far.
+
+A case regresses when a metric exceeds the baseline by more than the
+threshold *and* by more than an absolute floor (timer/allocator noise on
+small tiers). The exit status is 1 when anything regressed.
+
+benchmarks/baseline.json is committed: the default run (csv, 10k + 100k,
+--repeat 3) on the machine named in its "machine" field. Memory figures
+carry over between hosts; wall times only compare on similar hardware, so
+re-record with --save-baseline on your reference machine (and whenever
+pandas/numpy move) before trusting time regressions.
+
+The 100 MB upload guardrail in ingestion is lifted inside the workers; the
+benchmark measures parsing cost, not the size check. Datasets are generated
+once per shape/size/format/seed under --data-dir and reused.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BACKEND_ROOT, "benchmarks", "data")
+DEFAULT_BASELINE = os.path.join(BACKEND_ROOT, "benchmarks", "baseline.json")
+
+SIZE_TIERS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_SIZES = "10k,100k"
+
+# metric -> (default relative threshold, absolute floor below which changes are noise)
+METRIC_FLOORS = {"wall_s": 0.005, "peak_rss_mb": 16.0, "rss_delta_mb": 16.0}
+
+
+# --- Memory probes ---
+
+def _read_status_kb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb() -> float:
+    kb = _read_status_kb("VmRSS")
+    return kb / 1024 if kb is not None else peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    kb = _read_status_kb("VmHWM")
+    if kb is not None:
+        return kb / 1024
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def reset_peak_rss() -> bool:
+    """Resets VmHWM to the current RSS (Linux >= 4.0). False if the peak can't be reset."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# --- Worker side (runs in a fresh interpreter) ---
+
+class CaseTimer:
+    def __init__(self, repeat: int):
+        self.repeat = max(1, repeat)
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.peak_resettable = True
+
+    def measure(self, case: str, fn: Callable[..., Any], setup: Optional[Callable[[], Tuple]] = None) -> Any:
+        """Runs fn(*setup()) `repeat` times; keeps the fastest wall time and the largest memory figures."""
+        result = None
+        best: Dict[str, float] = {}
+        for _ in range(self.repeat):
+            args = setup() if setup else ()
+            result = None
+            gc.collect()
+            start_rss = current_rss_mb()
+            self.peak_resettable = reset_peak_rss() and self.peak_resettable
+            started = time.perf_counter()
+            result = fn(*args)
+            wall = time.perf_counter() - started
+            peak = peak_rss_mb()
+            del args
+            best["wall_s"] = min(best.get("wall_s", wall), wall)
+            best["peak_rss_mb"] = max(best.get("peak_rss_mb", peak), peak)
+            best["rss_delta_mb"] = max(best.get("rss_delta_mb", 0.0), peak - start_rss)
+        self.results[case] = {name: round(value, 6 if name == "wall_s" else 1) for name, value in best.items()}
+        return result
+
+    def skip(self, case: str, reason: str) -> None:
+        self.results[case] = {"skipped": reason}
+
+
+def _prepare_worker() -> None:
+    import logging
+    import warnings
+    # Instrumentation still runs; only the handlers' I/O is kept out of the timings
+    logging.disable(logging.CRITICAL)
+    warnings.simplefilter("ignore")
+    from app.services import ingestion
+    ingestion.MAX_FILE_SIZE_BYTES = float("inf")
+
+
+def _widget_cases(df, roles) -> List[Tuple[str, Callable[[], Any], Optional[str]]]:
+    """(case, call, skip reason) for every builder; skipped when the pipeline would never call it on this frame."""
+    from app.services import analysis as a
+
+    def has(*cols: str) -> bool:
+        return all(col in df.columns for col in cols)
+
+    atom_df = df if has("Title") or not has("ReviewTitle") else df.rename(columns={"ReviewTitle": "Title"})
+    return [
+        ("widget.temporal_anchor", lambda: a._build_temporal_anchor(df, roles),
+         None if roles["Time"]["valid"] else "time role invalid"),
+        ("widget.cluster_anchor", lambda: a._build_cluster_anchor(df, roles), None if has("Cluster") else "no Cluster"),
+        ("widget.cluster_fallback", lambda: a._build_cluster_fallback(df), None if has("Cluster") else "no Cluster"),
+        ("widget.classification_anchor", lambda: a._build_classification_anchor(df),
+         None if has("Classification") else "no Classification"),
+        ("widget.atom_anchor", lambda: a._build_atom_anchor(atom_df), None if "Title" in atom_df.columns else "no Title"),
+        ("widget.histogram_anchor", lambda: a._build_histogram_anchor(df),
+         None if has("Sentiment") or has("Confidence") else "no metric"),
+        ("widget.kpi_card", lambda: a._build_kpi_card(df), None),
+        ("widget.sentiment_donut", lambda: a._build_sentiment_donut(df), None),
+        ("widget.title_treemap", lambda: a._build_title_treemap(df), None),
+    ]
+
+
+def run_stages(paths: List[str], repeat: int) -> Dict[str, Any]:
+    _prepare_worker()
+    from app.services.analysis import detect_roles, is_role_column, normalize_frame, smart_merge
+    from app.services.ingestion import load_dataset
+
+    timer = CaseTimer(repeat)
+    frames = timer.measure("load_dataset", lambda: [load_dataset(path, columns=is_role_column) for path in paths])
+
+    if len(frames) > 1:
+        # smart_merge renames ID columns in place; each run gets fresh copies
+        raw = timer.measure("smart_merge", smart_merge, setup=lambda: ([frame.copy() for frame in frames],))
+    else:
+        timer.skip("smart_merge", "single file")
+        raw = frames[0]
+    del frames
+
+    df, _meta = timer.measure("normalize_frame", lambda: normalize_frame(raw))
+    del raw
+    # Same fallback generate_report_payload applies after normalization
+    if "Classification" not in df.columns and "sentiment_class" in df.columns:
+        df = df.rename(columns={"sentiment_class": "Classification"})
+        if str(df["Classification"].dtype) == "category":
+            df["Classification"] = df["Classification"].cat.add_categories("(Unclassified)")
+        df["Classification"] = df["Classification"].fillna("(Unclassified)")
+
+    roles = timer.measure("detect_roles", lambda: detect_roles(df))
+    for case, call, skip_reason in _widget_cases(df, roles):
+        if skip_reason:
+            timer.skip(case, skip_reason)
+        else:
+            timer.measure(case, call)
+
+    return {"rows": len(df), "peak_resettable": timer.peak_resettable, "cases": timer.results}
+
+
+def run_end_to_end(paths: List[str], repeat: int) -> Dict[str, Any]:
+    _prepare_worker()
+    from app.services.analysis import generate_report_payload
+
+    timer = CaseTimer(repeat)
+    payload = timer.measure("generate_report_payload", lambda: generate_report_payload(paths))
+    return {"layout_strategy": payload.layout_strategy, "peak_resettable": timer.peak_resettable, "cases": timer.results}
+
+
+# --- Driver side ---
+
+def parse_sizes(value: str) -> List[str]:
+    if value.strip().lower() == "all":
+        return list(SIZE_TIERS)
+    labels = []
+    for part in value.split(","):
+        label = part.strip().lower()
+        if label not in SIZE_TIERS:
+            raise argparse.ArgumentTypeError(f"unknown size {part!r}; expected {', '.join(SIZE_TIERS)} or 'all'")
+        labels.append(label)
+    return labels
+
+
+def _spawn(mode: str, paths: List[str], repeat: int) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    cmd = [sys.executable, "-m", "benchmarks.run", "--worker", mode, "--repeat", str(repeat), "--paths", *paths]
+    proc = subprocess.run(cmd, cwd=BACKEND_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or [f"exit {proc.returncode}"]
+        return {"error": tail[0]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def machine_info() -> Dict[str, Any]:
+    import numpy
+    import pandas
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    time_threshold: float,
+    memory_threshold: float,
+) -> Tuple[List[str], Dict[str, str]]:
+    """(regression lines, case -> short change note) for cases measured in both runs."""
+    regressions: List[str] = []
+    notes: Dict[str, str] = {}
+    for case, current in results.items():
+        previous = baseline.get(case)
+        if not previous or "wall_s" not in current or "wall_s" not in previous:
+            continue
+        changes = []
+        for metric, floor in METRIC_FLOORS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            threshold = time_threshold if metric == "wall_s" else memory_threshold
+            if new - old > floor and new > old * (1 + threshold):
+                regressions.append(f"{case}: {metric} {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+                changes.append(f"{metric} REGRESSED")
+        wall_change = (current["wall_s"] / previous["wall_s"] - 1) * 100 if previous["wall_s"] else 0.0
+        notes[case] = f"{wall_change:+.0f}% time" + (f"; {', '.join(changes)}" if changes else "")
+    return regressions, notes
+
+
+def print_table(results: Dict[str, Dict[str, Any]], notes: Dict[str, str]) -> None:
+    width = max((len(case) for case in results), default=10) + 2
+    print(f"{'case':<{width}}{'wall s':>12}{'peak MB':>10}{'delta MB':>10}  vs baseline")
+    for case, row in results.items():
+        if "wall_s" not in row:
+            print(f"{case:<{width}}{'-':>12}{'-':>10}{'-':>10}  {row.get('skipped') or row.get('error')}")
+            continue
+        print(f"{case:<{width}}{row['wall_s']:>12.4f}{row['peak_rss_mb']:>10.1f}{row['rss_delta_mb']:>10.1f}  {notes.get(case, 'new')}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from benchmarks.datasets import FORMATS, SHAPES, materialize
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Analysis pipeline benchmarks")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes(DEFAULT_SIZES), help="comma list of 10k,100k,1m,10m or 'all'")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help=f"comma list of {','.join(SHAPES)}")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's numbers into the baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--time-threshold", type=float, default=0.20, help="relative wall-time increase that counts as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=0.20, help="relative RSS increase that counts as a regression")
+    parser.add_argument("--worker", choices=("stages", "e2e"), help=argparse.SUPPRESS)
+    parser.add_argument("--paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run = run_stages if args.worker == "stages" else run_end_to_end
+        print(json.dumps(run(args.paths, args.repeat)))
+        return 0
+
+    shapes = [shape.strip() for shape in args.shapes.split(",") if shape.strip()]
+    unknown = [shape for shape in shapes if shape not in SHAPES]
+    if unknown:
+        parser.error(f"unknown shapes {unknown}; expected {', '.join(SHAPES)}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    peak_resettable = True
+    for shape in shapes:
+        for size in args.sizes:
+            started = time.perf_counter()
+            paths = materialize(shape, SIZE_TIERS[size], args.data_dir, args.format, args.seed)
+            print(f"[{shape}/{size}] dataset ready in {time.perf_counter() - started:.1f}s: {', '.join(os.path.basename(p) for p in paths)}", flush=True)
+            for mode in ("stages", "e2e"):
+                outcome = _spawn(mode, paths, args.repeat)
+                if "error" in outcome:
+                    print(f"[{shape}/{size}] {mode} failed: {outcome['error']}", flush=True)
+                    results[f"{shape}/{size}/{mode}"] = {"error": outcome["error"]}
+                    continue
+                peak_resettable = peak_resettable and outcome["peak_resettable"]
+                for case, row in outcome["cases"].items():
+                    results[f"{shape}/{size}/{case}"] = row
+
+    baseline_doc: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline_doc = json.load(f)
+    if baseline_doc and baseline_doc.get("format") != args.format:
+        print(f"note: baseline was recorded with --format {baseline_doc.get('format')}, this run used {args.format}")
+    if baseline_doc and baseline_doc.get("machine") != machine_info():
+        print(f"note: baseline was recorded on {baseline_doc.get('machine')}; wall times may not compare")
+    regressions, notes = compare(results, baseline_doc.get("results", {}), args.time_threshold, args.memory_threshold)
+
+    print()
+    print_table(results, notes)
+    if not peak_resettable:
+        print("\nnote: peak RSS could not be reset per case; peaks are process high-water marks")
+
+    run_doc = {
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "format": args.format,
+        "seed": args.seed,
+        "machine": machine_info(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run_doc, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        # Merge so refreshing one shape/tier keeps the rest of the baseline
+        merged = dict(baseline_doc.get("results", {}))
+        merged.update({case: row for case, row in results.items() if "wall_s" in row})
+        with open(args.baseline, "w") as f:
+            json.dump({**run_doc, "results": merged}, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if baseline_doc:
+        print(f"\nno regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Load tests for the API: upload/report jobs, issue graph reads and writes,
+login bursts. See loadtest/run.py for usage.
+"""
@@ -0,0 +1,297 @@
+"""
+In-process PostgREST stand-in for load tests.
+
+The real supabase-py clients stay in place; only their PostgREST HTTP session
+is pointed at an httpx transport that answers from in-memory tables. Every
+query therefore goes through the same builder/serialization code as in
+production and costs exactly one round trip, which is what gets counted.
+
+Supported: select (column lists, order, limit/offset, count=exact), insert,
+upsert (on_conflict), update, delete, rpc, and the filters the app uses
+(eq/neq/gt/gte/lt/lte/like/ilike/is/in/cs/cd, not.*, or=(...)).
+"""
+import contextvars
+import fnmatch
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Per-request trip log, set by the harness around each API request. Threads
+# started via asyncio.to_thread / Starlette's threadpool inherit it.
+current_trips: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("loadtest_db_trips", default=None)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Splits on `sep` outside quotes and parentheses."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _coerce(stored: Any, criteria: str) -> Tuple[Any, Any]:
+    """Brings a query-string criteria value to the stored value's type for comparison."""
+    if isinstance(stored, bool):
+        return stored, criteria.lower() == "true"
+    if isinstance(stored, (int, float)):
+        try:
+            return stored, float(criteria)
+        except ValueError:
+            return str(stored), criteria
+    return ("" if stored is None else str(stored)), criteria
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, criteria = expression.partition(".")
+    value = row.get(column)
+
+    if op == "is":
+        lowered = criteria.lower()
+        result = value is None if lowered == "null" else value is (lowered == "true")
+    elif op == "in":
+        options = [_unquote(option) for option in _split_top_level(criteria.strip("()"))]
+        result = value is not None and any(_coerce(value, option)[0] == _coerce(value, option)[1] for option in options)
+    elif op in ("cs", "cd"):
+        wanted = {_unquote(item) for item in _split_top_level(criteria.strip("{}"))}
+        present = {str(item) for item in (value or [])}
+        result = wanted <= present if op == "cs" else present <= wanted
+    elif op in ("like", "ilike"):
+        pattern = criteria.replace("*", "%").replace("%", "*")
+        subject = "" if value is None else str(value)
+        result = fnmatch.fnmatchcase(subject.lower(), pattern.lower()) if op == "ilike" else fnmatch.fnmatchcase(subject, pattern)
+    elif value is None:
+        result = False
+    else:
+        left, right = _coerce(value, _unquote(criteria))
+        try:
+            result = {
+                "eq": left == right,
+                "neq": left != right,
+                "gt": left > right,
+                "gte": left >= right,
+                "lt": left < right,
+                "lte": left <= right,
+            }[op]
+        except KeyError:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return not result if negate else result
+
+
+def _matches_or(row: Dict[str, Any], group: str) -> bool:
+    for condition in _split_top_level(group.strip("()")):
+        column, _, expression = condition.partition(".")
+        if _matches(row, column, expression):
+            return True
+    return False
+
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class FakePostgREST:
+    def __init__(self, latency_ms: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.rpcs: Dict[str, Callable[["FakePostgREST", Dict[str, Any]], Any]] = {}
+        self.latency_seconds = latency_ms / 1000.0
+        self.round_trips = 0
+        self.background_trips = 0
+        self._lock = threading.Lock()
+
+    # --- Setup ---
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.tables.setdefault(table, []).extend(dict(row) for row in rows)
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def register_rpc(self, name: str, handler: Callable[["FakePostgREST", Dict[str, Any]], Any]) -> None:
+        self.rpcs[name] = handler
+
+    def install(self, *clients: Any) -> None:
+        """Points each supabase client's PostgREST session at this fake."""
+        transport = httpx.MockTransport(self.handle)
+        for client in clients:
+            postgrest = client.postgrest
+            old = postgrest.session
+            # Keep event hooks so app-side query accounting still sees every call
+            postgrest.session = httpx.Client(base_url=old.base_url, headers=old.headers, event_hooks=old.event_hooks, transport=transport)
+
+    # --- Transport ---
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        segments = [segment for segment in request.url.path.split("/") if segment]
+        is_rpc = len(segments) >= 2 and segments[-2] == "rpc"
+        target = segments[-1] if segments else ""
+        trips = current_trips.get()
+        with self._lock:
+            self.round_trips += 1
+            if trips is None:
+                self.background_trips += 1
+        if trips is not None:
+            trips.append(f"{'RPC' if is_rpc else request.method} {target}")
+        if self.latency_seconds:
+            # Network + query time; blocks the calling thread like the real sync client
+            time.sleep(self.latency_seconds)
+
+        try:
+            body = json.loads(request.content) if request.content else None
+            if is_rpc:
+                status, payload, headers = self._rpc(target, body or {})
+            else:
+                status, payload, headers = self._table(request, target, body)
+        except Exception as exc:
+            return httpx.Response(400, json={"code": "FAKE400", "message": str(exc), "details": None, "hint": None})
+        return httpx.Response(status, json=payload, headers=headers)
+
+    def _rpc(self, name: str, params: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        handler = self.rpcs.get(name)
+        if handler is None:
+            return 404, {"code": "PGRST202", "message": f"Could not find the function public.{name}", "details": None, "hint": None}, {}
+        with self._lock:
+            return 200, handler(self, params), {}
+
+    def _table(self, request: httpx.Request, table: str, body: Any) -> Tuple[int, Any, Dict[str, str]]:
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+        returning = "return=representation" in prefer
+        filters = [(key, value) for key, value in params.multi_items() if key not in RESERVED_PARAMS]
+
+        with self._lock:
+            rows = self.rows(table)
+            matched = [row for row in rows if self._row_matches(row, filters)]
+
+            if request.method in ("GET", "HEAD"):
+                result = self._order(matched, params.get("order"))
+                total = len(result)
+                offset = int(params.get("offset") or 0)
+                limit = params.get("limit")
+                result = result[offset: offset + int(limit)] if limit is not None else result[offset:]
+                headers = {}
+                if "count=" in prefer:
+                    end = offset + len(result) - 1
+                    headers["Content-Range"] = f"{offset}-{end}/{total}" if result else f"*/{total}"
+                return 200, self._project(result, params.get("select")), headers
+
+            if request.method == "POST":
+                records = body if isinstance(body, list) else [body]
+                conflict = params.get("on_conflict") if "resolution=merge-duplicates" in prefer else None
+                written = [self._insert(rows, record, conflict) for record in records]
+                return 201, (self._project(written, params.get("select")) if returning else []), {}
+
+            if request.method == "PATCH":
+                for row in matched:
+                    row.update(body or {})
+                    if "updated_at" in row:
+                        row["updated_at"] = _now_iso()
+                return 200, (self._project(matched, params.get("select")) if returning else []), {}
+
+            if request.method == "DELETE":
+                doomed = {id(row) for row in matched}
+                rows[:] = [row for row in rows if id(row) not in doomed]
+                return 200, (self._project(matched, params.get("select")) if returning else []), {}
+
+        return 405, {"code": "FAKE405", "message": f"Method {request.method} not supported"}, {}
+
+    # --- Query helpers (caller holds the lock) ---
+
+    @staticmethod
+    def _row_matches(row: Dict[str, Any], filters: List[Tuple[str, str]]) -> bool:
+        for key, expression in filters:
+            if key == "or":
+                if not _matches_or(row, expression):
+                    return False
+            elif not _matches(row, key, expression):
+                return False
+        return True
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+        result = list(rows)
+        if not order:
+            return result
+        # Stable sorts applied last key first give multi-column ordering
+        for term in reversed(_split_top_level(order)):
+            column, *modifiers = term.split(".")
+            descending = "desc" in modifiers
+            nulls_first = "nullsfirst" in modifiers or ("nullslast" not in modifiers and descending)
+            present = [row for row in result if row.get(column) is not None]
+            missing = [row for row in result if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=descending)
+            result = missing + present if nulls_first else present + missing
+        return result
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+        if not select or select.strip() == "*":
+            return [dict(row) for row in rows]
+        # Embedded resources ("dept(name)") aren't modelled; they come back absent
+        columns = [column for column in _split_top_level(select) if "(" not in column]
+        if "*" in columns:
+            return [dict(row) for row in rows]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    @staticmethod
+    def _insert(rows: List[Dict[str, Any]], record: Dict[str, Any], conflict: Optional[str]) -> Dict[str, Any]:
+        if conflict:
+            keys = [key.strip() for key in conflict.split(",")]
+            for row in rows:
+                if all(row.get(key) == record.get(key) for key in keys):
+                    row.update(record)
+                    return row
+        row = {"id": str(uuid.uuid4()), "created_at": _now_iso(), **record}
+        rows.append(row)
+        return row
+
+
+# --- RPCs from sql/ the background loops call ---
+
+def _auth_cleanup_batch(fake: FakePostgREST, params: Dict[str, Any]) -> Dict[str, int]:
+    from app.services.auth_ops import CLEANUP_SUMMARY_KEYS
+    # Seeded data never ages past retention within a run
+    return {key: 0 for key in CLEANUP_SUMMARY_KEYS}
+
+
+def _claim_mail_outbox(fake: FakePostgREST, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    now = params.get("p_now") or _now_iso()
+    claimed = []
+    for row in fake.rows("mail_outbox"):
+        if len(claimed) >= int(params.get("p_limit") or 50):
+            break
+        if row.get("status") == "queued" and (row.get("next_attempt_at") or "") <= now:
+            row.update({"status": "sending", "claimed_at": now, "attempts": int(row.get("attempts") or 0) + 1})
+            claimed.append(dict(row))
+    return claimed
+
+
+def install_default_rpcs(fake: FakePostgREST) -> None:
+    fake.register_rpc("auth_cleanup_batch", _auth_cleanup_batch)
+    fake.register_rpc("claim_mail_outbox", _claim_mail_outbox)
@@ -0,0 +1,143 @@
+"""
+Server side of the load test: runs the real app under uvicorn in a
+background thread, counts PostgREST round trips per API request and samples
+event-loop lag on the server's loop.
+"""
+import asyncio
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+
+from loadtest.fake_postgrest import current_trips
+
+STEP_HEADER = "x-loadtest-step"
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TripRecorder:
+    """Round trips per request, grouped by the step name the client sent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, List[int]] = {}
+        # step -> highest number of identical (method, table) calls seen in one request
+        self.repeats: Dict[str, Tuple[int, str]] = {}
+
+    def record(self, step: str, trips: List[str]) -> None:
+        worst = Counter(trips).most_common(1)
+        with self._lock:
+            self.counts.setdefault(step, []).append(len(trips))
+            if worst and worst[0][1] > self.repeats.get(step, (0, ""))[0]:
+                self.repeats[step] = (worst[0][1], worst[0][0])
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.repeats.clear()
+
+    def summary(self, step: str) -> Dict[str, Any]:
+        with self._lock:
+            counts = self.counts.get(step, [])
+            repeat = self.repeats.get(step)
+        if not counts:
+            return {"db_trips_mean": None, "db_trips_max": None, "most_repeated_query": None}
+        return {
+            "db_trips_mean": round(sum(counts) / len(counts), 2),
+            "db_trips_max": max(counts),
+            "most_repeated_query": f"{repeat[1]} x{repeat[0]}" if repeat and repeat[0] > 1 else None,
+        }
+
+
+class TripAccounting:
+    """Outermost ASGI wrapper: gives each HTTP request its own trip log."""
+
+    def __init__(self, app: Any, recorder: TripRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trips: List[str] = []
+        token = current_trips.set(trips)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_trips.reset(token)
+            step = Headers(scope=scope).get(STEP_HEADER) or f"{scope['method']} {scope['path']}"
+            self.recorder.record(step, trips)
+
+
+class LoopLagProbe:
+    """Sleeps `interval` in a loop on the server's event loop; any overshoot is time the loop was blocked."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            finished = time.perf_counter()
+            self.samples.append((finished, max(0.0, finished - started - self.interval)))
+
+    def window(self, start: float, end: float) -> Dict[str, Any]:
+        lags = sorted(lag for at, lag in self.samples if start <= at <= end)
+        if not lags:
+            return {"samples": 0}
+        return {
+            "samples": len(lags),
+            "p50_ms": round(percentile(lags, 50) * 1000, 2),
+            "p99_ms": round(percentile(lags, 99) * 1000, 2),
+            "max_ms": round(lags[-1] * 1000, 2),
+            # Time the loop spent stalled in stretches long enough to be felt by other requests
+            "blocked_over_20ms_total_ms": round(sum(lag for lag in lags if lag > 0.02) * 1000, 1),
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread(threading.Thread):
+    def __init__(self, app: Any, port: int, probe: LoopLagProbe):
+        super().__init__(name="loadtest-server", daemon=True)
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.probe = probe
+
+    def run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        probe_task = asyncio.create_task(self.probe.run())
+        try:
+            await self.server.serve()
+        finally:
+            probe_task.cancel()
+
+    def wait_started(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.is_alive():
+                raise RuntimeError("Load test server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.join(timeout=10)
@@ -0,0 +1,185 @@
+"""
+Client side of the load test: virtual users replaying the main API flows.
+
+Each scenario is a coroutine run by every virtual user in a loop until the
+deadline. Requests carry the step name in X-Loadtest-Step so the server-side
+round-trip counts line up with the client-side latencies.
+"""
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from loadtest.harness import STEP_HEADER, percentile
+from loadtest.seed import PASSWORD, SeededUser
+
+_forwarded_ips = itertools.count(1)
+
+
+class StepMetrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+
+    def record(self, step: str, seconds: float, status: int) -> None:
+        self.latencies.setdefault(step, []).append(seconds)
+        self.statuses.setdefault(step, Counter())[status] += 1
+
+    def summary(self, step: str, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies.get(step, []))
+        statuses = self.statuses.get(step, Counter())
+        ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1] if latencies else None),
+            "errors": sum(count for status, count in statuses.items() if status >= 400 or status == 0),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        }
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, metrics: StepMetrics, user: SeededUser, token: Optional[str] = None):
+        self.client = client
+        self.metrics = metrics
+        self.user = user
+        self.token = token
+
+    async def call(self, step: str, method: str, url: str, **kwargs: Any) -> Optional[httpx.Response]:
+        headers = {STEP_HEADER: step, **kwargs.pop("headers", {})}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            # Status 0 = transport failure (timeout, reset)
+            self.metrics.record(step, time.perf_counter() - started, 0)
+            return None
+        self.metrics.record(step, time.perf_counter() - started, response.status_code)
+        return response
+
+
+# --- Scenarios: one iteration each ---
+
+async def upload_job_poll(vu: VirtualUser, ctx: Dict[str, Any]) -> None:
+    """Upload a CSV, start a report job, poll status until it finishes, fetch the payload."""
+    body: bytes = ctx["upload_body"]
+    flow_started = time.perf_counter()
+    meta = await vu.call("POST /ingest/meta", "POST", "/ingest/meta", json={
+        "filename": "loadtest.csv", "file_type": "text/csv", "file_size": len(body),
+    })
+    if meta is None or meta.status_code != 201:
+        return
+    file_id = meta.json()["id"]
+    blob = await vu.call("PUT /ingest/blob/{file_id}", "PUT", f"/ingest/blob/{file_id}", content=body,
+                         headers={"Content-Type": "application/octet-stream"})
+    if blob is None or blob.status_code != 200:
+        return
+    job = await vu.call("POST /reports/jobs", "POST", "/reports/jobs", json={"file_ids": [file_id], "project_id": "loadtest"})
+    if job is None or job.status_code not in (200, 201):
+        # Active-job limit or full queue: back off like the frontend does
+        await asyncio.sleep(1)
+        return
+    job_id = job.json()["job_id"]
+
+    deadline = time.perf_counter() + ctx["job_timeout"]
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(ctx["poll_interval"])
+        status = await vu.call("GET /reports/jobs/{job_id}?include_payload=false", "GET", f"/reports/jobs/{job_id}",
+                               params={"include_payload": "false"})
+        if status is None or status.status_code != 200:
+            return
+        state = status.json()["status"]
+        if state in ("completed", "failed"):
+            break
+    else:
+        vu.metrics.record("flow: upload -> report", time.perf_counter() - flow_started, 0)
+        return
+
+    await vu.call("GET /reports/jobs/{job_id}", "GET", f"/reports/jobs/{job_id}", headers={"Accept-Encoding": "gzip, br"})
+    vu.metrics.record("flow: upload -> report", time.perf_counter() - flow_started, 200 if state == "completed" else 500)
+
+
+async def issue_graph_reads(vu: VirtualUser, ctx: Dict[str, Any]) -> None:
+    """The Issue Tracker page: list open issues, open one, load its graph."""
+    await vu.call("GET /service/issues", "GET", "/service/issues", params={"status": "open"})
+    issue_id = random.choice(ctx["graph_roots"])
+    await vu.call("GET /service/issues/{id}", "GET", f"/service/issues/{issue_id}")
+    await vu.call("GET /service/issues/{id}/graph", "GET", f"/service/issues/{issue_id}/graph")
+
+
+async def tag_merge_writes(vu: VirtualUser, ctx: Dict[str, Any]) -> None:
+    """Senior review cycle on the user's scratch root: add node, gate it blue, add a side branch, tag, merge."""
+    root_id = ctx["scratch_roots"][vu.user.emp_id]
+    today = date.today().isoformat()
+
+    def child(parent: str, connection: str) -> Dict[str, Any]:
+        return {
+            "parent_issue_id": parent, "issue_subheader": "Load test update", "date": today,
+            "description": "Load test node.", "created_by": vu.user.email, "connection_type": connection,
+        }
+
+    gate = await vu.call("POST /service/issues/child", "POST", "/service/issues/child", json=child(root_id, "MAIN"))
+    if gate is None or gate.status_code != 201:
+        return
+    gate_id = gate.json()["issue_id"]
+    await vu.call("PATCH /service/issues/{id}/tag", "PATCH", f"/service/issues/{gate_id}/tag",
+                  json={"tag": "blue", "senior_comment": "Needs a side fix"})
+
+    branch = await vu.call("POST /service/issues/child", "POST", "/service/issues/child", json=child(gate_id, "LEFT"))
+    if branch is None or branch.status_code != 201:
+        return
+    branch_id = branch.json()["issue_id"]
+    await vu.call("PATCH /service/issues/{id}/tag", "PATCH", f"/service/issues/{branch_id}/tag", json={"tag": "green"})
+    await vu.call("POST /service/issues/merge", "POST", "/service/issues/merge", json={
+        "target_parent_id": gate_id, "branch_nodes": [branch_id], "metadata_summary": "Load test merge",
+    })
+
+
+async def login_burst(vu: VirtualUser, ctx: Dict[str, Any]) -> None:
+    """Password login then the profile fetch the frontend makes right after it."""
+    user: SeededUser = random.choice(ctx["login_users"])
+    headers = {}
+    if not ctx["single_client_ip"]:
+        # A distinct client per attempt, so the per-IP auth limit doesn't mask hashing cost
+        n = next(_forwarded_ips)
+        headers["X-Forwarded-For"] = f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+    vu.token = None
+    response = await vu.call("POST /auth/login", "POST", "/auth/login", data={"username": user.email, "password": PASSWORD},
+                             headers=headers)
+    if response is None or response.status_code != 200:
+        return
+    vu.token = response.json()["access_token"]
+    await vu.call("GET /auth/me", "GET", "/auth/me")
+
+
+Scenario = Callable[[VirtualUser, Dict[str, Any]], Awaitable[None]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "upload_job_poll": upload_job_poll,
+    "issue_graph_reads": issue_graph_reads,
+    "tag_merge_writes": tag_merge_writes,
+    "login_burst": login_burst,
+}
+
+
+async def run_virtual_users(scenario: Scenario, users: List[VirtualUser], ctx: Dict[str, Any], duration: float) -> float:
+    """Runs every user's loop until `duration` passes; returns the elapsed wall time."""
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def loop(vu: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            await scenario(vu, ctx)
+
+    await asyncio.gather(*(loop(vu) for vu in users))
+    return time.perf_counter() - started
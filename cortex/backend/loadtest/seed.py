@@ -0,0 +1,126 @@
+"""Seed data for the PostgREST stand-in: departments, approved users and issue graphs."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from loadtest.fake_postgrest import FakePostgREST
+
+PASSWORD = "loadtest-password"
+DEPARTMENTS = [("DEPT-ENG", "Engineering"), ("DEPT-OPS", "Operations"), ("DEPT-QA", "Quality")]
+
+
+class SeededUser:
+    def __init__(self, index: int, role: str):
+        self.email = f"loadtest.{role}.{index}@example.com"
+        self.emp_id = f"EMP-LT-{role[:3].upper()}-{index:04d}"
+        self.dept_id = DEPARTMENTS[index % len(DEPARTMENTS)][0]
+        self.role = role
+
+    def row(self, hashed_password: str) -> Dict[str, Any]:
+        return {
+            "email": self.email,
+            "full_name": f"Load Test {self.role} {self.emp_id}",
+            "emp_id": self.emp_id,
+            "dept_id": self.dept_id,
+            "role": self.role,
+            "is_approved": True,
+            "hashed_password": hashed_password,
+            "avatar_url": None,
+        }
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def _issue(issue_id: str, author: SeededUser, created: datetime, assigned_dept_ids: List[str]) -> Dict[str, Any]:
+    return {
+        "id": issue_id,
+        "issue_id": issue_id,
+        "type": "new",
+        "header": f"Load test issue {issue_id}",
+        "date": created.date().isoformat(),
+        "description": "Seeded for load testing.",
+        "priority": "mid",
+        "status": "open",
+        "created_by_emp_id": author.emp_id,
+        "assigned_dept_ids": assigned_dept_ids,
+        "dept_id": author.dept_id,
+        "code_changes": "diff --git a/app.py b/app.py\n" + "+ print('load test')\n" * 20,
+        "code_language": "python",
+        "created_at": _iso(created),
+        "last_activity_at": _iso(created),
+    }
+
+
+def _graph_nodes(root_id: str, author: SeededUser, count: int, created: datetime) -> List[Dict[str, Any]]:
+    """A MAIN chain where every fifth node is a blue gatekeeper with a green LEFT branch."""
+    nodes: List[Dict[str, Any]] = []
+    parent = None
+    for index in range(count):
+        node_id = f"{root_id}-N{index:03d}"
+        is_gate = index % 5 == 4
+        stamp = _iso(created + timedelta(minutes=index))
+        nodes.append({
+            "id": node_id,
+            "root_issue_id": root_id,
+            "parent_node_id": parent,
+            "header": f"Update {index}",
+            "description": "Seeded node.",
+            "node_type": "update",
+            "tag": "blue" if is_gate else "green",
+            "senior_comment": "Gate" if is_gate else None,
+            "created_by_emp_id": author.emp_id,
+            "dept_id": author.dept_id,
+            "layout_x": float(index * 40),
+            "layout_y": 0.0,
+            "connection_type": "MAIN",
+            "created_at": stamp,
+            "updated_at": stamp,
+        })
+        if is_gate and len(nodes) < count:
+            nodes.append({
+                **nodes[-1],
+                "id": f"{node_id}-L",
+                "parent_node_id": node_id,
+                "tag": "green",
+                "senior_comment": None,
+                "connection_type": "LEFT",
+                "layout_y": 120.0,
+            })
+        parent = node_id
+    return nodes[:count]
+
+
+def seed_fake(
+    fake: FakePostgREST,
+    hashed_password: str,
+    members: int,
+    seniors: int,
+    issues: int,
+    graph_nodes: int,
+) -> Dict[str, Any]:
+    """Seeds the fake and returns the handles scenarios need (users, issue ids, scratch roots)."""
+    team = [SeededUser(index, "team_member") for index in range(members)]
+    senior = [SeededUser(index, "senior") for index in range(seniors)]
+    fake.seed("departments", [{"dept_id": dept_id, "dept_name": name} for dept_id, name in DEPARTMENTS])
+    fake.seed("users", [user.row(hashed_password) for user in team + senior])
+
+    created = datetime.now(timezone.utc) - timedelta(days=7)
+    # Read graphs are assigned to every department so any team member may open them
+    all_depts = [dept_id for dept_id, _ in DEPARTMENTS]
+    graph_roots = []
+    for index in range(issues):
+        author = senior[index % len(senior)] if senior else team[index % len(team)]
+        root_id = f"ISS-LT{index:05d}"
+        fake.seed("issues", [_issue(root_id, author, created + timedelta(minutes=index), all_depts)])
+        fake.seed("issue_nodes", _graph_nodes(root_id, author, graph_nodes, created))
+        graph_roots.append(root_id)
+
+    # Each writer gets its own root so the read graphs keep a fixed size
+    scratch_roots = {}
+    for user in senior:
+        root_id = f"ISS-LTW{user.emp_id[-4:]}"
+        fake.seed("issues", [_issue(root_id, user, created, [user.dept_id])])
+        scratch_roots[user.emp_id] = root_id
+
+    return {"team": team, "senior": senior, "graph_roots": graph_roots, "scratch_roots": scratch_roots}
@@ -0,0 +1,98 @@
+-- Migration 11: Server-side auth cleanup
+--
+-- One call = one short transaction that processes at most p_batch_size rows
+-- per step. The backend calls it repeatedly (see run_auth_cleanup) until no
+-- step fills its batch, so row locks are held for one chunk at a time.
+-- Rows already locked by a concurrent writer are skipped and picked up by
+-- the next call.
+
+CREATE OR REPLACE FUNCTION auth_cleanup_batch(
+    p_now TIMESTAMPTZ,
+    p_pending_days INTEGER,
+    p_rejected_days INTEGER,
+    p_expired_days INTEGER,
+    p_batch_size INTEGER
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_expired_invites INTEGER;
+    v_marked_expired INTEGER;
+    v_pending INTEGER;
+    v_rejected INTEGER;
+    v_expired INTEGER;
+    v_completed INTEGER;
+BEGIN
+    -- 1. Expired invite tokens
+    WITH doomed AS (
+        SELECT id FROM invite_tokens
+        WHERE expires_at < p_now
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM invite_tokens t USING doomed WHERE t.id = doomed.id;
+    GET DIAGNOSTICS v_expired_invites = ROW_COUNT;
+
+    -- 2. Approved requests whose invite is gone (expired above or never sent)
+    WITH orphaned AS (
+        SELECT r.id FROM access_requests r
+        WHERE r.status = 'approved'
+          AND NOT EXISTS (SELECT 1 FROM invite_tokens t WHERE t.request_id = r.id)
+        LIMIT p_batch_size
+        FOR UPDATE OF r SKIP LOCKED
+    )
+    UPDATE access_requests r
+    SET status = 'expired', reviewed_at = p_now
+    FROM orphaned WHERE r.id = orphaned.id;
+    GET DIAGNOSTICS v_marked_expired = ROW_COUNT;
+
+    -- 3. Retention windows per status
+    WITH doomed AS (
+        SELECT id FROM access_requests
+        WHERE status = 'pending' AND created_at < p_now - make_interval(days => p_pending_days)
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM access_requests r USING doomed WHERE r.id = doomed.id;
+    GET DIAGNOSTICS v_pending = ROW_COUNT;
+
+    WITH doomed AS (
+        SELECT id FROM access_requests
+        WHERE status = 'rejected' AND reviewed_at < p_now - make_interval(days => p_rejected_days)
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM access_requests r USING doomed WHERE r.id = doomed.id;
+    GET DIAGNOSTICS v_rejected = ROW_COUNT;
+
+    WITH doomed AS (
+        SELECT id FROM access_requests
+        WHERE status = 'expired' AND reviewed_at < p_now - make_interval(days => p_expired_days)
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM access_requests r USING doomed WHERE r.id = doomed.id;
+    GET DIAGNOSTICS v_expired = ROW_COUNT;
+
+    WITH doomed AS (
+        SELECT id FROM access_requests
+        WHERE status = 'completed'
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM access_requests r USING doomed WHERE r.id = doomed.id;
+    GET DIAGNOSTICS v_completed = ROW_COUNT;
+
+    RETURN jsonb_build_object(
+        'expired_invites_deleted', v_expired_invites,
+        'approved_marked_expired', v_marked_expired,
+        'pending_deleted', v_pending,
+        'rejected_deleted', v_rejected,
+        'expired_deleted', v_expired,
+        'completed_deleted', v_completed
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backend-only, like the tables it touches
+REVOKE ALL ON FUNCTION auth_cleanup_batch(TIMESTAMPTZ, INTEGER, INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION auth_cleanup_batch(TIMESTAMPTZ, INTEGER, INTEGER, INTEGER, INTEGER) TO service_role;
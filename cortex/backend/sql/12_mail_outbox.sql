@@ -0,0 +1,64 @@
+-- Migration 12: Outbound mail queue
+--
+-- Approvals insert rows here instead of talking to SMTP; the backend worker
+-- claims due rows in batches and delivers them over one SMTP session.
+-- Message bodies are cleared once a row reaches a terminal state, so invite
+-- links only sit in this table while delivery is pending.
+
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kind VARCHAR(50) NOT NULL DEFAULT 'invite',
+    recipient VARCHAR(255) NOT NULL,
+    subject TEXT NOT NULL,
+    text_body TEXT,
+    html_body TEXT,
+    fallback_note TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claimed_at TIMESTAMP WITH TIME ZONE,
+    sent_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE mail_outbox
+    DROP CONSTRAINT IF EXISTS mail_outbox_status_check;
+ALTER TABLE mail_outbox
+    ADD CONSTRAINT mail_outbox_status_check
+    CHECK (status IN ('queued', 'sending', 'sent', 'failed'));
+
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_status_next_attempt ON mail_outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_recipient ON mail_outbox(recipient);
+
+ALTER TABLE mail_outbox ENABLE ROW LEVEL SECURITY;
+
+-- Claims up to p_limit due rows for one sender. Rows stuck in 'sending' for
+-- longer than p_stale_seconds (sender crashed mid-batch) are claimed again,
+-- so delivery is at-least-once.
+CREATE OR REPLACE FUNCTION claim_mail_outbox(
+    p_now TIMESTAMPTZ,
+    p_limit INTEGER,
+    p_stale_seconds INTEGER
+)
+RETURNS SETOF mail_outbox AS $$
+BEGIN
+    RETURN QUERY
+    WITH claimable AS (
+        SELECT id FROM mail_outbox
+        WHERE (status = 'queued' AND next_attempt_at <= p_now)
+           OR (status = 'sending' AND claimed_at < p_now - make_interval(secs => p_stale_seconds))
+        ORDER BY next_attempt_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE mail_outbox m
+    SET status = 'sending', claimed_at = p_now, attempts = m.attempts + 1
+    FROM claimable
+    WHERE m.id = claimable.id
+    RETURNING m.*;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE ALL ON FUNCTION claim_mail_outbox(TIMESTAMPTZ, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_mail_outbox(TIMESTAMPTZ, INTEGER, INTEGER) TO service_role;
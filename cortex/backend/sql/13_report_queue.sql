@@ -0,0 +1,220 @@
+-- Migration 13: Report job queue (JOB_QUEUE_BACKEND=postgres)
+--
+-- One row per report job. A claim is a lease: the statement that picks the
+-- row also records the worker and an expiry, under FOR UPDATE SKIP LOCKED,
+-- so concurrent workers take different rows instead of waiting on one lock.
+-- Workers heartbeat to extend the lease. Rows whose lease expired are
+-- queued again, or dead-lettered once they used p_max_attempts claims.
+-- Finished rows keep the result JSON, so any API process can serve polls,
+-- until reap_report_jobs purges them after the retention window.
+-- Lease times use the database clock, never the workers'.
+
+CREATE TABLE IF NOT EXISTS report_queue (
+    job_id UUID PRIMARY KEY,
+    owner_emp_id TEXT NOT NULL,
+    spec JSONB NOT NULL,
+    state VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    worker_id TEXT,
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    progress INTEGER NOT NULL DEFAULT 0,
+    stage TEXT,
+    status VARCHAR(20),
+    error TEXT,
+    result TEXT,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+ALTER TABLE report_queue
+    DROP CONSTRAINT IF EXISTS report_queue_state_check;
+ALTER TABLE report_queue
+    ADD CONSTRAINT report_queue_state_check
+    CHECK (state IN ('queued', 'leased', 'done', 'dead'));
+
+CREATE INDEX IF NOT EXISTS idx_report_queue_queued ON report_queue(enqueued_at) WHERE state = 'queued';
+CREATE INDEX IF NOT EXISTS idx_report_queue_leased ON report_queue(lease_expires_at) WHERE state = 'leased';
+CREATE INDEX IF NOT EXISTS idx_report_queue_owner_state ON report_queue(owner_emp_id, state);
+CREATE INDEX IF NOT EXISTS idx_report_queue_finished ON report_queue(finished_at) WHERE state IN ('done', 'dead');
+
+-- Fair share: when each owner was last handed a job
+CREATE TABLE IF NOT EXISTS report_queue_owners (
+    owner_emp_id TEXT PRIMARY KEY,
+    last_served_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+ALTER TABLE report_queue ENABLE ROW LEVEL SECURITY;
+ALTER TABLE report_queue_owners ENABLE ROW LEVEL SECURITY;
+
+-- (Re)queues a job with a fresh attempt count.
+CREATE OR REPLACE FUNCTION enqueue_report_job(
+    p_job_id UUID,
+    p_owner_emp_id TEXT,
+    p_spec JSONB
+)
+RETURNS VOID AS $$
+    INSERT INTO report_queue (job_id, owner_emp_id, spec)
+    VALUES (p_job_id, p_owner_emp_id, p_spec)
+    ON CONFLICT (job_id) DO UPDATE
+    SET state = 'queued', spec = EXCLUDED.spec, attempts = 0, enqueued_at = now(),
+        worker_id = NULL, lease_expires_at = NULL, heartbeat_at = NULL, progress = 0,
+        stage = NULL, status = NULL, error = NULL, result = NULL, finished_at = NULL;
+$$ LANGUAGE sql;
+
+-- Leases the next queued job to p_worker_id: the owner with the fewest jobs
+-- already leased, then the least recently served; FIFO within an owner.
+-- Returns no row when nothing is claimable.
+CREATE OR REPLACE FUNCTION claim_report_job(
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER
+)
+RETURNS SETOF report_queue AS $$
+DECLARE
+    v_job_id UUID;
+    v_owner_emp_id TEXT;
+BEGIN
+    SELECT q.job_id, q.owner_emp_id INTO v_job_id, v_owner_emp_id
+    FROM report_queue q
+    LEFT JOIN report_queue_owners o ON o.owner_emp_id = q.owner_emp_id
+    WHERE q.state = 'queued'
+    ORDER BY
+        (SELECT count(*) FROM report_queue l WHERE l.owner_emp_id = q.owner_emp_id AND l.state = 'leased'),
+        o.last_served_at NULLS FIRST,
+        q.enqueued_at
+    LIMIT 1
+    FOR UPDATE OF q SKIP LOCKED;
+
+    IF v_job_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO report_queue_owners (owner_emp_id, last_served_at)
+    VALUES (v_owner_emp_id, now())
+    ON CONFLICT (owner_emp_id) DO UPDATE SET last_served_at = EXCLUDED.last_served_at;
+
+    RETURN QUERY
+    UPDATE report_queue q
+    SET state = 'leased', worker_id = p_worker_id, attempts = q.attempts + 1,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds), heartbeat_at = now()
+    WHERE q.job_id = v_job_id
+    RETURNING q.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Extends the lease and records progress; false once the lease is no longer p_worker_id's.
+CREATE OR REPLACE FUNCTION heartbeat_report_job(
+    p_job_id UUID,
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER,
+    p_progress INTEGER,
+    p_stage TEXT
+)
+RETURNS BOOLEAN AS $$
+    WITH renewed AS (
+        UPDATE report_queue
+        SET lease_expires_at = now() + make_interval(secs => p_lease_seconds), heartbeat_at = now(),
+            progress = p_progress, stage = p_stage
+        WHERE job_id = p_job_id AND worker_id = p_worker_id AND state = 'leased'
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM renewed);
+$$ LANGUAGE sql;
+
+-- Ends the lease with the job's terminal status and result; false when it was lost meanwhile.
+CREATE OR REPLACE FUNCTION complete_report_job(
+    p_job_id UUID,
+    p_worker_id TEXT,
+    p_status VARCHAR,
+    p_progress INTEGER,
+    p_stage TEXT,
+    p_error TEXT,
+    p_result TEXT
+)
+RETURNS BOOLEAN AS $$
+    WITH completed AS (
+        UPDATE report_queue
+        SET state = 'done', status = p_status, progress = p_progress, stage = p_stage,
+            error = p_error, result = p_result, finished_at = now(), lease_expires_at = NULL
+        WHERE job_id = p_job_id AND worker_id = p_worker_id AND state = 'leased'
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM completed);
+$$ LANGUAGE sql;
+
+-- Gives the lease back for immediate redelivery (the claim still counts).
+CREATE OR REPLACE FUNCTION release_report_job(
+    p_job_id UUID,
+    p_worker_id TEXT
+)
+RETURNS BOOLEAN AS $$
+    WITH released AS (
+        UPDATE report_queue
+        SET state = 'queued', worker_id = NULL, lease_expires_at = NULL
+        WHERE job_id = p_job_id AND worker_id = p_worker_id AND state = 'leased'
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM released);
+$$ LANGUAGE sql;
+
+-- Requeues expired leases, dead-letters the ones out of attempts, and purges
+-- finished rows past the retention window. Returns one row per expired lease.
+CREATE OR REPLACE FUNCTION reap_report_jobs(
+    p_max_attempts INTEGER,
+    p_retention_seconds INTEGER,
+    p_dead_letter_error TEXT
+)
+RETURNS TABLE (job_id UUID, state VARCHAR, attempts INTEGER, worker_id TEXT) AS $$
+#variable_conflict use_column
+BEGIN
+    DELETE FROM report_queue r
+    WHERE r.state IN ('done', 'dead') AND r.finished_at < now() - make_interval(secs => p_retention_seconds);
+
+    RETURN QUERY
+    WITH expired AS (
+        SELECT r.job_id, r.worker_id AS previous_worker_id
+        FROM report_queue r
+        WHERE r.state = 'leased' AND r.lease_expires_at < now()
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE report_queue q
+    SET state = CASE WHEN q.attempts >= p_max_attempts THEN 'dead' ELSE 'queued' END,
+        status = CASE WHEN q.attempts >= p_max_attempts THEN 'failed' ELSE NULL END,
+        error = CASE WHEN q.attempts >= p_max_attempts THEN p_dead_letter_error ELSE q.error END,
+        finished_at = CASE WHEN q.attempts >= p_max_attempts THEN now() ELSE NULL END,
+        worker_id = NULL,
+        lease_expires_at = NULL
+    FROM expired
+    WHERE q.job_id = expired.job_id
+    RETURNING q.job_id, q.state, q.attempts, expired.previous_worker_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rows by state and the oldest queued job's wait in seconds (GET /admin/stats/job-queue).
+CREATE OR REPLACE FUNCTION report_queue_stats()
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'states', COALESCE((SELECT jsonb_object_agg(s.state, s.n) FROM (
+            SELECT state, count(*) AS n FROM report_queue GROUP BY state
+        ) s), '{}'::jsonb),
+        'oldest_queued_seconds', (
+            SELECT round(EXTRACT(EPOCH FROM now() - min(enqueued_at))::numeric, 1)
+            FROM report_queue WHERE state = 'queued'
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+REVOKE ALL ON FUNCTION enqueue_report_job(UUID, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION claim_report_job(TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION heartbeat_report_job(UUID, TEXT, INTEGER, INTEGER, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION complete_report_job(UUID, TEXT, VARCHAR, INTEGER, TEXT, TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION release_report_job(UUID, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION reap_report_jobs(INTEGER, INTEGER, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION report_queue_stats() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION enqueue_report_job(UUID, TEXT, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_report_job(TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION heartbeat_report_job(UUID, TEXT, INTEGER, INTEGER, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_report_job(UUID, TEXT, VARCHAR, INTEGER, TEXT, TEXT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION release_report_job(UUID, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION reap_report_jobs(INTEGER, INTEGER, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION report_queue_stats() TO service_role;
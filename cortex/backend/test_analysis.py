@@ -0,0 +1,36 @@
+import pandas as pd
+
+from app.services.analysis import generate_report_payload
+
+
+def split_dataset():
+    rows = [
+        {
+            "id": i,
+            "Cluster": ["billing", "login", "search"][i % 3],
+            # No Classification column, so sentiment_class is renamed and its gaps filled
+            "sentiment_class": [None, "negative", "neutral", "positive"][i % 4],
+            "Date": f"2024-01-{1 + i % 20:02d} 10:00:00",
+            "Title": f"t{i}",
+            "score": i % 5,
+        }
+        for i in range(60)
+    ]
+    frame = pd.DataFrame(rows)
+    return [frame.iloc[:30], frame.iloc[30:]]
+
+
+def test_csv_and_parquet_payloads_match(tmp_path):
+    csv_paths, parquet_paths = [], []
+    for index, part in enumerate(split_dataset()):
+        csv_path = tmp_path / f"part{index}.csv"
+        parquet_path = tmp_path / f"part{index}.parquet"
+        part.to_csv(csv_path, index=False)
+        part.to_parquet(parquet_path, index=False)
+        csv_paths.append(str(csv_path))
+        parquet_paths.append(str(parquet_path))
+
+    from_csv = generate_report_payload(csv_paths).model_dump(mode="json")
+    from_parquet = generate_report_payload(parquet_paths).model_dump(mode="json")
+    assert "(Unclassified)" in str(from_csv)
+    assert from_parquet == from_csv
@@ -0,0 +1,126 @@
+import csv
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import ingestion as ingestion_endpoints
+from app.core.config import settings
+from app.core.security import SessionUser, get_current_user
+from app.services.ingestion import PartScanner, UploadSniffer
+
+
+def scan_parts(data: bytes, cuts):
+    """Part stats for `data` split at the given byte offsets."""
+    bounds = [0, *cuts, len(data)]
+    stats = []
+    for start, end in zip(bounds, bounds[1:]):
+        scanner = PartScanner()
+        scanner.feed(data[start:end])
+        stats.append(scanner.stats())
+    return stats
+
+
+def csv_rows(data: bytes) -> int:
+    return len(list(csv.reader(io.StringIO(data.decode())))) - 1
+
+
+QUOTED_CSV = (
+    b'id,note\n'
+    b'1,"two\nlines"\n'
+    b'2,plain\n'
+    b'3,"say ""hi""\nand\nbye"\n'
+    b'4,last'
+)
+
+
+def test_combine_row_count_single_part():
+    assert PartScanner.combine_row_count(scan_parts(QUOTED_CSV, [])) == csv_rows(QUOTED_CSV) == 4
+
+
+@pytest.mark.parametrize("cut", range(1, len(QUOTED_CSV)))
+def test_combine_row_count_any_split(cut):
+    # Includes cuts inside quoted fields and between doubled quotes
+    assert PartScanner.combine_row_count(scan_parts(QUOTED_CSV, [cut])) == 4
+
+
+def test_combine_row_count_three_parts_and_trailing_newline():
+    data = QUOTED_CSV + b"\n"
+    assert PartScanner.combine_row_count(scan_parts(data, [12, 30])) == 4
+
+
+def test_combine_row_count_header_only_and_empty():
+    assert PartScanner.combine_row_count(scan_parts(b"id,note\n", [])) == 0
+    assert PartScanner.combine_row_count(scan_parts(b"", [])) == 0
+
+
+def test_small_sniffer_counts_rows_after_sniff():
+    sniffer = UploadSniffer("small.csv")
+    sniffer.feed(QUOTED_CSV)
+    # Below SNIFF_SAMPLE_BYTES nothing is scanned until the sample is sniffed
+    sniffer.sniff_result()
+    assert PartScanner.combine_row_count([sniffer.stats()]) == 4
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    app = FastAPI()
+    app.include_router(ingestion_endpoints.router, prefix="/ingest")
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(email="a@example.com", emp_id="E1")
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_small_single_part_upload_counts_rows(client):
+    meta = client.post(
+        "/ingest/meta",
+        json={"filename": "small.csv", "file_type": "text/csv", "file_size": len(QUOTED_CSV), "part_size": len(QUOTED_CSV)},
+    ).json()
+    assert meta["part_count"] == 1
+
+    receipt = client.put(f"/ingest/blob/{meta['id']}/parts/1", content=QUOTED_CSV)
+    assert receipt.status_code == 200, receipt.text
+    completed = client.post(f"/ingest/blob/{meta['id']}/complete")
+    assert completed.status_code == 200, completed.text
+    body = completed.json()
+    assert body["format"] == "csv"
+    assert body["columns"] == ["id", "note"]
+    assert body["row_count"] == 4
+
+
+def test_zstd_bomb_stops_at_size_limit(monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    from app.services import ingestion
+
+    monkeypatch.setattr(ingestion, "MAX_DECOMPRESSED_SIZE_BYTES", 4 * ingestion.DECOMPRESS_STEP_BYTES)
+    bomb = zstandard.ZstdCompressor().compress(b"a,b\n" + b"0" * (64 * 1024 * 1024))
+    ingested = []
+    sniffer = UploadSniffer("bomb.csv.zst")
+    original_ingest = sniffer._ingest
+    monkeypatch.setattr(sniffer, "_ingest", lambda data: (ingested.append(len(data)), original_ingest(data)))
+    with pytest.raises(ingestion.DecompressedSizeExceeded):
+        sniffer.feed(bomb)
+    assert max(ingested) <= ingestion.DECOMPRESS_STEP_BYTES
+    assert sum(ingested) <= 5 * ingestion.DECOMPRESS_STEP_BYTES
+
+
+def test_zstd_upload_sniffs_like_plain_csv():
+    zstandard = pytest.importorskip("zstandard")
+    # Two concatenated frames, fed in small pieces
+    compressed = zstandard.ZstdCompressor().compress(QUOTED_CSV[:20]) + zstandard.ZstdCompressor().compress(QUOTED_CSV[20:])
+    sniffer = UploadSniffer("data.csv.zst")
+    for start in range(0, len(compressed), 7):
+        sniffer.feed(compressed[start:start + 7])
+    result = sniffer.finish()
+    assert (result["compression"], result["row_count"], result["decompressed_size"]) == ("zstd", 4, len(QUOTED_CSV))
+
+
+@pytest.mark.parametrize("filename, magic", [("x.csv.gz", b"\x1f\x8b"), ("x.csv.zst", b"\x28\xb5\x2f\xfd")])
+def test_corrupt_compressed_upload_reports_corruption(filename, magic):
+    if filename.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    sniffer = UploadSniffer(filename)
+    sniffer.feed(magic + b"garbage" * 10)
+    assert sniffer.finish()["sniff_error"].startswith("Compressed data is corrupt")
@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.queue import DEAD_LETTER_ERROR, InProcessQueueBackend, SQLiteQueueBackend, pick_fair
+
+LEASE = 30.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InProcessQueueBackend()
+    return SQLiteQueueBackend(str(tmp_path / "job-queue.sqlite3"))
+
+
+def states(backend):
+    return backend.stats(0.0)["states"]
+
+
+def test_claim_leases_each_job_once(backend):
+    backend.enqueue("j1", "alice", {"file_paths": ["a.csv"]}, now=1.0)
+    claimed = backend.claim("w1", LEASE, now=2.0)
+    assert claimed["job_id"] == "j1"
+    assert (claimed["worker_id"], claimed["attempts"], claimed["lease_expires_at"]) == ("w1", 1, 32.0)
+    assert claimed["spec"] == {"file_paths": ["a.csv"]}
+    assert backend.claim("w2", LEASE, now=2.0) is None
+    assert states(backend) == {"leased": 1}
+
+
+def test_heartbeat_and_complete_need_the_lease(backend):
+    backend.enqueue("j1", "alice", {}, now=1.0)
+    backend.claim("w1", LEASE, now=2.0)
+    assert not backend.heartbeat("j1", "w2", LEASE, now=10.0, progress=50, stage="load")
+    assert backend.heartbeat("j1", "w1", LEASE, now=10.0, progress=50, stage="load")
+    # Extended to 40: not expired at 35
+    assert backend.reap(now=35.0, max_attempts=3, retention_seconds=60) == []
+    assert not backend.complete("j1", "w2", 36.0, "completed", 100, None, None, b"{}")
+    assert backend.complete("j1", "w1", 36.0, "completed", 100, None, None, b"{}")
+    assert not backend.heartbeat("j1", "w1", LEASE, now=37.0, progress=100, stage=None)
+
+
+def test_release_requeues_for_immediate_redelivery(backend):
+    backend.enqueue("j1", "alice", {}, now=1.0)
+    backend.claim("w1", LEASE, now=2.0)
+    assert backend.release("j1", "w1", now=3.0)
+    again = backend.claim("w2", LEASE, now=4.0)
+    assert (again["worker_id"], again["attempts"]) == ("w2", 2)
+
+
+def test_expired_lease_is_redelivered_then_dead_lettered(backend):
+    backend.enqueue("j1", "alice", {}, now=0.0)
+    for attempt in (1, 2):
+        claimed = backend.claim(f"w{attempt}", LEASE, now=attempt * 100.0)
+        assert claimed["attempts"] == attempt
+        reaped = backend.reap(now=attempt * 100.0 + LEASE + 1, max_attempts=2, retention_seconds=3600)
+        assert [(row["job_id"], row["worker_id"], row["attempts"]) for row in reaped] == [("j1", f"w{attempt}", attempt)]
+    assert reaped[0]["state"] == "dead"
+    assert reaped[0]["error"] == DEAD_LETTER_ERROR
+    assert backend.claim("w3", LEASE, now=300.0) is None
+    # The lost worker can no longer ack it
+    assert not backend.complete("j1", "w2", 301.0, "completed", 100, None, None, None)
+
+
+def test_first_expiry_requeues(backend):
+    backend.enqueue("j1", "alice", {}, now=0.0)
+    backend.claim("w1", LEASE, now=1.0)
+    [row] = backend.reap(now=100.0, max_attempts=3, retention_seconds=3600)
+    assert row["state"] == "queued"
+    assert states(backend) == {"queued": 1}
+
+
+def test_claims_share_workers_across_owners(backend):
+    for i in range(3):
+        backend.enqueue(f"a{i}", "alice", {}, now=float(i))
+    backend.enqueue("b0", "bob", {}, now=10.0)
+    first = backend.claim("w1", LEASE, now=20.0)
+    second = backend.claim("w2", LEASE, now=21.0)
+    # Alice's batch came first, but Bob doesn't wait for all of it
+    assert [first["job_id"], second["job_id"]] == ["a0", "b0"]
+    assert backend.claim("w3", LEASE, now=22.0)["job_id"] == "a1"
+
+
+def test_sqlite_finished_rows_are_shared_and_purged(tmp_path):
+    path = str(tmp_path / "job-queue.sqlite3")
+    api, worker = SQLiteQueueBackend(path), SQLiteQueueBackend(path)
+    api.enqueue("j1", "alice", {"file_paths": []}, now=0.0)
+    worker.claim("w1", LEASE, now=1.0)
+    worker.complete("j1", "w1", 2.0, "completed", 100, "done", None, b'{"ok": true}')
+    row = api.get_many(["j1"])["j1"]
+    assert (row["state"], row["status"], row["result"]) == ("done", "completed", b'{"ok": true}')
+    api.reap(now=100.0, max_attempts=3, retention_seconds=50)
+    assert api.get_many(["j1"]) == {}
+
+
+def test_pick_fair_orders_by_leased_then_last_served_then_age():
+    candidates = [
+        {"job_id": "a", "owner_emp_id": "alice", "enqueued_at": 1.0},
+        {"job_id": "b", "owner_emp_id": "bob", "enqueued_at": 2.0},
+        {"job_id": "c", "owner_emp_id": "carol", "enqueued_at": 3.0},
+    ]
+    assert pick_fair(candidates, {}, {})["job_id"] == "a"
+    assert pick_fair(candidates, {"alice": 1}, {})["job_id"] == "b"
+    assert pick_fair(candidates, {"alice": 1}, {"bob": 5.0})["job_id"] == "c"
+    assert pick_fair(candidates, {"alice": 1, "carol": 1}, {"bob": 5.0})["job_id"] == "b"
+    assert pick_fair(candidates, {"alice": 2, "bob": 2, "carol": 2}, {"alice": 9.0, "bob": 8.0, "carol": 7.0})["job_id"] == "c"
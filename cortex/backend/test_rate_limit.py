@@ -0,0 +1,61 @@
+import pytest
+
+from app.core.rate_limit import InProcessRateLimitBackend, RateLimitPolicy, SQLiteRateLimitBackend, gcra
+
+
+def test_gcra_allows_burst_then_denies_with_retry_after():
+    policy = RateLimitPolicy("t", limit=3, period_seconds=3)  # one per second, burst 3
+    tat = None
+    for _ in range(3):
+        allowed, tat, retry_after = gcra(tat, 100.0, policy)
+        assert allowed and retry_after == 0.0
+    allowed, denied_tat, retry_after = gcra(tat, 100.0, policy)
+    assert not allowed
+    assert denied_tat == tat  # a denied request doesn't consume capacity
+    assert retry_after == pytest.approx(1.0)
+
+
+def test_gcra_refills_at_the_emission_interval():
+    policy = RateLimitPolicy("t", limit=2, period_seconds=10, burst=1)
+    allowed, tat, _ = gcra(None, 0.0, policy)
+    assert allowed
+    assert not gcra(tat, 4.9, policy)[0]
+    assert gcra(tat, 5.0, policy)[0]
+    # Idle longer than the period: a full bucket again, not banked credit
+    allowed, tat, _ = gcra(tat, 1000.0, policy)
+    assert allowed and tat == 1005.0
+
+
+def test_policy_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        RateLimitPolicy("t", limit=0, period_seconds=60)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InProcessRateLimitBackend()
+    return SQLiteRateLimitBackend(str(tmp_path / "rate_limits.sqlite3"))
+
+
+def test_backend_limits_per_key_and_sweeps_idle_keys(backend):
+    policy = RateLimitPolicy("auth", limit=2, period_seconds=60)
+    assert [backend.hit("a", policy, 0.0)[0] for _ in range(3)] == [True, True, False]
+    allowed, retry_after = backend.hit("a", policy, 0.0)
+    assert not allowed and retry_after == pytest.approx(30.0)
+    assert backend.hit("b", policy, 0.0)[0]
+    assert backend.size() == 2
+
+    assert backend.hit("a", policy, 30.0)[0]
+    # b's TAT (30) has passed; a's (90) hasn't
+    assert backend.sweep(60.0) == 1
+    assert backend.size() == 1
+
+
+def test_sqlite_backend_shares_state_across_connections(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    policy = RateLimitPolicy("auth", limit=2, period_seconds=60)
+    first, second = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+    assert first.hit("a", policy, 0.0)[0]
+    assert second.hit("a", policy, 0.0)[0]
+    assert not first.hit("a", policy, 0.0)[0]
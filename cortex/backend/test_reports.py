@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import reports as report_endpoints
+from app.core import queue
+from app.core.config import settings
+from app.core.security import SessionUser, get_current_user
+from app.services import jobs
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(jobs, "jobs_db", {})
+    monkeypatch.setattr(jobs, "idempotency_index", {})
+    monkeypatch.setattr(jobs, "job_groups_db", {})
+    monkeypatch.setattr(queue, "queue_backend", queue.InProcessQueueBackend())
+    app = FastAPI()
+    app.include_router(report_endpoints.router, prefix="/reports")
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(email="a@example.com", emp_id="E1")
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    sessions = {}
+    monkeypatch.setattr(report_endpoints, "upload_sessions", sessions)
+
+    def make(count):
+        file_ids = []
+        for index in range(count):
+            path = tmp_path / f"part{index}.csv"
+            path.write_text("id,note\n1,a\n")
+            file_id = f"f{index}"
+            sessions[file_id] = {"owner_emp_id": "E1", "status": "completed", "file_path": str(path)}
+            file_ids.append(file_id)
+        return file_ids
+
+    return make
+
+
+def batch(file_ids):
+    return {"project_id": "p1", "file_sets": [{"file_ids": [file_id]} for file_id in file_ids]}
+
+
+def test_batch_larger_than_pending_cap_is_queued(client, uploads):
+    assert 30 > settings.MAX_PENDING_JOBS
+    response = client.post("/reports/batches", json=batch(uploads(30)))
+    assert response.status_code == 201, response.text
+    assert response.json()["total"] == 30
+    assert queue.queue_backend.stats(0.0)["states"] == {"queued": 30}
+
+
+def test_batch_is_bounded_by_the_owner_queue(client, uploads, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_QUEUED_JOBS_PER_USER", 20)
+    response = client.post("/reports/batches", json=batch(uploads(30)))
+    assert response.status_code == 429, response.text
+    assert jobs.jobs_db == {}
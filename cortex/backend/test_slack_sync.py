@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import slack_gateway, slack_sync
+
+
+class FakeHistory:
+    """conversations.history over an in-memory channel: newest first, exclusive bounds."""
+
+    def __init__(self):
+        self.messages = []
+
+    def post(self, count):
+        start = len(self.messages)
+        self.messages += [{"type": "message", "ts": f"{1000 + i}.000100", "text": str(i)} for i in range(start, start + count)]
+
+    async def __call__(self, user_key, token, channel_id, oldest="0", limit=20, cursor=None, latest=None):
+        matching = [
+            m for m in reversed(self.messages)
+            if float(m["ts"]) > float(oldest) and (latest is None or float(m["ts"]) < float(latest))
+        ]
+        offset = int(cursor or 0)
+        page = matching[offset:offset + limit]
+        has_more = offset + limit < len(matching)
+        return {"messages": page, "has_more": has_more, "response_metadata": {"next_cursor": str(offset + limit) if has_more else ""}}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(slack_sync, "message_store", slack_sync.SlackMessageStore(str(tmp_path / "slack.sqlite3")))
+    monkeypatch.setattr(settings, "SLACK_SYNC_PAGE_SIZE", 2)
+    monkeypatch.setattr(settings, "SLACK_SYNC_MAX_PAGES", 2)
+    monkeypatch.setattr(settings, "SLACK_SYNC_KEEP_PER_CHANNEL", 1000)
+    fake = FakeHistory()
+    monkeypatch.setattr(slack_gateway, "channel_history", fake)
+    return fake
+
+
+def sync(channel):
+    slack_sync.message_store.retain_channels("u", [channel])
+    state = slack_sync.message_store.cursors("u").get(channel["id"], ("0", None, None))
+    return asyncio.run(slack_sync._sync_channel("u", "token", channel, state))
+
+
+def stored_texts():
+    return sorted(int(m["text"]) for m in slack_sync.message_store.recent("u", 0, 10_000))
+
+
+def test_backlog_longer_than_max_pages_is_backfilled(history):
+    channel = {"id": "C1", "name": "general"}
+    history.post(3)
+    sync(channel)
+    assert stored_texts() == [0, 1, 2]
+
+    # 9 new messages, 4 per sync: the walk resumes instead of skipping 3..7
+    history.post(9)
+    assert sync(channel) == 4
+    assert slack_sync.message_store.cursors("u")["C1"][0] == "1002.000100"
+    history.post(1)  # arrives mid-walk; picked up once the walk finishes
+    assert sync(channel) == 4
+    assert sync(channel) == 1
+    assert stored_texts() == list(range(12))
+    assert slack_sync.message_store.cursors("u")["C1"] == ("1011.000100", None, None)
+
+    assert sync(channel) == 1
+    assert stored_texts() == list(range(13))
+    assert sync(channel) == 0